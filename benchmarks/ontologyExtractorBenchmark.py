@@ -0,0 +1,138 @@
+"""
+    Benchmark of OntologyExtractor on a large generated ontology.
+    It generates an RDF/XML ontology with the structure of DBPedia, and compares the streaming extractor with the
+    previous extraction path, which parsed the whole document with etree.fromstring and ran separate XPath
+    queries for each element. Both must give the same metadata.
+    Run it from the root folder of the project:
+        python -m benchmarks.ontologyExtractorBenchmark [number of classes]
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from lxml import etree
+from benchmarks.syntheticOntology import generate_ontology
+from lib.ontologyExtractor import OntologyExtractor
+from lib.utils import *
+
+
+def extract_with_document_xpath(file_path: str) -> tuple[dict[str, ClassMetaData], list[ObjectPropertyMetaData]]:
+    """
+    The previous extraction path, which parses the whole document and runs uncompiled XPath queries.
+
+    Parameters
+    ----------
+    file_path: str
+        Path of the ontology.
+
+    Returns
+    -------
+    tuple[dict[str, ClassMetaData], list[ObjectPropertyMetaData]]
+        The metadata of classes and object properties.
+    """
+    classesMetaData = dict()
+    objectPropertiesMetaData = []
+    xml_tree = etree.fromstring(open(file_path, 'r').read().encode('utf8'))
+    namespaces = OntologyExtractor.namespaces
+    for cls in xml_tree.xpath('//owl:Class', namespaces=namespaces):
+        class_iri = cls.xpath('@rdf:about', namespaces=namespaces)[0]
+        class_label = cls.xpath("rdfs:label", namespaces=namespaces)[0].text
+        subClassOf_element = cls.xpath(
+            "rdfs:subClassOf/@rdf:resource", namespaces=namespaces)
+        parentClass = ''
+        if (len(subClassOf_element) > 0):
+            parentClass = str(subClassOf_element[0])
+        classesMetaData[class_iri] = ClassMetaData(
+            label=class_label, parentClass=parentClass)
+    for dtProperty in xml_tree.xpath('//owl:DatatypeProperty', namespaces=namespaces):
+        dtProperty_iri = dtProperty.xpath(
+            '@rdf:about', namespaces=namespaces)[0]
+        dtProperty_label = dtProperty.xpath(
+            "rdfs:label", namespaces=namespaces)[0].text
+        dtProperty_domain = dtProperty.xpath(
+            "rdfs:domain/@rdf:resource", namespaces=namespaces)[0]
+        if dtProperty_domain in classesMetaData:
+            classesMetaData[dtProperty_domain].properties.append(
+                Property(dtProperty_label, dtProperty_iri))
+    for objProperty in xml_tree.xpath('//owl:ObjectProperty', namespaces=namespaces):
+        objProperty_iri = objProperty.xpath(
+            '@rdf:about', namespaces=namespaces)[0]
+        objProperty_label = objProperty.xpath(
+            "rdfs:label", namespaces=namespaces)[0].text
+        objProperty_domain = objProperty.xpath(
+            "rdfs:domain/@rdf:resource", namespaces=namespaces)[0]
+        objProperty_range = objProperty.xpath(
+            "rdfs:range/@rdf:resource", namespaces=namespaces)[0]
+        objectPropertiesMetaData.append(ObjectPropertyMetaData(
+            objProperty_iri, objProperty_label, objProperty_domain, classesMetaData[objProperty_domain].label,
+            objProperty_range, classesMetaData[objProperty_range].label))
+    for _, cls_metadata in classesMetaData.items():
+        if len(cls_metadata.parentClass) > 0:
+            classesMetaData[cls_metadata.parentClass].properties.extend(
+                cls_metadata.properties)
+    return classesMetaData, objectPropertiesMetaData
+
+
+def describe(classesMetaData: dict[str, ClassMetaData], objectPropertiesMetaData: list[ObjectPropertyMetaData]) -> list:
+    """
+    Converts the metadata into plain values, for comparing the results of the two paths.
+    """
+    return [[(iri, cls.label, cls.parentClass, [(prop.label, prop.prop_iri) for prop in cls.properties])
+             for iri, cls in classesMetaData.items()],
+            [vars(prop) for prop in objectPropertiesMetaData]]
+
+
+def extract_with_iterparse(file_path: str) -> tuple[dict[str, ClassMetaData], list[ObjectPropertyMetaData]]:
+    """
+    The streaming extraction path of OntologyExtractor, without saving the metadata.
+    """
+    extractor = OntologyExtractor(file_path, '')
+    extractor.extract(file_path)
+    return extractor.classesMetaData, extractor.objectPropertiesMetaData
+
+
+def run_measured(function, file_path: str) -> tuple:
+    """
+    Runs an extraction path, and returns its metadata as plain values, its duration in seconds and the peak
+    resident memory of the process in KiB. It runs in a fresh process, so that the peak memory, which also
+    counts the memory of libxml2, belongs to this path only.
+    """
+    start_time = time.perf_counter()
+    result = function(file_path)
+    duration = time.perf_counter() - start_time
+    return describe(*result), duration, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(function, file_path: str) -> tuple:
+    """
+    Runs run_measured in a new worker process.
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run_measured, function, file_path).result()
+
+
+def main():
+    class_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as directory_path:
+        file_path = os.path.join(directory_path, 'ontology.owl')
+        generate_ontology(file_path, class_count)
+        print(
+            f"Ontology: {class_count} classes, {os.path.getsize(file_path) / (1 << 20):.1f} MiB")
+
+        legacy, legacy_duration, legacy_peak = measure(
+            extract_with_document_xpath, file_path)
+        result, duration, peak = measure(extract_with_iterparse, file_path)
+
+        if legacy != result:
+            raise RuntimeError('The two extraction paths give different metadata')
+        print(
+            f"fromstring + xpath: {legacy_duration:.2f} s, peak RSS {legacy_peak / 1024:.1f} MiB")
+        print(
+            f"iterparse + XPath:  {duration:.2f} s, peak RSS {peak / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+    Offline benchmark of the whole pipeline.
+    It generates a synthetic ontology, serves synthetic results for it from a local SPARQL stand-in, and times
+    OntologyExtractor, DBPediaCrawler and GraphDBGenerator one by one and end to end. Each run is done in a fresh
+    process, in a temporary folder, and reports its rows per second, output bytes per second and peak RSS.
+    Run it from the root folder of the project, for example:
+        python -m benchmarks.pipelineBenchmark --classes 200 --rows 5000 --limit 1000 --concurrency 4
+    With --output, the results are also appended to a JSON-lines file, so that runs can be compared over time.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.sparqlStandIn import SPARQLStandIn
+from benchmarks.syntheticOntology import generate_ontology
+
+stages = ['extract', 'crawl', 'generate', 'end-to-end']
+
+
+def get_directory_size(directory_path: str) -> int:
+    """
+    Returns the total size of the files in a folder, in bytes.
+    """
+    size = 0
+    for root, _, file_names in os.walk(directory_path):
+        for file_name in file_names:
+            size += os.path.getsize(os.path.join(root, file_name))
+    return size
+
+
+def count_crawled_rows(directory_path: str) -> int:
+    """
+    Returns the number of crawled records, from the item records of "data/manifest.jsonl".
+    """
+    rows = 0
+    with open(os.path.join(directory_path, 'data', 'manifest.jsonl'), 'r', encoding='utf8') as file:
+        for line in file:
+            record = json.loads(line)
+            if 'item' in record:
+                rows += record['total']
+    return rows
+
+
+def run_stage(stage: str, directory_path: str, ontology_path: str, endpoint: str, options: dict) -> dict:
+    """
+    Runs one stage of the pipeline, or all of them, in directory_path. It runs in a fresh process, so that its
+    peak RSS belongs to this stage only, and its output is discarded.
+
+    Parameters
+    ----------
+    stage: str
+        One of 'extract', 'crawl', 'generate' or 'end-to-end'.
+
+    directory_path: str
+        The folder that the pipeline runs in, with the output of the previous stages.
+
+    ontology_path: str
+        Path of the ontology.
+
+    endpoint: str
+        URL of the SPARQL stand-in.
+
+    options: dict
+        The crawler and generator options of the benchmark.
+
+    Returns
+    -------
+    dict
+        The duration in seconds, the number of rows, the output size in bytes and the peak RSS in KiB.
+    """
+    from lib.dbPediaCrawler import DBPediaCrawler
+    from lib.graphDBGenerator import GraphDBGenerator
+    from lib.ontologyExtractor import OntologyExtractor
+    from lib.pageSizer import PageSizer
+    from lib.stagingFormat import StagingFormat
+
+    os.chdir(directory_path)
+    sys.stdout = open(os.devnull, 'w')
+    DBPediaCrawler.endpoint = endpoint
+    DBPediaCrawler.limit = str(options['limit'])
+    start_time = time.perf_counter()
+    if stage in ('extract', 'end-to-end'):
+        extractor = OntologyExtractor(ontology_path, '')
+        extractor.start()
+    if stage in ('crawl', 'end-to-end'):
+        DBPediaCrawler(options['concurrency'], pagination=options['pagination'], count_mode=options['count_mode'],
+                       page_sizer=PageSizer(options['limit'], adaptive=options['adaptive_page_size']),
+                       staging_format=StagingFormat(options['staging_layout'], options['staging_compression']),
+                       result_format=options['result_format'], class_strategy=options['class_strategy']).start()
+    if stage in ('generate', 'end-to-end'):
+        GraphDBGenerator(options['cypher_mode'], options['batch_size'],
+                         workers=options['workers']).start()
+    duration = time.perf_counter() - start_time
+    if stage == 'extract':
+        rows = len(extractor.classesMetaData) + \
+            len(extractor.objectPropertiesMetaData)
+        size = get_directory_size('metadata')
+    else:
+        rows = count_crawled_rows(directory_path)
+        size = get_directory_size('data' if stage == 'crawl' else 'cypher')
+    return {'seconds': duration, 'rows': rows, 'bytes': size,
+            'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the pipeline offline, with a synthetic ontology and a local SPARQL stand-in.')
+    parser.add_argument('--classes', type=int, default=100,
+                        help='number of classes')
+    parser.add_argument('--properties', type=int, default=5,
+                        help='datatype properties per class')
+    parser.add_argument('--object-properties', type=int, default=2,
+                        help='object properties per class')
+    parser.add_argument('--depth', type=int, default=2,
+                        help='levels of each class hierarchy')
+    parser.add_argument('--rows', type=int, default=2000,
+                        help='rows of each class and object property')
+    parser.add_argument('--limit', type=int, default=1000,
+                        help='rows per page')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds that each response is delayed')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--pagination', default='offset',
+                        choices=['offset', 'keyset'])
+    parser.add_argument('--count-mode', default='exact',
+                        choices=['exact', 'estimate', 'none'])
+    parser.add_argument('--adaptive-page-size', action='store_true')
+    parser.add_argument('--class-strategy', default='single',
+                        choices=['single', 'split'])
+    parser.add_argument('--result-format', default='json',
+                        choices=['json', 'tsv'])
+    parser.add_argument('--staging-layout', default='json',
+                        choices=['json', 'ndjson'])
+    parser.add_argument('--staging-compression', default='none',
+                        choices=['none', 'gzip', 'zstd'])
+    parser.add_argument('--cypher-mode', default='create',
+                        choices=['create', 'unwind'])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes of the generator')
+    parser.add_argument('--output', help='JSON-lines file that the results are appended to')
+    args = parser.parse_args()
+    options = vars(args)
+
+    spawn_context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory_path:
+        ontology_path = os.path.join(directory_path, 'ontology.owl')
+        roots = generate_ontology(ontology_path, args.classes, args.properties, args.object_properties,
+                                  args.depth)
+        stand_in = SPARQLStandIn(roots, args.rows, args.latency)
+        endpoint = stand_in.start()
+        results = []
+        try:
+            for stage in stages:
+                stage_path = os.path.join(
+                    directory_path, 'end-to-end' if stage == 'end-to-end' else 'pipeline')
+                os.makedirs(stage_path, exist_ok=True)
+                requests_before, bytes_before = stand_in.requests, stand_in.bytes_sent
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn_context) as executor:
+                    result = executor.submit(
+                        run_stage, stage, stage_path, ontology_path, endpoint, options).result()
+                result['stage'] = stage
+                result['requests'] = stand_in.requests - requests_before
+                result['response_bytes'] = stand_in.bytes_sent - bytes_before
+                results.append(result)
+        finally:
+            stand_in.stop()
+
+    print(f"{'Stage':<12}{'Seconds':>10}{'Rows':>12}{'Rows/s':>12}{'Output MiB':>12}{'MiB/s':>10}{'Peak RSS MiB':>14}"
+          f"{'Requests':>10}{'HTTP MiB':>10}")
+    for result in results:
+        seconds = max(result['seconds'], 1e-9)
+        print(f"{result['stage']:<12}{result['seconds']:>10.2f}{result['rows']:>12,}{result['rows'] / seconds:>12,.0f}"
+              f"{result['bytes'] / (1 << 20):>12.1f}{result['bytes'] / (1 << 20) / seconds:>10.1f}"
+              f"{result['peak_rss_kib'] / 1024:>14.1f}{result['requests']:>10,}{result['response_bytes'] / (1 << 20):>10.1f}")
+    if args.output:
+        with open(args.output, 'a', encoding='utf8') as file:
+            for result in results:
+                file.write(json.dumps(
+                    {'time': time.time(), 'options': options, **result}) + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+    Offline benchmark of the SPARQL result formats of the crawler.
+    It builds the same class and object property pages as SPARQL JSON and SPARQL TSV results, with the local SPARQL
+    stand-in, and compares their payload size, the time to parse a whole response in the crawler, and the time to
+    read the values of a saved page in the generator. Run it from the root folder of the project, for example:
+        python -m benchmarks.resultFormatBenchmark --properties 20 --limit 10000 --pages 5
+    With --output, the results are also appended to a JSON-lines file, so that runs can be compared over time.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from benchmarks.sparqlStandIn import SPARQLStandIn
+from lib.sparqlJSONScanner import open_page
+from lib.sparqlTSVScanner import parse_tsv_results
+
+formats = ['json', 'tsv']
+
+
+def get_page_queries(properties: int, limit: int, pages: int) -> dict[str, list[str]]:
+    """
+    Returns the page queries of one class with properties datatype properties and of one object property, in the
+    shape of the queries of DBPediaCrawler.
+    """
+    property_vars = ' '.join(f"(SAMPLE(?property_0_{j}) AS ?property_0_{j})" for j in range(properties))
+    class_query = f"SELECT DISTINCT ?class0 {property_vars} (MAX(?Is_Class1) AS ?Is_Class1) " \
+        "WHERE { ?class0 a <http://dbpedia.org/ontology/Class0> } GROUP BY ?class0"
+    edge_query = "SELECT DISTINCT ?class0 ,?class1 WHERE { ?class0 <http://dbpedia.org/ontology/relation0_0> " \
+        "?class1 . ?class0 a <http://dbpedia.org/ontology/Class0> . ?class1 a <http://dbpedia.org/ontology/Class1> }"
+    return {kind: [f"{query} LIMIT {limit} OFFSET {i * limit}" for i in range(pages)]
+            for kind, query in (('node', class_query), ('edge', edge_query))}
+
+
+def measure(stand_in: SPARQLStandIn, queries: list[str], result_format: str, directory_path: str) -> dict:
+    """
+    Encodes the pages of queries in result_format, and times parsing them whole and reading their saved values.
+
+    Returns
+    -------
+    dict
+        The mean payload bytes, parse milliseconds and read milliseconds per page, and the rows per second of
+        both.
+    """
+    payload_bytes = 0
+    parse_seconds = 0.0
+    read_seconds = 0.0
+    rows = 0
+    file_path = os.path.join(directory_path, f"page.{result_format}")
+    for query in queries:
+        results = stand_in.answer(query)
+        if result_format == 'tsv':
+            payload = stand_in.to_tsv(results).encode('utf8')
+        else:
+            payload = json.dumps(results, indent=2).encode('utf8')
+        payload_bytes += len(payload)
+        start_time = time.perf_counter()
+        if result_format == 'tsv':
+            parse_tsv_results(payload)
+        else:
+            json.loads(payload)
+        parse_seconds += time.perf_counter() - start_time
+        with open(file_path, 'wb') as file:
+            file.write(payload)
+        start_time = time.perf_counter()
+        for _ in open_page(file_path).values():
+            rows += 1
+        read_seconds += time.perf_counter() - start_time
+    pages = max(len(queries), 1)
+    return {'page_bytes': payload_bytes / pages, 'parse_ms': parse_seconds * 1000 / pages,
+            'read_ms': read_seconds * 1000 / pages, 'parse_rows_per_second': rows / max(parse_seconds, 1e-9),
+            'read_rows_per_second': rows / max(read_seconds, 1e-9)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compares the SPARQL JSON and TSV result formats on synthetic pages.')
+    parser.add_argument('--properties', type=int, default=10,
+                        help='datatype properties of the class')
+    parser.add_argument('--limit', type=int, default=10000,
+                        help='rows per page')
+    parser.add_argument('--pages', type=int, default=3,
+                        help='pages of the class and of the object property')
+    parser.add_argument('--output', help='JSON-lines file that the results are appended to')
+    args = parser.parse_args()
+    options = vars(args)
+
+    roots = {'http://dbpedia.org/ontology/Class0': 'http://dbpedia.org/ontology/Class0',
+             'http://dbpedia.org/ontology/Class1': 'http://dbpedia.org/ontology/Class0'}
+    stand_in = SPARQLStandIn(roots, args.limit * args.pages)
+    results = []
+    with tempfile.TemporaryDirectory() as directory_path:
+        for kind, queries in get_page_queries(args.properties, args.limit, args.pages).items():
+            for result_format in formats:
+                result = measure(stand_in, queries, result_format, directory_path)
+                result['kind'] = kind
+                result['format'] = result_format
+                results.append(result)
+
+    print(f"{'Pages':<8}{'Format':<8}{'KiB/page':>12}{'Parse ms':>12}{'Parse rows/s':>15}{'Read ms':>12}"
+          f"{'Read rows/s':>15}")
+    for result in results:
+        print(f"{result['kind']:<8}{result['format']:<8}{result['page_bytes'] / 1024:>12,.1f}{result['parse_ms']:>12.1f}"
+              f"{result['parse_rows_per_second']:>15,.0f}{result['read_ms']:>12.1f}{result['read_rows_per_second']:>15,.0f}")
+    if args.output:
+        with open(args.output, 'a', encoding='utf8') as file:
+            for result in results:
+                file.write(json.dumps(
+                    {'time': time.time(), 'options': options, **result}) + '\n')
+
+
+if __name__ == "__main__":
+    main()
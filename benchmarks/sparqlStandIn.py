@@ -0,0 +1,303 @@
+"""
+    A local stand-in for the DBPedia SPARQL endpoint, which serves deterministic synthetic results for the
+    queries of DBPediaCrawler, so that the pipeline can be benchmarked without the network.
+"""
+
+import gzip
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class SPARQLStandIn:
+    """
+    A Python class for serving synthetic SPARQL JSON or TSV results from a local HTTP server.
+
+    ...
+
+    Every class and object property has the same number of rows. The instances of a class hierarchy are
+    "http://dbpedia.org/resource/<Root>_<index>", so edges point at the nodes of the root classes of their domain
+    and range. Class rows have a literal for each property variable and a 0 or 1 value for each Is_ variable, and
+    each subject of an object property has one object. Rows are ordered by their IRI, and the server honours COUNT,
+    LIMIT, OFFSET, the first condition of a keyset FILTER and an upper bound STR(?x) <= "...", so offset and
+    keyset pagination give the same rows. A query which selects only the class variable, such as a subject query
+    or a subclass flag query of the 'split' class query strategy, returns the instances of the class, or the
+    instances whose Is_ flag is 1 when the WHERE expression only types the variable with a class and then with
+    its subclass.
+    Requests which accept text/tab-separated-values get the same result as SPARQL TSV, and requests which accept
+    gzip get a compressed response. Connections are kept alive between requests.
+
+    Attributes
+    ----------
+    roots: dict[str, str]
+        The IRI of the root class of each class.
+
+    rows: int
+        Number of rows of each class and object property.
+
+    latency: float
+        Number of seconds that each response is delayed.
+
+    failure_rate: float
+        Fraction of the requests which are answered with 503 Service Unavailable.
+
+    requests: int
+        Number of requests which are served.
+
+    bytes_sent: int
+        Number of response body bytes which are sent, after compression.
+
+    Methods
+    -------
+    start() -> str:
+        Starts the server in a background thread, and returns its endpoint URL.
+
+    stop() -> None:
+        Stops the server.
+
+    answer(query: str) -> dict:
+        Returns the SPARQL JSON result of a query.
+
+    to_tsv(results: dict) -> str:
+        Returns a SPARQL JSON result as a SPARQL TSV result.
+    """
+
+    count_pattern = re.compile(r'COUNT\s*\(\s*(?:DISTINCT\s+)?\?(\w+)\s*\)')
+    select_pattern = re.compile(r'SELECT\s+DISTINCT(.*?)WHERE', re.S)
+    variable_pattern = re.compile(r'AS \?(\w+)\)|\?(\w+)')
+    type_pattern = re.compile(r'\?(\w+)\s+a\s+<([^>]+)>')
+    limit_pattern = re.compile(r'LIMIT\s+(\d+)')
+    offset_pattern = re.compile(r'OFFSET\s+(\d+)')
+    filter_pattern = re.compile(r'STR\(\?\w+\)\s*>\s*("(?:[^"\\]|\\.)*")')
+    upper_pattern = re.compile(r'STR\(\?\w+\)\s*<=\s*("(?:[^"\\]|\\.)*")')
+    flag_pattern = re.compile(r'WHERE\s*\{\s*\?(\w+)\s+a\s+<[^>]+>\s*\.\s*\?\1\s+a\s+<([^>]+)>\s*\.\s*FILTER')
+
+    def __init__(self, roots: dict[str, str], rows: int, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0) -> None:
+        """
+        Initializes the stand-in, without starting the server.
+
+        Parameters
+        ----------
+        roots: dict[str, str]
+            The IRI of the root class of each class, as returned by generate_ontology.
+
+        rows: int
+            Number of rows of each class and object property.
+
+        latency: float
+            Number of seconds that each response is delayed.
+
+        failure_rate: float
+            Fraction of the requests which are answered with 503 Service Unavailable.
+
+        seed: int
+            Seed of the failures.
+        """
+        self.roots = roots
+        self.rows = rows
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.server: ThreadingHTTPServer = None
+
+    def start(self) -> str:
+        """
+        Starts the server on a free local port, in a background thread.
+
+        Returns
+        -------
+        str
+            The endpoint URL.
+        """
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                stand_in.handle(self, parse_qs(
+                    urlparse(self.path).query).get('query', [''])[0])
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(
+                    int(self.headers.get('Content-Length', 0))).decode('utf8')
+                stand_in.handle(self, parse_qs(body).get('query', [''])[0])
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}/sparql"
+
+    def stop(self) -> None:
+        """
+        Stops the server.
+
+        Parameters
+        ----------
+        None
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def handle(self, handler: BaseHTTPRequestHandler, query: str) -> None:
+        """
+        Answers one HTTP request, after the latency, with a result or a failure.
+
+        Parameters
+        ----------
+        handler: BaseHTTPRequestHandler
+            The handler of the request.
+
+        query: str
+            The SPARQL query of the request.
+        """
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests += 1
+            failed = self.failure_rate > 0 and self.random.random() < self.failure_rate
+        if failed:
+            handler.send_response(503)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+        if 'text/tab-separated-values' in handler.headers.get('Accept', ''):
+            content_type = 'text/tab-separated-values; charset=utf-8'
+            body = self.to_tsv(self.answer(query)).encode('utf8')
+        else:
+            content_type = 'application/sparql-results+json'
+            body = json.dumps(self.answer(query)).encode('utf8')
+        compressed = 'gzip' in handler.headers.get('Accept-Encoding', '')
+        if compressed:
+            body = gzip.compress(body, 1)
+        with self.lock:
+            self.bytes_sent += len(body)
+        handler.send_response(200)
+        handler.send_header('Content-Type', content_type)
+        if compressed:
+            handler.send_header('Content-Encoding', 'gzip')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def get_instance(self, cls_iri: str, index: int) -> str:
+        """
+        Returns the IRI of an instance of a class, which is named after its root class.
+        """
+        root_iri = self.roots.get(cls_iri, cls_iri)
+        return f"http://dbpedia.org/resource/{root_iri.rsplit('/', 1)[-1]}_{index:08d}"
+
+    def answer(self, query: str) -> dict:
+        """
+        Returns the SPARQL JSON result of a COUNT query or a page query of DBPediaCrawler.
+
+        Parameters
+        ----------
+        query: str
+            The SPARQL query.
+
+        Returns
+        -------
+        dict
+            The SPARQL JSON result.
+        """
+        if self.count_pattern.search(query) is not None:
+            return {"head": {"vars": ["callret-0"]},
+                    "results": {"bindings": [{"callret-0": {"type": "typed-literal", "value": str(self.rows)}}]}}
+        variables = []
+        for variable in self.variable_pattern.findall(self.select_pattern.search(query).group(1)):
+            variable = variable[0] or variable[1]
+            if variable not in variables:
+                variables.append(variable)
+        types = dict()
+        for variable, type_iri in self.type_pattern.findall(query):
+            types.setdefault(variable, type_iri)
+        indexes = range(self.rows)
+        filter_match = self.filter_pattern.search(query)
+        if filter_match is not None:
+            last_iri = json.loads(filter_match.group(1))
+            subject_iri = types.get(variables[0], '')
+            indexes = [index for index in indexes if self.get_instance(
+                subject_iri, index) > last_iri]
+        upper_match = self.upper_pattern.search(query)
+        if upper_match is not None:
+            upper_iri = json.loads(upper_match.group(1))
+            subject_iri = types.get(variables[0], '')
+            indexes = [index for index in indexes if self.get_instance(
+                subject_iri, index) <= upper_iri]
+        offset_match = self.offset_pattern.search(query)
+        offset = int(offset_match.group(1)) if offset_match is not None else 0
+        limit = int(self.limit_pattern.search(query).group(1))
+        bindings = []
+        if 'GROUP BY' in query:
+            cls_iri = types.get(variables[0], '')
+            for index in indexes[offset:offset + limit]:
+                subject = self.get_instance(cls_iri, index)
+                binding = {variables[0]: {"type": "uri", "value": subject}}
+                for variable in variables[1:]:
+                    if variable.startswith('Is_'):
+                        flag = zlib.crc32(f"{variable} {index}".encode()) % 3 == 0
+                        binding[variable] = {"type": "typed-literal", "value": '1' if flag else '0'}
+                    else:
+                        binding[variable] = {"type": "literal", "value": f"{variable} of {subject[28:]}"}
+                bindings.append(binding)
+        elif len(variables) == 1:
+            cls_iri = types.get(variables[0], '')
+            flag_match = self.flag_pattern.search(query)
+            if flag_match is not None:
+                flag = f"Is_{flag_match.group(2).rsplit('/', 1)[-1]}"
+                indexes = [index for index in indexes if zlib.crc32(f"{flag} {index}".encode()) % 3 == 0]
+            for index in indexes[offset:offset + limit]:
+                bindings.append({variables[0]: {"type": "uri", "value": self.get_instance(cls_iri, index)}})
+        else:
+            domain_iri = types.get(variables[0], '')
+            range_iri = types.get(variables[1], '')
+            for index in indexes[offset:offset + limit]:
+                bindings.append({variables[0]: {"type": "uri", "value": self.get_instance(domain_iri, index)},
+                                 variables[1]: {"type": "uri", "value": self.get_instance(range_iri, index * 7 % self.rows)}})
+        return {"head": {"vars": variables}, "results": {"bindings": bindings}}
+
+    def to_tsv(self, results: dict) -> str:
+        """
+        Returns a SPARQL JSON result as a SPARQL TSV result, with IRIs in angle brackets, literals in quotes and
+        typed literals, which are all integers here, without quotes.
+
+        Parameters
+        ----------
+        results: dict
+            The SPARQL JSON result.
+
+        Returns
+        -------
+        str
+            The SPARQL TSV result.
+        """
+        variables = results["head"]["vars"]
+        lines = ['\t'.join(f"?{variable}" for variable in variables)]
+        for binding in results["results"]["bindings"]:
+            terms = []
+            for variable in variables:
+                term = binding.get(variable)
+                if term is None:
+                    terms.append('')
+                elif term["type"] == "uri":
+                    terms.append(f"<{term['value']}>")
+                elif term["type"] == "typed-literal":
+                    terms.append(term["value"])
+                else:
+                    terms.append(json.dumps(term["value"], ensure_ascii=False))
+            lines.append('\t'.join(terms))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,79 @@
+"""
+    Generator of synthetic RDF/XML ontologies with the structure of DBPedia, for the benchmarks.
+"""
+
+
+def generate_ontology(file_path: str, class_count: int, properties_per_class: int = 5, object_properties_per_class: int = 2,
+                      depth: int = 2, subclasses_per_root: int = 3) -> dict[str, str]:
+    """
+    Writes an ontology with class_count classes. The classes are split into hierarchies of one root class and
+    subclasses_per_root subclasses, which are spread over depth levels, so that every subclass is at most
+    depth - 1 levels below its root. Each class has properties_per_class datatype properties and
+    object_properties_per_class object properties, whose ranges are spread over the other classes.
+
+    Parameters
+    ----------
+    file_path: str
+        Path of the generated ontology.
+
+    class_count: int
+        Number of classes.
+
+    properties_per_class: int
+        Number of datatype properties of each class.
+
+    object_properties_per_class: int
+        Number of object properties whose domain is each class.
+
+    depth: int
+        Number of levels of each class hierarchy. With 1, all classes are root classes.
+
+    subclasses_per_root: int
+        Number of subclasses of each root class, at all levels.
+
+    Returns
+    -------
+    dict[str, str]
+        The IRI of the root class of each class.
+    """
+    roots = dict()
+    with open(file_path, 'w', encoding='utf8') as file:
+        file.write('<?xml version="1.0"?>\n'
+                   '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"\n'
+                   '         xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"\n'
+                   '         xmlns:owl="http://www.w3.org/2002/07/owl#">\n')
+        group_size = 1 + (subclasses_per_root if depth > 1 else 0)
+        last_at_level = []
+        for i in range(class_count):
+            class_iri = f"http://dbpedia.org/ontology/Class{i}"
+            position = i % group_size
+            file.write(f'    <owl:Class rdf:about="{class_iri}">\n'
+                       f'        <rdfs:label>Class{i}</rdfs:label>\n')
+            if position == 0:
+                last_at_level = [class_iri]
+                roots[class_iri] = class_iri
+            else:
+                level = (position - 1) % (depth - 1) + 1
+                parent_iri = last_at_level[level - 1]
+                last_at_level = last_at_level[:level] + [class_iri]
+                roots[class_iri] = last_at_level[0]
+                file.write(
+                    f'        <rdfs:subClassOf rdf:resource="{parent_iri}"/>\n')
+            file.write('    </owl:Class>\n')
+            for j in range(properties_per_class):
+                file.write(f'    <owl:DatatypeProperty rdf:about="http://dbpedia.org/ontology/property{i}_{j}">\n'
+                           f'        <rdfs:label>Property {i} {j}</rdfs:label>\n'
+                           f'        <rdfs:domain rdf:resource="{class_iri}"/>\n'
+                           f'        <rdfs:range rdf:resource="http://www.w3.org/2001/XMLSchema#string"/>\n'
+                           '    </owl:DatatypeProperty>\n')
+            for j in range(object_properties_per_class):
+                range_index = (i * 7 + j + 1) % class_count
+                if range_index == i:
+                    range_index = (i + 1) % class_count
+                file.write(f'    <owl:ObjectProperty rdf:about="http://dbpedia.org/ontology/relation{i}_{j}">\n'
+                           f'        <rdfs:label>Relation {i} {j}</rdfs:label>\n'
+                           f'        <rdfs:domain rdf:resource="{class_iri}"/>\n'
+                           f'        <rdfs:range rdf:resource="http://dbpedia.org/ontology/Class{range_index}"/>\n'
+                           '    </owl:ObjectProperty>\n')
+        file.write('</rdf:RDF>\n')
+    return roots
@@ -0,0 +1,314 @@
+import json
+import os
+import threading
+from lib.utils import hash_file
+
+
+class CrawlManifest:
+    """
+    A Python class for recording the progress of a crawl, so that an interrupted crawl can be resumed.
+
+    ...
+
+    The manifest is an append-only journal in JSON-lines format. Each line records a finished page, a failed page
+    or a finished item (a class or an object property). When the same page or item is recorded more than once,
+    the last line wins. Since lines are only appended and flushed one at a time, a killed process loses at most
+    its last line, which is ignored when the manifest is loaded again. A line break is appended after such a
+    truncated line, so that the next record starts on a line of its own. The file of a page which was finished
+    by a previous crawl is checked against its recorded size and SHA-256 hash the first time it is looked up,
+    so a resumed crawl fetches a page again if its file was changed in between.
+
+    A crawl whose pages are not saved keeps its records in memory only, since there are no page files to resume
+    from.
+
+    Attributes
+    ----------
+    file_path: str
+        Path of the manifest file.
+
+    pages: dict[str, dict]
+        The last record of each page, with the relative page path as the key.
+
+    items: dict[str, dict]
+        The last record of each item, with the relative item folder as the key.
+
+    verified_pages: set[str]
+        The finished pages whose file is known to match its record, because it was written by this crawl or its
+        hash was already checked.
+
+    Methods
+    -------
+    get_finished_page(page: str, query_hash: str) -> dict:
+        Returns the record of a page, if it is finished with the same query and its file is intact.
+
+    page_finished(page: str, query_hash: str, rows: int, size: int, sha256: str, last_key: list[str], limit: int) -> None:
+        Records a finished page.
+
+    page_failed(page: str, query_hash: str, error: str) -> None:
+        Records a failed page.
+
+    get_finished_item(item: str, query_hash: str) -> dict:
+        Returns the record of an item, if it is finished with the same query.
+
+    item_finished(item: str, query_hash: str, total: int, pages: int) -> None:
+        Records a finished item.
+
+    get_item_pages(item: str) -> dict[str, dict]:
+        Returns the records of the finished pages of an item.
+
+    close() -> None:
+        Closes the manifest file.
+    """
+
+    def __init__(self, data_directory: str, resume: bool, persistent: bool = True) -> None:
+        """
+        Opens the manifest of the given data folder. If resume is set, the records of the previous crawl are
+        loaded, otherwise the previous manifest is discarded.
+
+        Parameters
+        ----------
+        data_directory: str
+            The folder that crawled pages are saved into.
+
+        resume: bool
+            Whether the records of the previous crawl are kept.
+
+        persistent: bool
+            Whether records are written into the manifest file. Without it, no file is written, and the crawl can
+            not be resumed.
+        """
+
+        self.data_directory = data_directory
+        self.file_path = os.path.join(data_directory, 'manifest.jsonl')
+        self.pages: dict[str, dict] = dict()
+        self.items: dict[str, dict] = dict()
+        self.verified_pages: set[str] = set()
+        self.lock = threading.Lock()
+        self.file = None
+        if not persistent:
+            return
+        os.makedirs(data_directory, exist_ok=True)
+        if resume and os.path.exists(self.file_path):
+            with open(self.file_path, 'r', encoding='utf8') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if 'page' in record:
+                        self.pages[record['page']] = record
+                    elif 'item' in record:
+                        self.items[record['item']] = record
+        elif os.path.exists(self.file_path):
+            os.remove(self.file_path)
+        self.file = open(self.file_path, 'a', encoding='utf8')
+        if self.file.tell() > 0:
+            with open(self.file_path, 'rb') as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b'\n':
+                    self.write_line('')
+
+    def get_finished_page(self, page: str, query_hash: str) -> dict:
+        """
+        Returns the record of a page, if it was finished with the same query and its file still has the
+        recorded size. If the page was finished by a previous crawl, the SHA-256 hash of its file is also compared
+        with the recorded one, once. Otherwise it returns None, which means the page has to be fetched again.
+
+        Parameters
+        ----------
+        page: str
+            Path of the page, relative to the data folder.
+
+        query_hash: str
+            Hash of the page query.
+
+        Returns
+        -------
+        dict
+            The page record, or None.
+        """
+
+        record = self.pages.get(page)
+        if record is None or record['status'] != 'finished' or record['query'] != query_hash:
+            return None
+        file_path = os.path.join(self.data_directory, page)
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != record['size']:
+            return None
+        if page not in self.verified_pages:
+            if hash_file(file_path) != record['sha256']:
+                return None
+            self.verified_pages.add(page)
+        return record
+
+    def page_finished(self, page: str, query_hash: str, rows: int, size: int, sha256: str, last_key: list[str] = None,
+                      limit: int = None) -> None:
+        """
+        Records a finished page.
+
+        Parameters
+        ----------
+        page: str
+            Path of the page, relative to the data folder.
+
+        query_hash: str
+            Hash of the page query.
+
+        rows: int
+            Number of rows in the page.
+
+        size: int
+            Size of the page file in bytes.
+
+        sha256: str
+            SHA-256 hash of the page file.
+
+        last_key: list[str]
+            Key of the last row, which is required for resuming keyset pagination.
+
+        limit: int
+            The page size of the query, which is required for resuming pages whose size varies.
+        """
+
+        record = {'page': page, 'status': 'finished', 'query': query_hash, 'rows': rows,
+                  'size': size, 'sha256': sha256, 'last_key': last_key}
+        if limit is not None:
+            record['limit'] = limit
+        self.write(record)
+
+    def page_failed(self, page: str, query_hash: str, error: str) -> None:
+        """
+        Records a failed page.
+
+        Parameters
+        ----------
+        page: str
+            Path of the page, relative to the data folder.
+
+        query_hash: str
+            Hash of the page query.
+
+        error: str
+            The error message.
+        """
+
+        self.write({'page': page, 'status': 'failed',
+                   'query': query_hash, 'error': error})
+
+    def get_finished_item(self, item: str, query_hash: str) -> dict:
+        """
+        Returns the record of an item, if it was finished with the same query and all of its pages are still
+        finished and intact, as get_finished_page checks them. Otherwise it returns None, and the item is crawled
+        again, which only fetches its missing or failed pages.
+
+        Parameters
+        ----------
+        item: str
+            Folder of the item, relative to the data folder.
+
+        query_hash: str
+            Hash of the item query.
+
+        Returns
+        -------
+        dict
+            The item record, or None.
+        """
+
+        record = self.items.get(item)
+        if record is None or record['query'] != query_hash:
+            return None
+        for index in range(record['pages'] or 0):
+            page = self.pages.get(f'{item}/{index}')
+            if page is None or self.get_finished_page(page['page'], page['query']) is None:
+                return None
+        return record
+
+    def item_finished(self, item: str, query_hash: str, total: int, pages: int) -> None:
+        """
+        Records a finished item.
+
+        Parameters
+        ----------
+        item: str
+            Folder of the item, relative to the data folder.
+
+        query_hash: str
+            Hash of the item query.
+
+        total: int
+            Number of records of the item.
+
+        pages: int
+            Number of pages of the item.
+        """
+
+        self.write({'item': item, 'status': 'finished',
+                   'query': query_hash, 'total': total, 'pages': pages})
+
+    def get_item_pages(self, item: str) -> dict[str, dict]:
+        """
+        Returns the records of the finished pages of an item.
+
+        Parameters
+        ----------
+        item: str
+            Folder of the item, relative to the data folder.
+
+        Returns
+        -------
+        dict[str, dict]
+            The page records, with the page file name as the key.
+        """
+
+        prefix = item + '/'
+        with self.lock:
+            return {page[len(prefix):]: record for page, record in self.pages.items()
+                    if page.startswith(prefix) and record['status'] == 'finished'}
+
+    def write(self, record: dict) -> None:
+        """
+        Appends a record to the manifest file and flushes it to disk, if the manifest is persistent.
+
+        Parameters
+        ----------
+        record: dict
+            The page or item record.
+        """
+
+        with self.lock:
+            if 'page' in record:
+                self.pages[record['page']] = record
+                if record['status'] == 'finished':
+                    self.verified_pages.add(record['page'])
+                else:
+                    self.verified_pages.discard(record['page'])
+            else:
+                self.items[record['item']] = record
+            if self.file is not None:
+                self.write_line(json.dumps(record, ensure_ascii=False))
+
+    def write_line(self, line: str) -> None:
+        """
+        Appends a line to the manifest file and flushes it to disk.
+
+        Parameters
+        ----------
+        line: str
+            The line, without a line break.
+        """
+
+        self.file.write(line + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        """
+        Closes the manifest file.
+
+        Parameters
+        ----------
+        None
+        """
+
+        if self.file is not None:
+            self.file.close()
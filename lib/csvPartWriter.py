@@ -0,0 +1,103 @@
+import csv
+import os
+
+
+class CSVPartWriter:
+    """
+    A Python class for writing a large CSV table as a header file and a series of part files, for
+    neo4j-admin database import.
+
+    ...
+
+    neo4j-admin reads the header of a node or relationship group from its first file, so the header is written
+    into "<name>_header.csv", and the rows into "<name>_part<N>.csv" files which have at most rows_per_part rows
+    each. Rows are written through a buffered writer as they come, so memory stays bounded regardless of the
+    size of the table.
+
+    Attributes
+    ----------
+    directory_path: str
+        The folder that the files are written into.
+
+    name: str
+        Prefix of the file names, for example nodes_FILM.
+
+    rows_per_part: int
+        Maximum number of rows in a part file.
+
+    file_names: list[str]
+        Names of the header file and the part files, in order.
+
+    Methods
+    -------
+    write_row(row: list[str]) -> None:
+        Writes a row into the current part, and starts a new part if it is full.
+
+    close() -> None:
+        Closes the current part.
+    """
+
+    buffer_size = 1 << 20
+
+    def __init__(self, directory_path: str, name: str, header: list[str], rows_per_part: int) -> None:
+        """
+        Writes the header file. The first part is created when the first row is written.
+
+        Parameters
+        ----------
+        directory_path: str
+            The folder that the files are written into.
+
+        name: str
+            Prefix of the file names.
+
+        header: list[str]
+            The neo4j-admin header, for example ['IRI:ID', ':LABEL', 'name'].
+
+        rows_per_part: int
+            Maximum number of rows in a part file.
+        """
+
+        self.directory_path = directory_path
+        self.name = name
+        self.rows_per_part = max(1, int(rows_per_part))
+        self.file_names = [f"{name}_header.csv"]
+        self.file = None
+        self.writer = None
+        self.rows_in_part = 0
+        with open(os.path.join(directory_path, self.file_names[0]), "w", newline='', encoding='utf8') as file:
+            csv.writer(file).writerow(header)
+
+    def write_row(self, row: list[str]) -> None:
+        """
+        Writes a row into the current part. If the part is full, it is closed and a new part is started.
+
+        Parameters
+        ----------
+        row: list[str]
+            Values of the row, in the order of the header.
+        """
+
+        if self.file is None or self.rows_in_part >= self.rows_per_part:
+            self.close()
+            self.file_names.append(
+                f"{self.name}_part{len(self.file_names) - 1}.csv")
+            self.file = open(os.path.join(self.directory_path, self.file_names[-1]), "w", newline='',
+                             encoding='utf8', buffering=self.buffer_size)
+            self.writer = csv.writer(self.file)
+            self.rows_in_part = 0
+        self.writer.writerow(row)
+        self.rows_in_part += 1
+
+    def close(self) -> None:
+        """
+        Closes the current part, if there is one.
+
+        Parameters
+        ----------
+        None
+        """
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,120 @@
+from typing import TextIO
+from lib.utils import *
+
+
+class CypherBatchWriter:
+    """
+    A Python class for writing rows as batched, parameterized cypher statements.
+
+    ...
+
+    Rows are grouped by the statement that consumes them, for example all nodes with the same set of labels,
+    or all edges with the same relationship type. Each group is written as a batch of at most batch_size rows,
+    in a form that cypher-shell can run:
+
+        :param rows => [{`IRI`: "...", `name`: "..."}, ...]
+        UNWIND $rows AS row CREATE (n:FILM) SET n = row;
+
+    so Neo4j parses one query string per group instead of one per record, and each batch runs in its own
+    transaction.
+
+    Attributes
+    ----------
+    files: list[TextIO]
+        The files that batches are written into.
+
+    batch_size: int
+        Maximum number of rows in a batch.
+
+    Methods
+    -------
+    add(statement: str, row: dict) -> None:
+        Adds a row to the batch of a statement, and writes the batch if it is full.
+
+    add_literal(statement: str, row: str) -> None:
+        Adds a row which is already converted to a cypher literal.
+
+    flush() -> None:
+        Writes all batches which are not written yet.
+    """
+
+    def __init__(self, files: list[TextIO], batch_size: int) -> None:
+        """
+        Initializes the writer with no pending rows.
+
+        Parameters
+        ----------
+        files: list[TextIO]
+            The files that batches are written into.
+
+        batch_size: int
+            Maximum number of rows in a batch.
+        """
+
+        self.files = files
+        self.batch_size = max(1, int(batch_size))
+        self.batches: dict[str, list[str]] = dict()
+
+    def add(self, statement: str, row: dict) -> None:
+        """
+        Adds a row to the batch of a statement. The statement reads the rows from the $rows parameter.
+
+        Parameters
+        ----------
+        statement: str
+            The cypher statement which consumes the rows, starting with UNWIND $rows AS row.
+
+        row: dict
+            The row, which is a map of property names to values.
+        """
+
+        self.add_literal(statement, to_cypher_literal(row))
+
+    def add_literal(self, statement: str, row: str) -> None:
+        """
+        Adds a row, which is already converted to a cypher literal, to the batch of a statement.
+
+        Parameters
+        ----------
+        statement: str
+            The cypher statement which consumes the rows, starting with UNWIND $rows AS row.
+
+        row: str
+            The row, as a cypher map literal.
+        """
+
+        batch = self.batches.setdefault(statement, [])
+        batch.append(row)
+        if len(batch) >= self.batch_size:
+            self.write_batch(statement, batch)
+            del self.batches[statement]
+
+    def flush(self) -> None:
+        """
+        Writes all batches which are not written yet.
+
+        Parameters
+        ----------
+        None
+        """
+
+        for statement, batch in self.batches.items():
+            self.write_batch(statement, batch)
+        self.batches.clear()
+
+    def write_batch(self, statement: str, batch: list[str]) -> None:
+        """
+        Writes one batch as a :param command followed by its statement.
+
+        Parameters
+        ----------
+        statement: str
+            The cypher statement which consumes the rows.
+
+        batch: list[str]
+            The rows, which are already converted to cypher literals.
+        """
+
+        script = f":param rows => [{', '.join(batch)}]\n{statement};\n"
+        for file in self.files:
+            file.write(script)
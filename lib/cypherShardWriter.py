@@ -0,0 +1,177 @@
+import gzip
+import io
+import os
+from lib.utils import hash_file
+
+
+class CypherShardWriter:
+    """
+    A Python class for writing the scripts of one phase of the graph, the nodes or the edges, into a series of
+    shard files of bounded size, instead of one "All.cypher" file.
+
+    ...
+
+    Scripts are written as they come, and a shard is closed when it reaches max_bytes bytes or max_statements
+    statements, at the end of a statement, so that every shard can run on its own. A statement is never split,
+    so a shard can be larger than the limits by the last statement. Shards are named "<phase>-<N>.cypher", or "<phase>-<N>.cypher.gz" with gzip compression,
+    which cypher-shell reads through zcat. The gzip header has no timestamp, so the same scripts give the same
+    checksum in every run. When a shard is closed, its file name, phase, number of statements, size and SHA-256
+    checksum are appended to shards, which the load manifest is written from.
+
+    Attributes
+    ----------
+    directory_path: str
+        The folder that the shards are written into.
+
+    phase: str
+        Either 'nodes' or 'edges', the prefix of the file names.
+
+    max_bytes: int
+        Maximum number of uncompressed bytes in a shard, zero for no limit.
+
+    max_statements: int
+        Maximum number of statements in a shard, zero for no limit.
+
+    compression: str
+        Either 'none' or 'gzip'.
+
+    shards: list[dict]
+        The records of the closed shards, in order.
+
+    Methods
+    -------
+    write(script: str) -> None:
+        Writes scripts into the current shard, and starts a new shard if it is full.
+
+    close() -> None:
+        Closes the current shard and records it.
+    """
+
+    buffer_size = 1 << 20
+    gzip_level = 6
+
+    def __init__(self, directory_path: str, phase: str, max_bytes: int = 0, max_statements: int = 0,
+                 compression: str = 'none', shards: list[dict] = None) -> None:
+        """
+        Initializes the writer. The first shard is created when the first script is written.
+
+        Parameters
+        ----------
+        directory_path: str
+            The folder that the shards are written into.
+
+        phase: str
+            Either 'nodes' or 'edges'.
+
+        max_bytes: int
+            Maximum number of uncompressed bytes in a shard, zero for no limit.
+
+        max_statements: int
+            Maximum number of statements in a shard, zero for no limit.
+
+        compression: str
+            Either 'none' or 'gzip'.
+
+        shards: list[dict]
+            The list that the records of the shards are appended to. A new list is used if it is not given.
+        """
+
+        if compression not in ('none', 'gzip'):
+            raise ValueError(f"Unknown shard compression: {compression}")
+        self.directory_path = directory_path
+        self.phase = phase
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_statements = max(0, int(max_statements))
+        self.compression = compression
+        self.shards = shards if shards is not None else []
+        self.index = sum(1 for shard in self.shards if shard['phase'] == phase)
+        self.file = None
+        self.file_name: str = None
+        self.bytes_in_shard = 0
+        self.statements_in_shard = 0
+        self.at_boundary = True
+        os.makedirs(directory_path, exist_ok=True)
+
+    def write(self, script: str) -> None:
+        """
+        Writes scripts into the current shard. If the shard is full and the scripts which are written so far end
+        with a complete statement, the shard is closed and the scripts start a new one. Line breaks alone always
+        go into the current shard.
+
+        Parameters
+        ----------
+        script: str
+            The scripts, which are one or more complete statements, or a part of a statement.
+        """
+
+        end = script.rstrip()
+        if end and self.at_boundary and (self.file is None or self.is_full()):
+            self.close()
+            self.open_shard()
+        elif self.file is None:
+            self.open_shard()
+        content = script.encode('utf8')
+        self.file.write(content)
+        self.bytes_in_shard += len(content)
+        if end:
+            self.statements_in_shard += script.count(';\n') + script.endswith(';')
+            self.at_boundary = end.endswith(';')
+
+    def is_full(self) -> bool:
+        """
+        Checks whether the current shard has reached one of the limits.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        bool
+            Whether a new shard should be started at the next statement.
+        """
+
+        return (0 < self.max_bytes <= self.bytes_in_shard) or (0 < self.max_statements <= self.statements_in_shard)
+
+    def open_shard(self) -> None:
+        """
+        Creates the next shard file.
+
+        Parameters
+        ----------
+        None
+        """
+
+        self.file_name = f"{self.phase}-{self.index:05d}.cypher" + ('.gz' if self.compression == 'gzip' else '')
+        self.index += 1
+        file_path = os.path.join(self.directory_path, self.file_name)
+        if self.compression == 'gzip':
+            self.file = io.BufferedWriter(gzip.GzipFile(file_path, 'wb', self.gzip_level, mtime=0), self.buffer_size)
+        else:
+            self.file = open(file_path, 'wb', buffering=self.buffer_size)
+        self.bytes_in_shard = 0
+        self.statements_in_shard = 0
+
+    def close(self) -> None:
+        """
+        Closes the current shard, if there is one, and appends its record to self.shards.
+
+        Parameters
+        ----------
+        None
+        """
+
+        if self.file is None:
+            return
+        self.file.close()
+        self.file = None
+        file_path = os.path.join(self.directory_path, self.file_name)
+        self.shards.append({'file': self.file_name, 'phase': self.phase, 'statements': self.statements_in_shard,
+                            'uncompressed_bytes': self.bytes_in_shard, 'bytes': os.path.getsize(file_path),
+                            'sha256': hash_file(file_path)})
+
+    def __enter__(self) -> 'CypherShardWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
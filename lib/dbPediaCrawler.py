@@ -1,10 +1,33 @@
-import pickle
+import copy
+import hashlib
 import shutil
-from SPARQLWrapper import SPARQLWrapper, JSON
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import urllib.error
+from SPARQLWrapper.SPARQLExceptions import EndPointInternalError
+from lib.crawlManifest import CrawlManifest
+from lib.metrics import Metrics
+from lib.pageSizer import PageSizer
+from lib.requestThrottle import ConnectTimeoutError, RequestThrottle
+from lib.responseCache import ResponseCache
+from lib.sharedCrawl import SharedCrawl
+from lib.sparqlJSONScanner import SPARQLJSONScanner
+from lib.sparqlTSVScanner import SPARQLTSVScanner, parse_tsv_results
+from lib.sparqlTransport import SPARQLTransport
+from lib.stagingFormat import StagingFormat
 from lib.utils import *
 import os
 import json
 import math
+from typing import BinaryIO, Callable
+
+
+class PartialResultError(RuntimeError):
+    """
+    Raised when the endpoint answers a query with a partial result, because the query ran out of time.
+    """
 
 
 class DBPediaCrawler:
@@ -20,6 +43,16 @@ class DBPediaCrawler:
     limit : str
         The limit-per-request specidifed by DBPedia for each SPARQL query, which is 10,000
 
+    endpoint : str
+        URL of the SPARQL endpoint of DBPedia.
+
+    chunk_size : int
+        Number of bytes which are read from a response at once, when responses are streamed to disk.
+
+    timeout : int
+        Number of seconds that a request may wait for the endpoint before it fails and is retried, unless a
+        transport is given.
+
     Methods
     -------
     start() -> None:
@@ -32,9 +65,74 @@ class DBPediaCrawler:
         Creates SPARQL query for retrieving object properties (or relations) between classes, 
         then runs the queries and saves data into JSON format.      
     
-    get_offset_count(cls_var_label: str, where_str: str) -> tuple[int,int]:
+    get_offset_count(cls_var_label: str, where_str: str, distinct: bool) -> tuple[int,int]:
         Counts the records per class or object property, which is required for pagination.
         It returns the count and the offset size.
+
+    crawl_item(item: str, var_label: str, select_str: str, where_str: str, estimate_str: str, key_vars: list[str],
+               group_by: bool, directory_path: str, progress_label: str, split_columns: list) -> None:
+        Counts and fetches all pages of one class or object property, unless it is already finished.
+
+    share_item(item: str, item_hash: str, shared_item: dict, directory_path: str, progress_label: str) -> None:
+        Links the pages of an item with the same query, which an earlier ontology of a batch fetched.
+
+    run_query(query: str, kind: str, retry_timeouts: bool) -> dict:
+        Runs a SPARQL query against the endpoint and returns the converted JSON result.
+
+    parse_response(response: bytes, kind: str, result_format: str) -> dict:
+        Parses a SPARQL JSON or TSV response into a SPARQL JSON result.
+
+    record_response(kind: str, source: str, size: int, seconds: float, result_format: str) -> None:
+        Records the latency and the size of a SPARQL response in the metrics.
+
+    fetch_pages(item: str, pages: list[tuple[str, str]], progress_prefix: str) -> None:
+        Runs the page queries concurrently and saves each result into its file.
+
+    fetch_pages_in_order(select_str: str, where_str: str, key_vars: list[str], group_by: bool,
+                         directory_path: str, offset_count: int, progress_prefix: str,
+                         split_columns: list) -> tuple[int, int]:
+        Pages through a class or object property one page after another, until a short page.
+
+    get_page_query(select_str: str, where_str: str, key_vars: list[str], group_by: bool, size: int,
+                   last_key: list[str], offset: int, pagination: str) -> str:
+        Returns the query of a page, which continues from the last key or from an offset.
+
+    is_timeout(error: Exception) -> bool:
+        Checks whether a page failed because the query ran out of time.
+
+    check_response(response: BinaryIO) -> None:
+        Raises PartialResultError if a response is a partial result.
+
+    open_query(query: str, result_format: str) -> BinaryIO:
+        Sends a SPARQL query to the endpoint and returns the HTTP response, without reading its body.
+
+    fetch_page(file_path: str, query: str, key_vars: list[str], page_size: int,
+               retry_timeouts: bool) -> tuple[int, list[str]]:
+        Runs the query of one page and saves its result, either parsed or streamed.
+
+    fetch_split_page(file_path: str, query: str, key_vars: list[str], page_size: int, split_columns: list,
+                     last_key: list[str], retry_timeouts: bool) -> tuple[int, list[str]]:
+        Runs the subject query of a split class page, fetches its columns in parallel and joins them by IRI.
+
+    fetch_column(var_label: str, column: tuple[str, str, bool], lower: str, upper: str, size: int,
+                 retry_timeouts: bool) -> dict:
+        Fetches one column of a split class page, for the subjects between two IRIs.
+
+    get_column_query(var_label: str, column: tuple[str, str, bool], lower: str, upper: str, size: int) -> str:
+        Returns a narrow query of one column of a split class page.
+
+    stream_page(file_path: str, query: str, key_vars: list[str], page_size: int,
+                retry_timeouts: bool) -> tuple[int, list[str]]:
+        Streams the response of a page query into its file in chunks, without parsing it.
+
+    save_page(file_path: str, query: str, results: dict, last_key: list[str], page_size: int) -> None:
+        Saves a page atomically and records it in the crawl manifest.
+
+    record_page(page: str, rows: int, size: int) -> None:
+        Records the rows and the size of a fetched page in the metrics.
+
+    emit_page(file_path: str, page) -> None:
+        Passes a page to the page consumer, if there is one.
     """
 
     namespace = """ 
@@ -43,44 +141,202 @@ class DBPediaCrawler:
                 PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
     """
     limit = '10000'
+    endpoint = 'https://dbpedia.org/sparql'
+    chunk_size = 1 << 20
+    timeout = 300
 
-    def __init__(self) -> None:
+    def __init__(self, concurrency: int = 1, *, pagination: str = 'offset', resume: bool = False,
+                 cache: ResponseCache = None, passthrough: bool = False, validate: bool = False,
+                 page_consumer: Callable = None, write_data: bool = True, metrics: Metrics = None,
+                 throttle: RequestThrottle = None, count_mode: str = 'exact', page_sizer: PageSizer = None,
+                 staging_format: StagingFormat = None, result_format: str = 'json',
+                 transport: SPARQLTransport = None, class_strategy: str = 'single',
+                 shared: SharedCrawl = None) -> None:
         """
         Here we populate self.classes and self.object_properties dictionries, from "metadata/Classes" and 
-        "metadata/Object Properties" files, respectively. We also delete the "data" folder, if it already exists.
+        "metadata/Object Properties" files, respectively, and self.index from "metadata/Index". We also delete the "data" folder, if it already exists,
+        unless we resume the previous crawl. All parameters after concurrency are keyword-only.
 
         Parameters
         ----------
-        None
+        concurrency: int
+            Maximum number of SPARQL requests that are sent to DBPedia at the same time. Pages of a class or
+            object property, and independent classes and object properties, are fetched in parallel, by a page
+            pool and an item pool of concurrency threads each. The item threads also send the COUNT queries, so
+            the two pools can have up to twice as many requests ready, but every request, pages and COUNT queries
+            alike, takes a slot of self.throttle, which keeps at most concurrency of them in flight.
+
+        pagination: str
+            Either 'offset', which pages with LIMIT/OFFSET, or 'keyset', which orders by the subject IRI and
+            continues from the last IRI seen. Keyset pages cost the same regardless of their position and are
+            deterministic, but the pages of one class or object property are fetched one after another.
+
+        resume: bool
+            Whether to resume the previous crawl. Pages and items which are recorded as finished in
+            "data/manifest.jsonl" are skipped, and only missing or failed pages are fetched again.
+
+        cache: ResponseCache
+            The on-disk cache of SPARQL responses. If it is given, queries which are already cached are not sent
+            to DBPedia again.
+
+        passthrough: bool
+            Whether responses are streamed to the page files as they are received, instead of being parsed and
+            serialized again.
+
+        validate: bool
+            Whether streamed responses are checked to be well-formed SPARQL JSON results, while they are written.
+
+        page_consumer: Callable
+            A function which is called with the metadata object, the file name and the page, which is its path
+            or its SPARQL JSON result, whenever a page is available, such as GraphDBGenerator.put_page. If it
+            is given, all classes are crawled before the first object property.
+
+        write_data: bool
+            Whether pages are saved into the "data" folder. Without it, pages are only passed to page_consumer,
+            the crawl manifest is only kept in memory, and the crawl can not be resumed.
+
+        metrics: Metrics
+            The metrics that SPARQL latencies, response sizes, rows per page and the time of each class and
+            object property are recorded into.
+
+        throttle: RequestThrottle
+            The rate and concurrency limit of requests to the endpoint, which also retries failed requests. By
+            default, requests are retried, and their concurrency adapts between 1 and concurrency. Its highest
+            concurrency limit is the real bound of the requests in flight, so a throttle which is given should not
+            allow more than concurrency.
+
+        count_mode: str
+            Either 'exact', which counts the records of each class and object property with COUNT(DISTINCT)
+            over the whole query before its pages are fetched, 'estimate', which only counts the instances of
+            the class or the triples of the object property, for the progress bar, or 'none', which does not
+            count. Without an exact count, pages are fetched one after another until a short page.
+
+        page_sizer: PageSizer
+            The page size of each class and object property is chosen by a copy of it. By default, all pages
+            have self.limit rows. An adaptive page size is only used for pages which are fetched one after
+            another, which are keyset pages and offset pages without an exact count.
+
+        staging_format: StagingFormat
+            The layout and compression of the saved pages. By default, pages are saved as indented SPARQL JSON
+            results. In passthrough mode, pages are always saved as they are received.
+
+        result_format: str
+            Either 'json' or 'tsv', the result format that pages are requested in. SPARQL TSV results are smaller
+            and faster to parse than SPARQL JSON results. In passthrough mode, they are saved as they are, and
+            GraphDBGenerator reads them line by line. COUNT queries are always requested in JSON.
+
+        transport: SPARQLTransport
+            The pool of persistent HTTP connections that queries are sent over, which is shared by all threads. By
+            default, it has one connection per thread, compressed responses and a read timeout of self.timeout.
+
+        class_strategy: str
+            Either 'single', which fetches each page of a class with one query that selects a sample of every
+            datatype property and a flag for every subclass, or 'split', which fetches the subjects of a page
+            first, and then each property and each subclass flag of the subjects with its own narrow query. The
+            narrow queries run in parallel on the page pool, and their results are joined by IRI into the same
+            rows. Split pages are always keyset pages, and are always parsed and saved, even in passthrough mode.
+
+        shared: SharedCrawl
+            The items which are already crawled by earlier ontologies of a batch run. An item with the same query
+            as one of them is not fetched, its pages are linked instead. Finished items are registered into it,
+            if pages are saved.
         """
 
         print('Step 2, Accessing DBPedia '.ljust(129, '#'))
         self.classes: dict[str, ClassMetaData] = dict()
         self.object_properties: list[ObjectPropertyMetaData] = []
-        self.wrapper = SPARQLWrapper("https://dbpedia.org/sparql")
+        self.concurrency = max(1, int(concurrency))
+        if pagination not in ('offset', 'keyset'):
+            raise ValueError(f"Unknown pagination mode: {pagination}")
+        self.pagination = pagination
+        if count_mode not in ('exact', 'estimate', 'none'):
+            raise ValueError(f"Unknown count mode: {count_mode}")
+        self.count_mode = count_mode
+        if result_format not in ('json', 'tsv'):
+            raise ValueError(f"Unknown result format: {result_format}")
+        self.result_format = result_format
+        if class_strategy not in ('single', 'split'):
+            raise ValueError(f"Unknown class query strategy: {class_strategy}")
+        self.class_strategy = class_strategy
+        self.page_sizer = page_sizer if page_sizer is not None else PageSizer(
+            int(self.limit))
+        self.cache = cache
+        self.passthrough = passthrough
+        self.validate = validate
+        if not write_data and (resume or passthrough):
+            raise ValueError(
+                'Resuming and passthrough mode need the pages in the "data" folder')
+        self.staging_format = staging_format if staging_format is not None else StagingFormat()
+        if passthrough and (self.staging_format.layout != 'json' or self.staging_format.compression != 'none'):
+            raise ValueError(
+                'Passthrough mode saves the responses as they are received, without a staging layout or compression')
+        self.page_consumer = page_consumer
+        self.write_data = write_data
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.throttle = throttle if throttle is not None else RequestThrottle(
+            self.concurrency)
+        self.page_items: dict[str, object] = dict()
+        self.shared = shared
+        self.transport = transport if transport is not None else SPARQLTransport(
+            self.concurrency, read_timeout=self.timeout)
+        self.progress_lock = threading.Lock()
+        self.page_executor: ThreadPoolExecutor = None
         currrent_director = os.getcwd()
-        directory_path = os.path.join(currrent_director + '/metadata')
-        with open(f"{directory_path}/Classes", "rb") as file:
-            self.classes = pickle.load(file)
-        with open(f"{directory_path}/Object Properties", "rb") as file:
-            self.object_properties = pickle.load(file)
-        if os.path.exists(os.path.join(currrent_director + '/data')):
-            shutil.rmtree(os.path.join(currrent_director + '/data'))
+        self.classes, self.object_properties, self.index = load_metadata_from_file()
+        data_directory_path = os.path.join(currrent_director + '/data')
+        if not resume and os.path.exists(data_directory_path):
+            shutil.rmtree(data_directory_path)
+        elif resume:
+            remove_temporary_files(data_directory_path)
+        self.manifest = CrawlManifest(data_directory_path, resume, write_data)
 
     def start(self) -> None:
         """
         Starts the query-and-retrieve process. First we query the classes, then object properties, and save them into
-        their corresponding folders.
+        their corresponding folders. A failed class or object property does not stop the others. The failures are
+        reported at the end, and can be fetched again by resuming the crawl.
 
         Parameters
         ----------
         None
         """
-        for cls_iri, cls_metadata in self.classes.items():
-            self.query_class(cls_iri, cls_metadata)
-        for obj_prop_metadata in self.object_properties:
-            self.query_object_properties(obj_prop_metadata)
-        dump_metadata_to_file(self.classes, self.object_properties)
+        failures = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as page_executor, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as item_executor:
+            self.page_executor = page_executor
+            futures = [item_executor.submit(self.query_class, cls_iri, cls_metadata)
+                       for cls_iri, cls_metadata in self.classes.items()]
+            if self.page_consumer is not None:
+                for future in futures:
+                    future.exception()
+            futures += [item_executor.submit(self.query_object_properties, obj_prop_metadata)
+                        for obj_prop_metadata in self.object_properties]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as error:
+                    failures.append(error)
+        self.page_executor = None
+        self.manifest.close()
+        if self.cache is not None:
+            print(f'Cache: {self.cache.hits:,} hits, {self.cache.misses:,} misses')
+        print(self.throttle.get_report())
+        print(self.transport.get_report())
+        transport_stats = self.transport.get_stats()
+        self.metrics.set('http_requests', transport_stats['requests'])
+        self.metrics.set('http_connections', transport_stats['connections'])
+        self.metrics.set('http_reused_connections', transport_stats['reused'])
+        self.metrics.set('http_wire_bytes', transport_stats['wire_bytes'])
+        self.metrics.set('http_body_bytes', transport_stats['body_bytes'])
+        self.metrics.set('sparql_retries', self.throttle.retries)
+        self.metrics.set('sparql_throttled', self.throttle.throttled)
+        self.metrics.set('sparql_concurrency_limit', self.throttle.limit)
+        dump_metadata_to_file(self.classes, self.object_properties, self.index)
+        if len(failures) > 0:
+            for error in failures:
+                print(f'Failed: {error}')
+            raise RuntimeError(
+                f'{len(failures)} classes or object properties were not crawled completely, run again with --resume')
 
     def query_class(self, cls_iri: str, cls_metadata: ClassMetaData) -> None:
         """
@@ -99,12 +355,14 @@ class DBPediaCrawler:
         if len(cls_metadata.parentClass) > 0:
             return
         cls_var_label = cls_metadata.label.replace(' ', '_').lower()
+        properties = self.index.inherited_properties[cls_iri]
+        subClass_iris = self.index.descendants[cls_iri]
         select_str = '?' + cls_var_label + ' '
-        for prop in cls_metadata.properties:
+        for prop in properties:
             prop_label = prop.label.replace(' ', '_').lower()
             select_str += f" (SAMPLE(?{prop_label}) AS ?{prop_label}) "
         where_str = '?' + cls_var_label + ' a ' + '<' + cls_iri + '> .' + '\n'
-        for prop in cls_metadata.properties:
+        for prop in properties:
             where_str += 'OPTIONAL {' + '?' + \
                 cls_var_label + ' <' + \
                 prop.prop_iri + '>' + ' ?' + \
@@ -113,58 +371,60 @@ class DBPediaCrawler:
         predicate_on_domain_target = []
         predicate_on_range = []
         predicate_on_range_subject = []
-        for obj_prop_metadata in self.object_properties:
+        for index in sorted(set(self.index.domain_properties.get(cls_iri, []) + self.index.range_properties.get(cls_iri, []))):
+            obj_prop_metadata = self.object_properties[index]
             if obj_prop_metadata.domain_iri == cls_iri:
                 predicate_on_domain.append(obj_prop_metadata.iri)
                 predicate_on_domain_target.append(obj_prop_metadata.range_iri)
             elif obj_prop_metadata.range_iri == cls_iri:
                 predicate_on_range.append(obj_prop_metadata.iri)
                 predicate_on_range_subject.append(obj_prop_metadata.domain_iri)
-        where_str += ' UNION '.join(f'{{ ?{cls_var_label} <{predicate}> ?a. ?a a <{object}> }}\n' for predicate,
-                                    object in zip(predicate_on_domain, predicate_on_domain_target))
+        branches = [f'{{ ?{cls_var_label} <{predicate}> ?a. ?a a <{object}> }}\n' for predicate,
+                    object in zip(predicate_on_domain, predicate_on_domain_target)]
+        branches += [f'{{ ?a <{predicate}> ?{cls_var_label}. ?a a <{subject}> }}\n' for subject,
+                     predicate in zip(predicate_on_range_subject, predicate_on_range)]
+        where_str += ' UNION '.join(branches[:len(predicate_on_domain)])
         if (len(predicate_on_domain) > 0 and len(predicate_on_range) > 0):
             where_str += ' UNION '
-        where_str += ' UNION '.join(f'{{ ?a <{predicate}> ?{cls_var_label}. ?a a <{subject}> }}\n' for subject,
-                                    predicate in zip(predicate_on_range_subject, predicate_on_range))
-        for subClass_iri, subClass_metadata in self.classes.items():
-            if subClass_metadata.parentClass == cls_iri:
-                appended_where_str = ''
-                for obj_prop_meatdata in self.object_properties:
-                    if obj_prop_meatdata.range_iri == subClass_iri:
-                        src_label = self.classes[obj_prop_meatdata.domain_iri].label.replace(
-                            ' ', '_').lower()
-                        appended_where_str += f'?{src_label} a <{obj_prop_meatdata.domain_iri}>. ?{src_label} <{obj_prop_meatdata.iri}> ?{cls_var_label}.'
-                where_str += 'UNION {' + '?' + cls_var_label + ' a ' + \
-                    ' <' + subClass_iri + '>. ' + appended_where_str + ' }\n'
-                select_str += f" (SAMPLE(?Is_{subClass_metadata.label}) AS ?Is_{subClass_metadata.label}) "
-        for subClass_iri, subClass_metadata in self.classes.items():
-            if subClass_metadata.parentClass == cls_iri:
-                where_str += 'BIND(IF(EXISTS { ' + '?' + cls_var_label + \
-                    ' a ' + ' <' + subClass_iri + '> }, 1, 0) AS ?Is_' + \
-                    subClass_metadata.label + ' )\n'
-        total_count, offset_count = self.get_offset_count(
-            cls_var_label, where_str)
+        where_str += ' UNION '.join(branches[len(predicate_on_domain):])
+        for subClass_iri in subClass_iris:
+            subClass_metadata = self.classes[subClass_iri]
+            appended_where_str = ''
+            for index in self.index.range_properties.get(subClass_iri, []):
+                obj_prop_meatdata = self.object_properties[index]
+                src_label = self.classes[obj_prop_meatdata.domain_iri].label.replace(
+                    ' ', '_').lower()
+                appended_where_str += f'?{src_label} a <{obj_prop_meatdata.domain_iri}>. ?{src_label} <{obj_prop_meatdata.iri}> ?{cls_var_label}.'
+            branch = '{' + '?' + cls_var_label + ' a ' + \
+                ' <' + subClass_iri + '>. ' + appended_where_str + ' }\n'
+            where_str += 'UNION ' + branch
+            branches.append(branch)
+            select_str += f" (SAMPLE(?Is_{subClass_metadata.label}) AS ?Is_{subClass_metadata.label}) "
+        for subClass_iri in subClass_iris:
+            where_str += 'BIND(IF(EXISTS { ' + '?' + cls_var_label + \
+                ' a ' + ' <' + subClass_iri + '> }, 1, 0) AS ?Is_' + \
+                self.classes[subClass_iri].label + ' )\n'
+        split_columns = None
+        if self.class_strategy == 'split':
+            select_str = '?' + cls_var_label
+            split_columns = [(prop.label.replace(' ', '_').lower(),
+                              f"?{cls_var_label} a <{cls_iri}> . ?{cls_var_label} <{prop.prop_iri}> "
+                              f"?{prop.label.replace(' ', '_').lower()} .", False) for prop in properties]
+            split_columns += [(f"Is_{self.classes[subClass_iri].label}",
+                               f"?{cls_var_label} a <{cls_iri}> . ?{cls_var_label} a <{subClass_iri}> .", True)
+                              for subClass_iri in subClass_iris]
+            where_str = '?' + cls_var_label + ' a ' + '<' + cls_iri + '> .' + '\n' + ' UNION '.join(branches)
         directory_path = os.path.join(
             os.getcwd() + '/data/Classes', cls_metadata.label)
-        os.makedirs(directory_path, exist_ok=True)
+        if self.write_data:
+            os.makedirs(directory_path, exist_ok=True)
         self.classes[cls_iri].folder_path = directory_path
-        progress_prefix = f'Node: {cls_metadata.label}, Total: {total_count:,}:'.ljust(
-            60)
-        for i in range(offset_count):
-            query = """
-                %s
-                SELECT DISTINCT %s  
-                WHERE { %s }
-                GROUP BY ?%s
-                LIMIT %s
-                OFFSET  %s%s """ % (self.namespace, select_str, where_str, cls_var_label, self.limit, str(i), self.limit[1:])
-            self.wrapper.setQuery(query)
-            self.wrapper.setReturnFormat(JSON)
-            results = self.wrapper.query().convert()
-            with open(f"{directory_path}/{i}", "w", encoding='utf8') as f:
-                json.dump(results, f, indent=4, ensure_ascii=False)
-            printProgressBar(
-                i + 1, offset_count, prefix=progress_prefix, suffix='Complete', length=50)
+        self.page_items[directory_path] = cls_metadata
+        item = f'Classes/{cls_metadata.label}'
+        estimate_str = f'?{cls_var_label} a <{cls_iri}> .'
+        with self.metrics.profile_thread(), self.metrics.time_item('crawl', item):
+            self.crawl_item(item, cls_var_label, select_str, where_str, estimate_str, [cls_var_label],
+                            split_columns is None, directory_path, f'Node: {cls_metadata.label}', split_columns)
 
     def query_object_properties(self, obj_prop_metadata: ObjectPropertyMetaData) -> None:
         """
@@ -191,33 +451,168 @@ class DBPediaCrawler:
         folder_name = f"{obj_prop_metadata.domain_label}_{obj_prop_metadata.label}_{obj_prop_metadata.range_label}"
         directory_path = os.path.join(
             os.getcwd() + '/data/Object Properties', folder_name)
-        os.makedirs(directory_path, exist_ok=True)
-        for index, item in enumerate(self.object_properties):
-            if item.iri == obj_prop_metadata.iri and \
-                    item.domain_iri == obj_prop_metadata.domain_iri and \
-                        item.range_iri == obj_prop_metadata.range_iri:
-                self.object_properties[index].folder_path = directory_path
-                break
-        total_count, offset_count = self.get_offset_count(
-            domain_label_var_label, where_str)
-        progress_prefix = f'Edge: {folder_name}, Total: {total_count:,}:'.ljust(
-            60)
-        for i in range(offset_count):
-            query = """
-                  %s
-                  SELECT DISTINCT %s  
-                  WHERE { %s }
-                  LIMIT %s
-                  OFFSET  %s%s """ % (self.namespace, select_str, where_str, self.limit, str(i), self.limit[1:])
-            self.wrapper.setQuery(query)
-            self.wrapper.setReturnFormat(JSON)
-            results = self.wrapper.query().convert()
-            with open(f"{directory_path}/{i}", "w", encoding='utf8') as f:
-                json.dump(results, f, indent=4, ensure_ascii=False)
-            printProgressBar(
-                i + 1, offset_count, prefix=progress_prefix, suffix='Complete', length=50)
-
-    def get_offset_count(self, var_label: str, where_str: str) -> tuple[int,int]:
+        if self.write_data:
+            os.makedirs(directory_path, exist_ok=True)
+        obj_prop_metadata.folder_path = directory_path
+        self.page_items[directory_path] = obj_prop_metadata
+        item = f'Object Properties/{folder_name}'
+        estimate_str = f'?{domain_label_var_label} <{obj_prop_metadata.iri}> ?{range_label_var_label} .'
+        with self.metrics.profile_thread(), self.metrics.time_item('crawl', item):
+            self.crawl_item(item, domain_label_var_label, select_str, where_str, estimate_str,
+                            [domain_label_var_label, range_label_var_label], False, directory_path, f'Edge: {folder_name}')
+
+    def crawl_item(self, item: str, var_label: str, select_str: str, where_str: str, estimate_str: str, key_vars: list[str],
+                   group_by: bool, directory_path: str, progress_label: str,
+                   split_columns: list[tuple[str, str, bool]] = None) -> None:
+        """
+        Counts the records of one class or object property and fetches all of its pages, either with offset or with
+        keyset pagination. If the item is recorded as finished in the crawl manifest with the same query, we skip it.
+        If an earlier ontology of a batch run finished an item with the same query, its pages are shared instead.
+        With an exact count, offset pages are planned from the count and fetched in parallel. Otherwise, pages are
+        fetched one after another until a short page, and the item is recorded with the number of rows fetched.
+
+        Parameters
+        ----------
+        item: str
+            Folder of the item, relative to the "data" folder.
+
+        var_label: str
+            The variable which is counted for pagination.
+
+        select_str: str
+            The SELECT expression of the query.
+
+        where_str: str
+            The WHERE expression of the query.
+
+        estimate_str: str
+            A cheap WHERE expression, whose count estimates the number of records in 'estimate' count mode.
+
+        key_vars: list[str]
+            Variables that identify a row, which are used for keyset pagination.
+
+        group_by: bool
+            Whether the rows are grouped by the first key variable.
+
+        directory_path: str
+            The folder that pages are saved into.
+
+        progress_label: str
+            Label of the item in the progress bar.
+
+        split_columns: list[tuple[str, str, bool]]
+            The columns of a class in 'split' class query strategy, as their variable, their WHERE expression
+            and whether they are a subclass flag, or None if each page is fetched with one query.
+        """
+
+        item_str = f'{self.pagination} {self.limit} {select_str} {where_str}'
+        if split_columns is not None:
+            item_str += ' ' + ' '.join(pattern for _, pattern, _ in split_columns)
+        item_hash = hash_query(item_str)
+        finished_item = self.manifest.get_finished_item(item, item_hash)
+        if finished_item is not None:
+            progress_prefix = f'{progress_label}, Total: {finished_item["total"]:,}:'.ljust(
+                60)
+            with self.progress_lock:
+                printProgressBar(1, 1, prefix=progress_prefix,
+                                 suffix='Resumed', length=50)
+            if self.page_consumer is not None:
+                for file_name in get_page_file_names(directory_path):
+                    file_path = os.path.join(directory_path, file_name)
+                    self.emit_page(file_path, file_path)
+            if self.shared is not None:
+                self.shared.add_item(item_hash, directory_path, finished_item, self.manifest.get_item_pages(item))
+            return
+        shared_item = self.shared.get_item(item_hash) if self.shared is not None else None
+        if shared_item is not None:
+            self.share_item(item, item_hash, shared_item, directory_path, progress_label)
+            return
+        if self.count_mode == 'exact':
+            total_count, offset_count = self.get_offset_count(
+                var_label, where_str)
+            progress_prefix = f'{progress_label}, Total: {total_count:,}:'.ljust(
+                60)
+        elif self.count_mode == 'estimate':
+            total_count, offset_count = self.get_offset_count(
+                var_label, estimate_str, False)
+            progress_prefix = f'{progress_label}, Total: ~{total_count:,}:'.ljust(
+                60)
+        else:
+            total_count, offset_count = None, None
+            progress_prefix = f'{progress_label}:'.ljust(60)
+        if split_columns is not None or self.pagination == 'keyset' or self.count_mode != 'exact' or \
+                self.page_sizer.adaptive:
+            offset_count, rows = self.fetch_pages_in_order(select_str, where_str, key_vars, group_by,
+                                                           directory_path, offset_count, progress_prefix,
+                                                           split_columns)
+            if self.count_mode != 'exact':
+                total_count = rows
+        else:
+            group_by_str = f"GROUP BY ?{key_vars[0]}" if group_by else ''
+            pages = []
+            for i in range(offset_count):
+                query = """
+                    %s
+                    SELECT DISTINCT %s  
+                    WHERE { %s }
+                    %s
+                    LIMIT %s
+                    OFFSET  %s """ % (self.namespace, select_str, where_str, group_by_str, self.limit, i * int(self.limit))
+                pages.append((query, f"{directory_path}/{i}"))
+            self.fetch_pages(item, pages, progress_prefix)
+        self.manifest.item_finished(
+            item, item_hash, total_count, offset_count)
+        if self.shared is not None and self.write_data:
+            self.shared.add_item(item_hash, directory_path, self.manifest.get_finished_item(item, item_hash),
+                                 self.manifest.get_item_pages(item))
+
+    def share_item(self, item: str, item_hash: str, shared_item: dict, directory_path: str,
+                   progress_label: str) -> None:
+        """
+        Takes the pages of a class or object property from an item with the same query, which an earlier ontology
+        of a batch run fetched, instead of fetching them again. The pages are linked into the folder of the item
+        and recorded in the crawl manifest, so that the crawl can be resumed as if they were fetched. Without
+        saved pages, they are passed to the page consumer from the folder of the earlier item.
+
+        Parameters
+        ----------
+        item: str
+            Folder of the item, relative to the "data" folder.
+
+        item_hash: str
+            Hash of the item query.
+
+        shared_item: dict
+            The item with the same query, which is registered in self.shared.
+
+        directory_path: str
+            The folder that pages are saved into.
+
+        progress_label: str
+            Label of the item in the progress bar.
+        """
+
+        for file_name in shared_item['file_names']:
+            source_path = os.path.join(shared_item['directory'], file_name)
+            file_path = os.path.join(directory_path, file_name)
+            if not self.write_data:
+                self.emit_page(file_path, source_path)
+                continue
+            self.shared.link_page(source_path, file_path)
+            page_record = shared_item['pages'].get(file_name)
+            if page_record is not None:
+                self.manifest.page_finished(f'{item}/{file_name}', page_record['query'], page_record['rows'],
+                                            page_record['size'], page_record['sha256'], page_record['last_key'],
+                                            page_record.get('limit'))
+            self.emit_page(file_path, file_path)
+        record = shared_item['record']
+        self.manifest.item_finished(item, item_hash, record['total'], record['pages'])
+        self.metrics.increment('shared_items')
+        progress_prefix = f'{progress_label}, Total: {record["total"] or 0:,}:'.ljust(60)
+        with self.progress_lock:
+            printProgressBar(1, 1, prefix=progress_prefix, suffix='Shared', length=50)
+
+    def get_offset_count(self, var_label: str, where_str: str, distinct: bool = True) -> tuple[int,int]:
         """
         Counts the records per class or object property, which is required for pagination. We create the COUNT query and then run it.
         The output is a tuple which specifies the total count and the offset count. 
@@ -233,6 +628,9 @@ class DBPediaCrawler:
         where_str: str
             The WHERE expression specific for each class.
 
+        distinct: bool
+            Whether distinct values are counted. Without it, the count is cheaper, but it is only an estimate.
+
         Returns
         -------
         tuple[int,int]
@@ -240,10 +638,779 @@ class DBPediaCrawler:
         """
 
         query = """
-            SELECT COUNT (DISTINCT ?%s)  
-            WHERE { %s } """ % (var_label, where_str)
-        self.wrapper.setQuery(query)
-        self.wrapper.setReturnFormat(JSON)
-        results = self.wrapper.query().convert()
+            SELECT COUNT (%s?%s)  
+            WHERE { %s } """ % ('DISTINCT ' if distinct else '', var_label, where_str)
+        results = self.run_query(query, 'count')
         total = int(results["results"]["bindings"][0]["callret-0"]["value"])
         return (total, math.ceil(total / int(self.limit)))
+
+    def run_query(self, query: str, kind: str = 'page', retry_timeouts: bool = True) -> dict:
+        """
+        Runs a SPARQL query against DBPedia and returns the converted JSON result. If there is a response cache, the query is answered from the cache when possible, and new responses are
+        saved into it. Requests go through self.throttle, which retries them if they fail for a transient reason.
+        The latency and the size of the response are recorded in self.metrics.
+
+        Parameters
+        ----------
+        query: str
+            The SPARQL query.
+
+        kind: str
+            Either 'count', 'page' or 'column', which labels the latency of the query.
+
+        retry_timeouts: bool
+            Whether self.throttle retries the requests after a query timeout.
+
+        Returns
+        -------
+        dict
+            The SPARQL JSON result, which is parsed from a SPARQL TSV result for pages in 'tsv' result format.
+        """
+
+        result_format = self.result_format if kind in ('page', 'column') else 'json'
+        if self.cache is not None:
+            response = self.cache.get(self.endpoint, query, result_format)
+            if response is not None:
+                self.record_response(kind, 'cache', len(response), result_format=result_format)
+                return self.parse_response(response, kind, result_format)
+        def read() -> bytes:
+            with self.open_query(query, result_format) as stream:
+                self.check_response(stream)
+                return stream.read()
+
+        start_time = time.perf_counter()
+        response = self.throttle.call(read, retry_timeouts)
+        self.record_response(kind, 'endpoint', len(response),
+                             time.perf_counter() - start_time, result_format)
+        if self.cache is not None:
+            self.cache.put(self.endpoint, query, response, result_format)
+        return self.parse_response(response, kind, result_format)
+
+    def parse_response(self, response: bytes, kind: str, result_format: str) -> dict:
+        """
+        Parses a SPARQL JSON or TSV response into a SPARQL JSON result, and records the parse time in the
+        page_parse_seconds histogram of self.metrics, so that both formats can be compared.
+
+        Parameters
+        ----------
+        response: bytes
+            The response body.
+
+        kind: str
+            Either 'count', 'page' or 'column'.
+
+        result_format: str
+            Either 'json' or 'tsv'.
+
+        Returns
+        -------
+        dict
+            The SPARQL JSON result.
+        """
+
+        start_time = time.perf_counter()
+        if result_format == 'tsv':
+            results = parse_tsv_results(response)
+        else:
+            results = json.loads(response)
+        self.metrics.observe('page_parse_seconds', time.perf_counter() - start_time,
+                             kind=kind, format=result_format)
+        return results
+
+    def record_response(self, kind: str, source: str, size: int, seconds: float = None,
+                        result_format: str = 'json') -> None:
+        """
+        Records a SPARQL response in self.metrics: the number and the bytes of responses by source and result
+        format, and the latency of the queries which are sent to the endpoint.
+
+        Parameters
+        ----------
+        kind: str
+            Either 'count', 'page' or 'column'.
+
+        source: str
+            Either 'endpoint' or 'cache'.
+
+        size: int
+            Size of the response body in bytes.
+
+        seconds: float
+            Time from sending the query to reading the whole response, for the endpoint.
+
+        result_format: str
+            Either 'json' or 'tsv'.
+        """
+
+        self.metrics.increment('sparql_responses', source=source, kind=kind, format=result_format)
+        self.metrics.increment('sparql_response_bytes', size, source=source, kind=kind, format=result_format)
+        if seconds is not None:
+            self.metrics.observe('sparql_query_seconds', seconds, kind=kind)
+
+    def check_response(self, response: BinaryIO) -> None:
+        """
+        Raises PartialResultError if the endpoint marks a response as a partial result. Virtuoso, which runs
+        the DBPedia endpoint, answers a query which runs out of time with the rows it found so far and the
+        X-SQL-State header S1TAT, so that response is not a complete page, and it is never cached.
+
+        Parameters
+        ----------
+        response: BinaryIO
+            The HTTP response.
+        """
+
+        headers = getattr(response, 'headers', None)
+        if headers is not None and headers.get('X-SQL-State') == 'S1TAT':
+            raise PartialResultError(
+                f"Partial result: {headers.get('X-SQL-Message', 'the query ran out of time')}")
+
+    def open_query(self, query: str, result_format: str = 'json') -> BinaryIO:
+        """
+        Sends a SPARQL query to DBPedia over a pooled connection of self.transport, and returns the HTTP response,
+        without reading its body.
+
+        Parameters
+        ----------
+        query: str
+            The SPARQL query.
+
+        result_format: str
+            Either 'json' or 'tsv'.
+
+        Returns
+        -------
+        BinaryIO
+            The HTTP response, which the body of the SPARQL JSON or TSV result can be read from.
+        """
+
+        return self.transport.open(self.endpoint, query, result_format)
+
+    def fetch_pages(self, item: str, pages: list[tuple[str, str]], progress_prefix: str) -> None:
+        """
+        Runs the page queries of one class or object property on the shared page pool. The pool runs at most
+        self.concurrency pages at once, and the requests of the pages, together with the COUNT queries of the item
+        threads, share the slots of self.throttle, so that at most self.concurrency requests are in flight. Each result is saved into its offset file, and the progress bar
+        of the item is updated as pages complete. The CPU time of the page threads is added to the item.
+
+        Parameters
+        ----------
+        item: str
+            Folder of the item, relative to the "data" folder.
+
+        pages: list[tuple[str, str]]
+            Pairs of SPARQL query and the file path that its result is saved into.
+
+        progress_prefix: str
+            Prefix of the progress bar for this class or object property.
+        """
+
+        total = len(pages)
+        completed = [0]
+
+        def fetch(query: str, file_path: str) -> None:
+            page = os.path.relpath(file_path, self.manifest.data_directory)
+            if self.manifest.get_finished_page(page, hash_query(query)) is None:
+                self.fetch_page(file_path, query)
+            else:
+                self.emit_page(file_path, file_path)
+            with self.progress_lock:
+                completed[0] += 1
+                printProgressBar(
+                    completed[0], total, prefix=progress_prefix, suffix='Complete', length=50)
+
+        def fetch_in_pool(query: str, file_path: str) -> None:
+            with self.metrics.profile_thread(), self.metrics.time_item('crawl', item, wall=False):
+                fetch(query, file_path)
+
+        if self.page_executor is None:
+            for query, file_path in pages:
+                fetch(query, file_path)
+            return
+        futures = [self.page_executor.submit(fetch_in_pool, query, file_path)
+                   for query, file_path in pages]
+        errors = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as error:
+                errors.append(error)
+        if len(errors) > 0:
+            raise RuntimeError(
+                f'{progress_prefix.split(",")[0]}: {len(errors)} of {total} pages failed, first error: {errors[0]}')
+
+    def fetch_pages_in_order(self, select_str: str, where_str: str, key_vars: list[str], group_by: bool,
+                             directory_path: str, offset_count: int, progress_prefix: str,
+                             split_columns: list[tuple[str, str, bool]] = None) -> tuple[int, int]:
+        """
+        Pages through a class or object property one page after another, until the first page which is shorter
+        than its page size, which may be an empty page. With keyset (cursor) pagination, every page is ordered by
+        the key variables and filtered to the rows after the last key of the previous page, so the endpoint never
+        rescans earlier rows. With offset pagination, every page starts at the number of rows fetched so far.
+        Pages are saved with their index, the same as with planned offset pages.
+
+        The page size is chosen by a copy of self.page_sizer. If a page fails because the query ran out of time,
+        and the page size can still shrink, the page is fetched again with a smaller size. Such a page is not
+        retried by self.throttle after a timeout, so that it shrinks at once. The page size of each
+        page is recorded in the crawl manifest, so that a resumed crawl sends the same queries. With split_columns,
+        every page is a keyset page of subjects, which is completed by fetch_split_page.
+
+        Parameters
+        ----------
+        select_str: str
+            The SELECT expression of the query.
+
+        where_str: str
+            The WHERE expression of the query.
+
+        key_vars: list[str]
+            Variables that identify a row, ordered from the most significant one. For classes this is the class
+            variable, and for object properties the subject and object variables.
+
+        group_by: bool
+            Whether the rows are grouped by the first key variable.
+
+        directory_path: str
+            The folder that pages are saved into.
+
+        offset_count: int
+            The expected number of pages, which is used for the progress bar, or None if it is not known. With
+            zero, no page is fetched.
+
+        progress_prefix: str
+            Prefix of the progress bar for this class or object property.
+
+        split_columns: list[tuple[str, str, bool]]
+            The columns of a class in 'split' class query strategy, or None.
+
+        Returns
+        -------
+        tuple[int, int]
+            Number of pages that were saved, and number of rows that were fetched.
+        """
+
+        if offset_count == 0:
+            return 0, 0
+        page_sizer = copy.copy(self.page_sizer)
+        last_key = None
+        rows_fetched = 0
+        i = 0
+        while True:
+            file_path = f"{directory_path}/{i}"
+            page = os.path.relpath(file_path, self.manifest.data_directory)
+            record = self.manifest.pages.get(page)
+            size = page_sizer.size
+            if record is not None and record.get('limit') is not None:
+                size = record['limit']
+            query = self.get_page_query(select_str, where_str, key_vars, group_by, size, last_key,
+                                        rows_fetched, 'keyset' if split_columns is not None else None)
+            finished_page = self.manifest.get_finished_page(
+                page, hash_query(query))
+            if finished_page is not None:
+                rows = finished_page['rows']
+                next_key = finished_page['last_key']
+                self.emit_page(file_path, file_path)
+            else:
+                start_time = time.perf_counter()
+                retry_timeouts = not page_sizer.can_shrink()
+                try:
+                    if split_columns is not None:
+                        rows, next_key = self.fetch_split_page(
+                            file_path, query, key_vars, size, split_columns, last_key, retry_timeouts)
+                    else:
+                        rows, next_key = self.fetch_page(
+                            file_path, query, key_vars, size, retry_timeouts)
+                except Exception as error:
+                    if self.is_timeout(error) and page_sizer.page_failed():
+                        continue
+                    raise
+                page_sizer.page_finished(
+                    rows, size, time.perf_counter() - start_time)
+            rows_fetched += rows
+            is_last_page = rows < size
+            with self.progress_lock:
+                printProgressBar(
+                    i + 1, i + 1 if is_last_page else max(offset_count or 0, i + 2), prefix=progress_prefix, suffix='Complete', length=50)
+            if is_last_page:
+                return i + 1, rows_fetched
+            last_key = next_key
+            i += 1
+
+    def get_page_query(self, select_str: str, where_str: str, key_vars: list[str], group_by: bool, size: int,
+                       last_key: list[str], offset: int, pagination: str = None) -> str:
+        """
+        Returns the query of a page of fetch_pages_in_order. A keyset page is ordered by the key variables and
+        continues after last_key, and an offset page starts at offset.
+
+        Parameters
+        ----------
+        select_str: str
+            The SELECT expression of the query.
+
+        where_str: str
+            The WHERE expression of the query.
+
+        key_vars: list[str]
+            Variables that identify a row.
+
+        group_by: bool
+            Whether the rows are grouped by the first key variable.
+
+        size: int
+            The page size.
+
+        last_key: list[str]
+            Key of the last row of the previous page, or None for the first page.
+
+        offset: int
+            Number of rows of the previous pages.
+
+        pagination: str
+            Either 'offset' or 'keyset', or None for self.pagination.
+
+        Returns
+        -------
+        str
+            The SPARQL query.
+        """
+
+        group_by_str = f"GROUP BY ?{key_vars[0]}" if group_by else ''
+        if (pagination or self.pagination) == 'offset':
+            return """
+                %s
+                SELECT DISTINCT %s  
+                WHERE { %s }
+                %s
+                LIMIT %s
+                OFFSET %s """ % (self.namespace, select_str, where_str, group_by_str, size, offset)
+        order_by_str = ' '.join(f"STR(?{var})" for var in key_vars)
+        filter_str = ''
+        if last_key is not None:
+            filter_str = f"FILTER({keyset_condition(key_vars, last_key)})"
+        return """
+            %s
+            SELECT DISTINCT %s  
+            WHERE { %s %s }
+            %s
+            ORDER BY %s
+            LIMIT %s """ % (self.namespace, select_str, where_str, filter_str, group_by_str, order_by_str, size)
+
+    def is_timeout(self, error: Exception) -> bool:
+        """
+        Checks whether a page failed because its query ran out of time, so that a smaller page may succeed. This
+        is a partial result, a 504 Gateway Timeout, a Virtuoso transaction timeout, or a read timeout, but not a
+        connect timeout, which does not depend on the query.
+
+        Parameters
+        ----------
+        error: Exception
+            The error of the page.
+
+        Returns
+        -------
+        bool
+            Whether the error is a timeout.
+        """
+
+        if isinstance(error, PartialResultError):
+            return True
+        if isinstance(error, urllib.error.HTTPError):
+            return error.code == 504
+        if isinstance(error, EndPointInternalError):
+            return 'S1T' in str(error)
+        if isinstance(error, urllib.error.URLError):
+            error = error.reason
+        return isinstance(error, (TimeoutError, socket.timeout)) and not isinstance(error, ConnectTimeoutError)
+
+    def fetch_page(self, file_path: str, query: str, key_vars: list[str] = None, page_size: int = None,
+                   retry_timeouts: bool = True) -> tuple[int, list[str]]:
+        """
+        Runs the query of one page and saves its result into file_path. In passthrough mode, the response is
+        streamed to the file as it is received, otherwise it is parsed and saved with save_page, unless pages
+        are not written. The page is recorded in the crawl manifest as finished, or as failed if an error occurs,
+        and is passed to the page consumer.
+
+        Parameters
+        ----------
+        file_path: str
+            Path of the page file.
+
+        query: str
+            The SPARQL query of the page.
+
+        key_vars: list[str]
+            Variables that identify a row, if the key of the last row is required for keyset pagination.
+
+        page_size: int
+            The page size of the query, which is recorded in the crawl manifest if the page size can vary.
+
+        retry_timeouts: bool
+            Whether requests which time out are retried by self.throttle. It is False for pages whose size can
+            still shrink, so that they shrink at once instead of waiting for the retries.
+
+        Returns
+        -------
+        tuple[int, list[str]]
+            Number of rows in the page, which is None if it is not counted in passthrough mode, and the key of
+            the last row, if key_vars is given.
+        """
+
+        page = os.path.relpath(file_path, self.manifest.data_directory)
+        try:
+            if self.passthrough:
+                rows, last_key = self.stream_page(
+                    file_path, query, key_vars, page_size, retry_timeouts)
+                self.emit_page(file_path, file_path)
+                return rows, last_key
+            results = self.run_query(query, retry_timeouts=retry_timeouts)
+        except Exception as error:
+            self.manifest.page_failed(page, hash_query(query), str(error))
+            raise
+        bindings = results["results"]["bindings"]
+        self.record_page(page, len(bindings))
+        last_key = None
+        if key_vars is not None and len(bindings) > 0:
+            last_key = [bindings[-1][var]['value'] for var in key_vars]
+        if self.write_data:
+            self.save_page(file_path, query, results, last_key, page_size)
+        self.emit_page(file_path, results)
+        return len(bindings), last_key
+
+    def fetch_split_page(self, file_path: str, query: str, key_vars: list[str], page_size: int,
+                         split_columns: list[tuple[str, str, bool]], last_key: list[str],
+                         retry_timeouts: bool = True) -> tuple[int, list[str]]:
+        """
+        Fetches a page of a class in 'split' class query strategy. The subject query of the page only selects the
+        IRIs of its subjects, which is cheap for the endpoint. Then every datatype property and every subclass
+        flag is fetched with its own narrow query, for the subjects between the last key of the previous page
+        and the last subject of this page. The narrow queries run in parallel on the page pool, and their results
+        are joined by IRI into the rows that the single query would return: a property is unbound if the subject
+        has no value, and a flag is 1 if the subject is an instance of the subclass, and 0 otherwise. The page is
+        saved with save_page and recorded in the crawl manifest with the hash of the subject query.
+
+        Parameters
+        ----------
+        file_path: str
+            Path of the page file.
+
+        query: str
+            The subject query of the page.
+
+        key_vars: list[str]
+            The class variable.
+
+        page_size: int
+            The page size of the subject query.
+
+        split_columns: list[tuple[str, str, bool]]
+            The columns of the class, as their variable, their WHERE expression and whether they are a subclass
+            flag.
+
+        last_key: list[str]
+            Key of the last row of the previous page, or None for the first page.
+
+        retry_timeouts: bool
+            Whether self.throttle retries the requests after a query timeout.
+
+        Returns
+        -------
+        tuple[int, list[str]]
+            Number of rows in the page, and the key of its last row.
+        """
+
+        page = os.path.relpath(file_path, self.manifest.data_directory)
+        var_label = key_vars[0]
+        try:
+            subjects = [binding[var_label]['value']
+                        for binding in self.run_query(query, retry_timeouts=retry_timeouts)["results"]["bindings"]]
+            columns: list[dict] = []
+            if len(subjects) > 0:
+                lower = last_key[0] if last_key is not None else None
+                if self.page_executor is None:
+                    columns = [self.fetch_column(var_label, column, lower, subjects[-1], page_size, retry_timeouts)
+                               for column in split_columns]
+                else:
+                    item = os.path.dirname(page)
+
+                    def fetch_in_pool(column: tuple[str, str, bool]) -> dict:
+                        with self.metrics.profile_thread(), self.metrics.time_item('crawl', item, wall=False):
+                            return self.fetch_column(var_label, column, lower, subjects[-1], page_size,
+                                                     retry_timeouts)
+
+                    futures = [self.page_executor.submit(fetch_in_pool, column)
+                               for column in split_columns]
+                    columns = [future.result() for future in futures]
+        except Exception as error:
+            self.manifest.page_failed(page, hash_query(query), str(error))
+            raise
+        bindings = []
+        for subject in subjects:
+            binding = {var_label: {'type': 'uri', 'value': subject}}
+            for (label, _, is_flag), values in zip(split_columns, columns):
+                if is_flag:
+                    binding[label] = {'type': 'typed-literal', 'datatype': 'http://www.w3.org/2001/XMLSchema#integer',
+                                      'value': '1' if subject in values else '0'}
+                elif subject in values:
+                    binding[label] = values[subject]
+            bindings.append(binding)
+        results = {'head': {'vars': [var_label] + [label for label, _, _ in split_columns]},
+                   'results': {'bindings': bindings}}
+        self.record_page(page, len(bindings))
+        last_key = [subjects[-1]] if len(subjects) > 0 else None
+        if self.write_data:
+            self.save_page(file_path, query, results, last_key, page_size)
+        self.emit_page(file_path, results)
+        return len(bindings), last_key
+
+    def fetch_column(self, var_label: str, column: tuple[str, str, bool], lower: str, upper: str,
+                     size: int, retry_timeouts: bool = True) -> dict:
+        """
+        Fetches one column of a split class page, for the subjects after lower and up to upper in the order of
+        their IRIs. The column is fetched in keyset pages of size rows, until a short page.
+
+        Parameters
+        ----------
+        var_label: str
+            The class variable.
+
+        column: tuple[str, str, bool]
+            The variable of the column, its WHERE expression and whether it is a subclass flag.
+
+        lower: str
+            The IRI before the first subject, or None for the first page of the class.
+
+        upper: str
+            The IRI of the last subject.
+
+        size: int
+            The page size of the narrow queries.
+
+        retry_timeouts: bool
+            Whether self.throttle retries the requests after a query timeout.
+
+        Returns
+        -------
+        dict
+            The SPARQL JSON term of the column for each subject IRI which has one, or None for a flag.
+        """
+
+        label, _, is_flag = column
+        values = dict()
+        while True:
+            bindings = self.run_query(self.get_column_query(var_label, column, lower, upper, size),
+                                      'column', retry_timeouts)["results"]["bindings"]
+            for binding in bindings:
+                values[binding[var_label]['value']] = None if is_flag else binding.get(label)
+            if len(bindings) < size:
+                return values
+            lower = bindings[-1][var_label]['value']
+
+    def get_column_query(self, var_label: str, column: tuple[str, str, bool], lower: str, upper: str,
+                         size: int) -> str:
+        """
+        Returns a narrow query of one column of a split class page. A datatype property selects a sample of its
+        values for each subject, and a subclass flag selects the subjects which are instances of the subclass.
+
+        Parameters
+        ----------
+        var_label: str
+            The class variable.
+
+        column: tuple[str, str, bool]
+            The variable of the column, its WHERE expression and whether it is a subclass flag.
+
+        lower: str
+            The IRI before the first subject, or None.
+
+        upper: str
+            The IRI of the last subject.
+
+        size: int
+            The page size.
+
+        Returns
+        -------
+        str
+            The SPARQL query.
+        """
+
+        label, where_str, is_flag = column
+        select_str = f"?{var_label}" if is_flag else f"?{var_label} (SAMPLE(?{label}) AS ?{label})"
+        group_by_str = '' if is_flag else f"GROUP BY ?{var_label}"
+        conditions = [] if lower is None else [keyset_condition([var_label], [lower])]
+        conditions.append(f"STR(?{var_label}) <= {sparql_string_literal(upper)}")
+        return """
+            %s
+            SELECT DISTINCT %s  
+            WHERE { %s FILTER(%s) }
+            %s
+            ORDER BY STR(?%s)
+            LIMIT %s """ % (self.namespace, select_str, where_str, ' && '.join(conditions), group_by_str,
+                            var_label, size)
+
+    def record_page(self, page: str, rows: int, size: int = None) -> None:
+        """
+        Records a fetched page in self.metrics: its rows in the page_rows histogram, and its rows and bytes in
+        the counters of its class or object property.
+
+        Parameters
+        ----------
+        page: str
+            Path of the page, relative to the "data" folder.
+
+        rows: int
+            Number of rows, which is None if it is not counted in passthrough mode.
+
+        size: int
+            Size of the page file in bytes, if it is written.
+        """
+
+        item = os.path.dirname(page)
+        self.metrics.increment('item_pages', stage='crawl', item=item)
+        if rows is not None:
+            self.metrics.observe('page_rows', rows)
+            self.metrics.increment('item_rows', rows, stage='crawl', item=item)
+        if size is not None:
+            self.metrics.increment('item_bytes', size, stage='crawl', item=item)
+
+    def emit_page(self, file_path: str, page) -> None:
+        """
+        Passes a page to self.page_consumer, if there is one, with the metadata object of its class or object
+        property.
+
+        Parameters
+        ----------
+        file_path: str
+            Path of the page file, which may not exist if pages are not saved.
+
+        page: str or dict
+            Path of the page file, or its SPARQL JSON result.
+        """
+
+        if self.page_consumer is None:
+            return
+        directory_path, file_name = os.path.split(file_path)
+        self.page_consumer(self.page_items[directory_path], file_name, page)
+
+    def stream_page(self, file_path: str, query: str, key_vars: list[str] = None, page_size: int = None,
+                    retry_timeouts: bool = True) -> tuple[int, list[str]]:
+        """
+        Streams the response of a page query into file_path in chunks, without parsing it into Python objects.
+        The response is written through a temporary file and a rename, and is also copied into the response
+        cache. If validation is enabled, or the key of the last row is required, the response is scanned with
+        SPARQLJSONScanner, or SPARQLTSVScanner for TSV results, while it is written, which checks that it is well-formed and counts its rows. A request
+        which fails while it is streamed is retried by self.throttle, and the temporary file is written again.
+
+        Parameters
+        ----------
+        file_path: str
+            Path of the page file.
+
+        query: str
+            The SPARQL query of the page.
+
+        key_vars: list[str]
+            Variables that identify a row, if the key of the last row is required for keyset pagination.
+
+        page_size: int
+            The page size of the query, which is recorded in the crawl manifest if the page size can vary.
+
+        retry_timeouts: bool
+            Whether self.throttle retries the requests after a query timeout.
+
+        Returns
+        -------
+        tuple[int, list[str]]
+            Number of rows in the page, which is None if the response is not scanned, and the key of the last
+            row, if key_vars is given.
+        """
+
+        cached_file = None
+        if self.cache is not None:
+            cached_file = self.cache.open_response(self.endpoint, query, self.result_format)
+        temp_path = f"{file_path}.tmp"
+
+        def download() -> tuple[SPARQLJSONScanner, object, int]:
+            scanner = None
+            if self.validate or key_vars is not None:
+                scanner_class = SPARQLTSVScanner if self.result_format == 'tsv' else SPARQLJSONScanner
+                scanner = scanner_class('last' if key_vars is not None else 'none')
+            digest = hashlib.sha256()
+            size = 0
+            with (cached_file if cached_file is not None else self.open_query(query, self.result_format)) as stream, \
+                    open(temp_path, 'wb') as file:
+                if cached_file is None:
+                    self.check_response(stream)
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    if scanner is not None:
+                        scanner.feed(chunk)
+                    file.write(chunk)
+                file.flush()
+                os.fsync(file.fileno())
+            if scanner is not None:
+                scanner.close()
+            return scanner, digest, size
+
+        start_time = time.perf_counter()
+        try:
+            if cached_file is not None:
+                scanner, digest, size = download()
+            else:
+                scanner, digest, size = self.throttle.call(download, retry_timeouts)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        os.replace(temp_path, file_path)
+        if self.cache is not None and cached_file is None:
+            self.cache.put_file(self.endpoint, query, file_path, self.result_format)
+        if cached_file is not None:
+            self.record_response('page', 'cache', size, result_format=self.result_format)
+        else:
+            self.record_response('page', 'endpoint', size,
+                                 time.perf_counter() - start_time, self.result_format)
+        rows = scanner.rows if scanner is not None else None
+        page = os.path.relpath(file_path, self.manifest.data_directory)
+        self.record_page(page, rows, size)
+        last_key = None
+        last_binding = scanner.get_last_binding() if key_vars is not None else None
+        if last_binding is not None:
+            last_key = [last_binding[var]['value'] for var in key_vars]
+        self.manifest.page_finished(page, hash_query(query),
+                                    rows, size, digest.hexdigest(), last_key, page_size)
+        return rows, last_key
+
+    def save_page(self, file_path: str, query: str, results: dict, last_key: list[str] = None, page_size: int = None) -> None:
+        """
+        Saves the result of a page query into its file, encoded with self.staging_format, through a temporary
+        file and a rename, so a killed process never leaves a half-written page behind. Then the page is recorded as finished in the crawl
+        manifest, with its row count and hash.
+
+        Parameters
+        ----------
+        file_path: str
+            Path of the page file.
+
+        query: str
+            The SPARQL query of the page.
+
+        results: dict
+            The SPARQL JSON result of the page.
+
+        last_key: list[str]
+            Key of the last row, which is required for resuming keyset pagination.
+
+        page_size: int
+            The page size of the query, which is recorded in the crawl manifest if the page size can vary.
+        """
+
+        content = self.staging_format.encode(results)
+        write_file_atomic(file_path, content)
+        self.metrics.increment('item_bytes', len(content), stage='crawl',
+                               item=os.path.dirname(os.path.relpath(file_path, self.manifest.data_directory)))
+        self.manifest.page_finished(os.path.relpath(file_path, self.manifest.data_directory), hash_query(query),
+                                    len(results["results"]["bindings"]), len(content),
+                                    hashlib.sha256(content).hexdigest(), last_key, page_size)
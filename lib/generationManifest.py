@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+
+
+class GenerationManifest:
+    """
+    A Python class for recording what each page of the "data" folder contributed to the generated scripts, so
+    that the next generation only converts the pages which changed, and writes a delta script from the previous
+    graph to the new one.
+
+    ...
+
+    The manifest is a JSON-lines file in the "cypher" folder. Its first line holds a hash of the generator
+    settings, and each following line records one page: the SHA-256 hash of its content, and either the nodes that
+    it wrote, with a digest of the labels and properties of each one, and the nodes that it skipped as duplicates,
+    or the edges that it converted, with the indexes of the dangling edges that it dropped. A page is unchanged if
+    its content and the settings are the same as in the previous generation. The records of the previous
+    generation also describe the graph that the previous scripts created, which the delta is computed against,
+    even when the settings changed.
+
+    Attributes
+    ----------
+    file_path: str
+        Path of the manifest file.
+
+    settings: str
+        Hash of the generator settings of this generation.
+
+    previous_settings: str
+        Hash of the generator settings of the previous generation, or None if there was none.
+
+    previous: dict[str, dict]
+        The records of the previous generation, with the relative page path as the key.
+
+    pages: dict[str, dict]
+        The records of this generation.
+
+    Methods
+    -------
+    get_unchanged_page(page: str, content_hash: str) -> dict:
+        Returns the previous record of a page, if its content and the settings are unchanged.
+
+    node_page(page: str, content_hash: str, label: str, nodes: list[list[str]], skipped: list[str]) -> None:
+        Records a page of class records.
+
+    edge_page(page: str, content_hash: str, edge: list[str], edges: list[list[str]], dropped: list[int]) -> None:
+        Records a page of object property records.
+
+    get_nodes(records: dict[str, dict]) -> dict[str, tuple[str, str]]:
+        Returns the label and the digest of every node that the records wrote.
+
+    get_edges(records: dict[str, dict]) -> set[tuple[str, str, str, str, str]]:
+        Returns every edge that the records wrote.
+
+    save() -> None:
+        Replaces the manifest file with the records of this generation.
+    """
+
+    def __init__(self, cypher_directory: str, settings: str) -> None:
+        """
+        Loads the records of the previous generation from the manifest of the given folder, if it exists.
+
+        Parameters
+        ----------
+        cypher_directory: str
+            The folder that the scripts are written into.
+
+        settings: str
+            A description of the generator settings which change the scripts of a page, such as the cypher mode.
+        """
+
+        self.file_path = os.path.join(cypher_directory, 'generation.jsonl')
+        self.settings = hashlib.sha256(settings.encode('utf8')).hexdigest()
+        self.previous_settings: str = None
+        self.previous: dict[str, dict] = dict()
+        self.pages: dict[str, dict] = dict()
+        if not os.path.exists(self.file_path):
+            return
+        with open(self.file_path, 'r', encoding='utf8') as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if 'settings' in record:
+                    self.previous_settings = record['settings']
+                elif 'page' in record:
+                    self.previous[record['page']] = record
+
+    def get_unchanged_page(self, page: str, content_hash: str) -> dict:
+        """
+        Returns the record of a page in the previous generation, if the page has the same content and the
+        settings are the same. Otherwise it returns None, which means the page has to be converted again.
+
+        Parameters
+        ----------
+        page: str
+            Path of the page, relative to the "data" folder.
+
+        content_hash: str
+            SHA-256 hash of the page file.
+
+        Returns
+        -------
+        dict
+            The page record, or None.
+        """
+
+        if self.previous_settings != self.settings:
+            return None
+        record = self.previous.get(page)
+        if record is None or record['hash'] != content_hash:
+            return None
+        return record
+
+    def node_page(self, page: str, content_hash: str, label: str, nodes: list[list[str]], skipped: list[str]) -> None:
+        """
+        Records a page of class records.
+
+        Parameters
+        ----------
+        page: str
+            Path of the page, relative to the "data" folder.
+
+        content_hash: str
+            SHA-256 hash of the page file.
+
+        label: str
+            The label of the root class, which every node of the page has.
+
+        nodes: list[list[str]]
+            The IRI and the digest of each node which the page wrote.
+
+        skipped: list[str]
+            The IRIs of the nodes which the page skipped, because an earlier page wrote them.
+        """
+
+        self.pages[page] = {'page': page, 'hash': content_hash, 'label': label, 'nodes': nodes, 'skipped': skipped}
+
+    def edge_page(self, page: str, content_hash: str, edge: list[str], edges: list[list[str]], dropped: list[int]) -> None:
+        """
+        Records a page of object property records.
+
+        Parameters
+        ----------
+        page: str
+            Path of the page, relative to the "data" folder.
+
+        content_hash: str
+            SHA-256 hash of the page file.
+
+        edge: list[str]
+            The edge name and the root labels of its domain and range.
+
+        edges: list[list[str]]
+            The subject and object IRIs of each edge of the page.
+
+        dropped: list[int]
+            The indexes of the dangling edges which the page dropped.
+        """
+
+        self.pages[page] = {'page': page, 'hash': content_hash, 'edge': edge, 'edges': edges, 'dropped': dropped}
+
+    @staticmethod
+    def get_nodes(records: dict[str, dict]) -> dict[str, tuple[str, str]]:
+        """
+        Returns the nodes which the pages of a generation wrote.
+
+        Parameters
+        ----------
+        records: dict[str, dict]
+            The page records of a generation.
+
+        Returns
+        -------
+        dict[str, tuple[str, str]]
+            The root label and the digest of each node, with its IRI as the key.
+        """
+
+        nodes = dict()
+        for record in records.values():
+            for iri, digest in record.get('nodes', []):
+                nodes[iri] = (record['label'], digest)
+        return nodes
+
+    @staticmethod
+    def get_edges(records: dict[str, dict]) -> set[tuple[str, str, str, str, str]]:
+        """
+        Returns the edges which the pages of a generation wrote.
+
+        Parameters
+        ----------
+        records: dict[str, dict]
+            The page records of a generation.
+
+        Returns
+        -------
+        set[tuple[str, str, str, str, str]]
+            The edge name, the root labels of its domain and range, and its subject and object IRIs.
+        """
+
+        edges = set()
+        for record in records.values():
+            if 'edges' not in record:
+                continue
+            dropped = set(record['dropped'])
+            edges.update((*record['edge'], subject_uri, object_uri)
+                         for index, (subject_uri, object_uri) in enumerate(record['edges']) if index not in dropped)
+        return edges
+
+    def save(self) -> None:
+        """
+        Replaces the manifest file with the settings and the page records of this generation, through a temporary
+        file and a rename.
+
+        Parameters
+        ----------
+        None
+        """
+
+        temp_path = f"{self.file_path}.tmp"
+        with open(temp_path, 'w', encoding='utf8') as file:
+            file.write(json.dumps({'settings': self.settings}) + '\n')
+            for record in self.pages.values():
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.file_path)
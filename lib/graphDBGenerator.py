@@ -1,5 +1,16 @@
-import pickle
-import time
+import hashlib
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, TextIO
+from lib.csvPartWriter import CSVPartWriter
+from lib.cypherBatchWriter import CypherBatchWriter
+from lib.cypherShardWriter import CypherShardWriter
+from lib.generationManifest import GenerationManifest
+from lib.metrics import Metrics
+from lib.nodeIndex import NodeIndex
+from lib.sparqlJSONScanner import open_page
 from lib.utils import *
 import os
 import json
@@ -7,7 +18,7 @@ import json
 
 class GraphDBGenerator:
     """
-    A Python class for creating Neo4j cypher files from JSON data.
+    A Python class for creating Neo4j cypher files, or CSV files for neo4j-admin database import, from JSON data.
 
     ...
 
@@ -16,58 +27,408 @@ class GraphDBGenerator:
     dbPedia_uri : str
         The prefix URI of instances in DBPedia. We ignore those instances that their IRI has not this prefix.
 
+    buffer_size : int
+        Size of the write buffer of cypher files, so that scripts are written to disk in large blocks.
+
+    script_version : int
+        Version of the generated scripts, which is part of the settings of an incremental generation, so that
+        page scripts of an older version are converted again instead of being reused.
+
+    node_index : NodeIndex
+        The IRIs of the nodes which are written, over all classes. It deduplicates nodes, and edges whose
+        subject or object is not a node are dangling.
+
+    dangling_edges : int
+        Number of dangling edges which are found by the last edge-generation step.
+
+    generation : GenerationManifest
+        The records of the pages of an incremental generation, or None.
+
+    shards : list[dict]
+        The records of the written shards, if the scripts are sharded, otherwise None.
+
     Methods
     -------
     start() -> None:
         Starts the script-generation process.
 
+    start_stream(queue_size: int) -> None:
+        Starts the streaming mode, where the crawler passes pages as they are fetched.
+
+    put_page(metadata, file_name: str, page) -> None:
+        Passes a fetched page to the worker thread of the streaming mode.
+
+    finish_stream() -> None:
+        Waits for the worker thread and closes the files of the streaming mode.
+
     create_script_for_classes() -> None:
         Creates cypher files for nodes from extracted JSON data.
 
+    write_node_page(cls_metadata: ClassMetaData, file_name: str, nodes: list, all_scripts_file: TextIO) -> tuple[list, list]:
+        Writes the converted nodes of one page into its cypher file and "All.cypher".
+
+    reuse_node_page(cls_metadata: ClassMetaData, file_name: str, record: dict, all_scripts_file: TextIO) -> bool:
+        Copies the cypher file of an unchanged page of nodes into "All.cypher", if its nodes are still the same.
+
+    record_node_page(cls_metadata: ClassMetaData, file_name: str, content_hash: str, upserts: dict,
+                     written: list, skipped: list) -> None:
+        Records a converted page of nodes in the generation manifest, and writes its new and changed nodes into
+        the delta script.
+
     create_script_for_object_properties() -> None:
         Creates cypher files for edges from extracted JSON data.
+
+    get_edge_arguments(object_prop_metadata: ObjectPropertyMetaData) -> tuple:
+        Returns the arguments of convert_edge_page for an object property.
+
+    write_edge_page(object_prop_metadata: ObjectPropertyMetaData, file_name: str, edges: list, all_scripts_file: TextIO) -> list[int]:
+        Writes the converted edges of one page into its cypher file and "All.cypher".
+
+    reuse_edge_page(object_prop_metadata: ObjectPropertyMetaData, file_name: str, record: dict,
+                    all_scripts_file: TextIO) -> bool:
+        Copies the cypher file of an unchanged page of edges into "All.cypher", if the same edges are dangling.
+
+    start_generation() -> None:
+        Loads the generation manifest and opens the delta script of an incremental generation.
+
+    finish_generation() -> None:
+        Writes the removed nodes and the changed edges into the delta script, and saves the generation manifest.
+
+    write_delta(statement: str, row: str) -> None:
+        Writes a statement of the delta script for one row.
+
+    copy_page_script(cypher_path: str, all_scripts_file: TextIO) -> None:
+        Appends the scripts of a cypher file of a page to "All.cypher".
+
+    open_all_scripts(phase: str) -> TextIO:
+        Opens "All.cypher", or a shard writer for the nodes or the edges.
+
+    finish_all_scripts() -> None:
+        Records the size of the combined scripts, and writes the load manifest of the shards.
+
+    get_page(metadata, file_name: str) -> str:
+        Returns the path of a page, relative to the "data" folder.
+
+    is_edge_connected(subject_uri: str, object_uri: str) -> bool:
+        Checks that both ends of an edge are nodes, and counts dangling edges.
+
+    report_dangling_edges() -> None:
+        Prints the number of dangling edges.
+
+    report_node_index(target: str, node_index: NodeIndex) -> None:
+        Prints the size of a node index, and records the deduplication hit rate.
+
+    record_page(item: str, target: str, rows: int, duplicates: int, size: int) -> None:
+        Records the rows, duplicates and bytes of a written page in the metrics.
+
+    get_item(metadata) -> str:
+        Returns the folder of a class or object property, relative to the "data" folder.
+
+    map_pages(function: Callable, arguments: list[tuple]) -> Iterator:
+        Converts page files, in parallel if there are several workers, and yields the results in order.
+
+    create_constraints() -> None:
+        Creates the uniqueness constraints on the IRI of nodes.
+
+    create_csv_for_classes() -> None:
+        Creates neo4j-admin node CSV files from extracted JSON data.
+
+    write_node_csv_page(cls_metadata: ClassMetaData, page) -> None:
+        Writes the nodes of one page into the CSV files of its class.
+
+    write_node_csv_rows(cls_metadata: ClassMetaData, page) -> tuple[int, int]:
+        Writes the nodes of one page into the CSV files of its class, and counts them.
+
+    create_csv_for_object_properties() -> None:
+        Creates neo4j-admin relationship CSV files from extracted JSON data.
+
+    write_edge_csv_page(object_prop_metadata: ObjectPropertyMetaData, page) -> None:
+        Writes the edges of one page into the CSV files of its type.
+
+    finish_csv() -> None:
+        Closes the CSV files and writes "import.args".
+
+    parse_node_record(values: list[str], variables: list[str], cls_metadata: ClassMetaData) -> tuple[str, list[str], dict]:
+        Extracts the node name, labels and properties of a class record.
+
+    get_root_label(cls_iri: str) -> str:
+        Returns the node label of the root class of a class.
     """
 
     dbPedia_uri = 'http://dbpedia.org/resource'
+    buffer_size = 1 << 20
+    script_version = 2
 
-    def __init__(self) -> None:
+    def __init__(self, mode: str = 'create', batch_size: int = 1000, target: str = 'cypher', csv_part_rows: int = 1000000,
+                 edge_mode: str = 'variable', workers: int = 1, node_index: NodeIndex = None,
+                 dangling_edge_mode: str = 'drop', metrics: Metrics = None, incremental: bool = False,
+                 shard_bytes: int = 0, shard_statements: int = 0, shard_compression: str = 'none') -> None:
         """
         Here we populate self.classes and self.object_properties dictionries, from "metadata/Classes" and 
-        "metadata/Object Properties" files, respectively. We also delete the "cypher" folder, if it already exists.
+        "metadata/Object Properties" files, respectively, and self.index from "metadata/Index". We also delete the "cypher" and "csv" folders, if they
+        already exist.
 
         Parameters
         ----------
-        None
+        mode: str
+            Either 'create', which writes one CREATE statement per record, or 'unwind', which groups nodes by
+            their labels and edges by their type into batches of UNWIND $rows statements, with the rows given
+            in :param commands for cypher-shell. In 'unwind' mode edges match their nodes by IRI.
+
+        batch_size: int
+            Maximum number of rows in a batch, in 'unwind' mode.
+
+        target: str
+            Either 'cypher', which creates cypher scripts in the "cypher" folder, 'csv', which creates CSV files
+            for neo4j-admin database import in the "csv" folder, or 'both'.
+
+        csv_part_rows: int
+            Maximum number of rows in a CSV part file.
+
+        edge_mode: str
+            In 'create' mode, either 'variable', where edges refer to the variables of the node CREATE statements,
+            so the whole script has to run as one transaction, or 'match', where each edge is an independent
+            statement that matches its nodes by root class label and IRI. 'unwind' mode always matches by IRI.
+
+        workers: int
+            Number of processes which convert page files into cypher in parallel. Zero means one per CPU core.
+
+        node_index: NodeIndex
+            The index of node IRIs. A 'hash' index is used if it is not given.
+
+        dangling_edge_mode: str
+            Either 'drop', which leaves out edges whose subject or object is not a node, or 'keep', which only
+            counts them.
+
+        metrics: Metrics
+            The metrics that the time, rows and bytes of each class and object property, and the node
+            deduplication, are recorded into.
+
+        incremental: bool
+            Whether the cypher scripts are generated incrementally. The "cypher" folder is kept, and the pages
+            whose content and settings did not change since the previous generation are not converted again.
+            Besides "All.cypher", which creates the whole graph, a "delta.cypher" script is written, which turns
+            the graph of the previous generation into the new one. The first incremental generation has no
+            previous graph, so its delta creates every node and edge.
+
+        shard_bytes: int
+            Maximum number of bytes of a shard. If it or shard_statements is not zero, the combined scripts are
+            written into the "cypher/shards" folder, as node shards and then edge shards, instead of
+            "All.cypher", and "cypher/shards.json" lists them for the loader. Each statement of a shard is
+            independent, so variables in 'create' mode can not be sharded.
+
+        shard_statements: int
+            Maximum number of statements of a shard.
+
+        shard_compression: str
+            Either 'none' or 'gzip', which compresses each shard.
         """
+        if mode not in ('create', 'unwind'):
+            raise ValueError(f"Unknown cypher mode: {mode}")
+        if edge_mode not in ('variable', 'match'):
+            raise ValueError(f"Unknown edge mode: {edge_mode}")
+        if target not in ('cypher', 'csv', 'both'):
+            raise ValueError(f"Unknown export target: {target}")
+        if dangling_edge_mode not in ('drop', 'keep'):
+            raise ValueError(f"Unknown dangling edge mode: {dangling_edge_mode}")
+        if shard_compression not in ('none', 'gzip'):
+            raise ValueError(f"Unknown shard compression: {shard_compression}")
+        if (shard_bytes > 0 or shard_statements > 0) and mode == 'create' and edge_mode == 'variable':
+            raise ValueError(
+                "Sharded scripts need independent statements, use the 'match' edge mode or the 'unwind' mode")
+        self.mode = mode
+        self.edge_mode = edge_mode
+        self.batch_size = batch_size
+        self.workers = workers if workers > 0 else os.cpu_count()
+        self.target = target
+        self.csv_part_rows = csv_part_rows
+        self.node_index = node_index if node_index is not None else NodeIndex()
+        self.csv_node_index = self.node_index
+        self.dangling_edge_mode = dangling_edge_mode
+        self.dangling_edges = 0
+        self.incremental = incremental
+        self.generation: GenerationManifest = None
+        self.shard_bytes = shard_bytes
+        self.shard_statements = shard_statements
+        self.shard_compression = shard_compression
+        self.shards: list[dict] = [] if shard_bytes > 0 or shard_statements > 0 else None
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.import_args: list[str] = []
+        self.csv_node_writers: dict[str, tuple[CSVPartWriter, list[str]]] = dict()
+        self.csv_edge_writers: dict[str, CSVPartWriter] = dict()
         self.classes: dict[str, ClassMetaData] = dict()
         self.object_properties: list[ObjectPropertyMetaData] = []
         currrent_director = os.getcwd()
-        directory_path = os.path.join(currrent_director + '/metadata')
-        with open(f"{directory_path}/Classes", "rb") as file:
-            self.classes = pickle.load(file)
-        with open(f"{directory_path}/Object Properties", "rb") as file:
-            self.object_properties = pickle.load(file)
-        if os.path.exists(os.path.join(currrent_director + '/cypher')):
+        self.classes, self.object_properties, self.index = load_metadata_from_file()
+        if not incremental and os.path.exists(os.path.join(currrent_director + '/cypher')):
             shutil.rmtree(os.path.join(currrent_director + '/cypher'))
+        if os.path.exists(os.path.join(currrent_director + '/csv')):
+            shutil.rmtree(os.path.join(currrent_director + '/csv'))
 
     def start(self) -> None:
         """
         Starts the cypher-file-generation process. We read the JSON data from "data" folder and create corresponding 
-        neo4j cypher files into separate folders. We also create a "All.cypher" file which contains all the scripts, combined.
+        neo4j cypher files into separate folders. We also create a "All.cypher" file which contains all the scripts, combined,
+        and a "constraints.cypher" file, which should be run before the scripts. For the CSV target, we create node and relationship CSV files in the "csv" folder, together with an
+        "import.args" file, which can be run from that folder with: neo4j-admin database import full @import.args
+        In incremental mode, we also create a "delta.cypher" file, from the graph of the previous generation.
+        With sharding, the combined scripts are written into the "shards" folder instead of "All.cypher", and
+        "shards.json" lists the shards in the order they should be loaded.
 
         Parameters
         ----------
         None
         """
         print('Step 3, Creating Scripts '.ljust(129, '#'))
-        self.create_script_for_classes()
-        self.create_script_for_object_properties()
+        if self.target in ('cypher', 'both'):
+            self.create_constraints()
+            if self.incremental:
+                self.start_generation()
+            self.create_script_for_classes()
+            self.create_script_for_object_properties()
+            if self.incremental:
+                self.finish_generation()
+        if self.target in ('csv', 'both'):
+            self.create_csv_for_classes()
+            self.create_csv_for_object_properties()
+            self.finish_csv()
+
+    def start_stream(self, queue_size: int = 16) -> None:
+        """
+        Starts the streaming mode, where pages are passed by the crawler with put_page as soon as they are
+        fetched, instead of being read from the "data" folder after the crawl. A worker thread converts the pages
+        and writes them into the same files as start() does, while the crawler fetches the next pages. The queue
+        between them is bounded, so the crawler waits when the worker falls behind. The crawler passes all class
+        pages before the first object property page, so dangling edges are found the same way as in start().
+        Pages are written in the order they are fetched, so with several crawler threads, "All.cypher" lists the
+        pages in a different order from run to run.
+
+        Parameters
+        ----------
+        queue_size: int
+            Maximum number of pages which wait for the worker.
+        """
+        if self.incremental:
+            raise ValueError(
+                'Incremental generation compares the pages in the "data" folder, it does not support streaming')
+        print('Step 3, Creating Scripts (streaming) '.ljust(129, '#'))
+        self.node_index.clear()
+        self.dangling_edges = 0
+        self.stream_error: BaseException = None
+        self.all_scripts_file = None
+        if self.target in ('cypher', 'both'):
+            self.create_constraints()
+            self.all_scripts_phase = 'nodes'
+            self.all_scripts_file = self.open_all_scripts('nodes')
+        if self.target in ('csv', 'both'):
+            os.makedirs(os.path.join(os.getcwd() + '/csv'), exist_ok=True)
+        if self.target == 'both':
+            self.csv_node_index = NodeIndex(
+                self.node_index.kind, self.node_index.capacity, self.node_index.error_rate)
+        self.page_queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.stream_thread = threading.Thread(
+            target=self.consume_pages, name='GraphDBGenerator', daemon=True)
+        self.stream_thread.start()
+
+    def put_page(self, metadata, file_name: str, page) -> None:
+        """
+        Passes a fetched page to the worker thread of the streaming mode. It waits while the queue is full, and
+        raises the error of the worker if it has failed, so that the crawler stops.
+
+        Parameters
+        ----------
+        metadata: ClassMetaData or ObjectPropertyMetaData
+            Metadata object of the class or object property of the page.
+
+        file_name: str
+            Name of the page file, which is also the name of its cypher file.
+
+        page: str or dict
+            Path of the page file, or its SPARQL JSON result.
+        """
+        if self.stream_error is not None:
+            raise RuntimeError(
+                f'Script generation failed: {self.stream_error}') from self.stream_error
+        self.page_queue.put((metadata, file_name, page))
+
+    def consume_pages(self) -> None:
+        """
+        The loop of the worker thread of the streaming mode. It writes each page into the cypher and CSV files,
+        until finish_stream() passes None. After an error, it keeps taking pages from the queue without writing
+        them, so that the crawler never waits forever.
+
+        Parameters
+        ----------
+        None
+        """
+        with self.metrics.profile_thread():
+            while True:
+                item = self.page_queue.get()
+                if item is None:
+                    return
+                if self.stream_error is not None:
+                    continue
+                metadata, file_name, page = item
+                try:
+                    if isinstance(metadata, ClassMetaData):
+                        if self.all_scripts_file is not None:
+                            with self.metrics.time_item('generate', self.get_item(metadata)):
+                                self.write_node_page(metadata, file_name, convert_node_page(page, metadata, self.mode),
+                                                     self.all_scripts_file)
+                        if self.target in ('csv', 'both'):
+                            self.write_node_csv_page(metadata, page)
+                    else:
+                        if self.all_scripts_file is not None and self.all_scripts_phase == 'nodes':
+                            self.all_scripts_phase = 'edges'
+                            if self.shards is not None:
+                                self.all_scripts_file.close()
+                                self.all_scripts_file = self.open_all_scripts('edges')
+                        if self.all_scripts_file is not None:
+                            with self.metrics.time_item('generate', self.get_item(metadata)):
+                                self.write_edge_page(metadata, file_name, convert_edge_page(page, *self.get_edge_arguments(metadata)),
+                                                     self.all_scripts_file)
+                        if self.target in ('csv', 'both'):
+                            dangling_edges = self.dangling_edges
+                            self.write_edge_csv_page(metadata, page)
+                            if self.all_scripts_file is not None:
+                                self.dangling_edges = dangling_edges
+                except BaseException as error:
+                    self.stream_error = error
+
+    def finish_stream(self) -> None:
+        """
+        Waits until the worker thread of the streaming mode has written all pages, and closes the files.
+
+        Parameters
+        ----------
+        None
+        """
+        self.page_queue.put(None)
+        self.stream_thread.join()
+        if self.all_scripts_file is not None:
+            self.all_scripts_file.close()
+            self.finish_all_scripts()
+        if self.target in ('csv', 'both'):
+            self.finish_csv()
+        if self.stream_error is not None:
+            raise RuntimeError(
+                f'Script generation failed: {self.stream_error}') from self.stream_error
+        if self.target in ('csv', 'both'):
+            self.report_node_index('csv', self.csv_node_index)
+        if self.target in ('cypher', 'both'):
+            self.report_node_index('cypher', self.node_index)
+        self.report_dangling_edges()
 
     def create_script_for_classes(self) -> None:
         """
         We read JSON data that are in "data/Classes" folder for each class, and then generate the script for nodes.
         Each class record corresponds to one node in the final cypher file. 
         At the end, each offset file in the "data/Classes" is mapped to one cypher file, named with its offset.
+        Pages are converted by convert_node_page, in parallel if there are several workers, and then merged in
+        page order, so that the first record of a node wins and "All.cypher" is the same for any number of workers.
+        Nodes are deduplicated by IRI over all classes with self.node_index.
+        In incremental mode, a page whose content is unchanged is not converted, and its cypher file is copied into
+        "All.cypher", unless the nodes which it wrote or skipped as duplicates changed because of an earlier page.
         
         Parameters
         ----------
@@ -75,70 +436,199 @@ class GraphDBGenerator:
         """
         class_directory_path = os.path.join(os.getcwd() + '/cypher')
         os.makedirs(f"{class_directory_path}/Classes/", exist_ok=True)
-        all_scripts_file = open(f"{class_directory_path}/All.cypher", "a+")
+        pages = []
         for _, cls_metadata in self.classes.items():
             if len(cls_metadata.parentClass) > 0:
                 continue
-            nodes_set = set()
-            progress_prefix = f'Node: {cls_metadata.label}'.ljust(60)
-            folder_path = cls_metadata.folder_path
-            total_count = len(os.listdir(folder_path))
             os.makedirs(
                 f"{class_directory_path}/Classes/{cls_metadata.label}", exist_ok=True)
-            for index, file_name in enumerate(os.listdir(folder_path)):
-                with open(f"{class_directory_path}/Classes/{cls_metadata.label}/{file_name}.cypher", "w+") as cypher:
-                    file_path = os.path.join(folder_path, file_name)
-                    with open(file_path, "r") as file:
-                        script = ''
-                        data = json.load(file)
-                        variables = data['head']['vars']
-                        bindings = data['results']['bindings']
-                        for record in bindings:
-                            vars_script = ''
-                            record_iri = ''
-                            class_name = ''
-                            node_name = ''
-                            extended_classes = ' '
-                            for variable in variables:
-                                if variable not in record:
-                                    continue
-                                if variable.lower() == cls_metadata.label.lower():
-                                    record_iri = record[f"{variable}"]['value']
-                                    node_name = sanitize_node_name(
-                                        get_last_part(record_iri))
-                                    class_name = variable.upper()
-                                    vars_script += f"IRI" + ":\"" + record_iri + "\","
-                                elif 'Is_' in variable:
-                                    if record[f"{variable}"]['value'] == '1':
-                                        extended_classes += ':' + \
-                                            variable.removeprefix(
-                                                'Is_').upper() + ' '
-                                else:
-                                    vars_script += f"{variable}" + ":\"" + \
-                                        record[f"{variable}"]['value'].replace(
-                                            '"', ('\'')).replace('\\', ('\'')) + "\","
-                            if node_name not in nodes_set:
-                                script += f"CREATE ({node_name}:{class_name}{extended_classes} {{{vars_script[:-1]}}})\n"
-                                nodes_set.add(node_name)
-                            else:
-                                continue
-                        cypher.write(script)
-                        cypher.flush()
-                        all_scripts_file.write(script)
-                        all_scripts_file.flush()
-                        time.sleep(0.1)
-                        printProgressBar(
-                            index + 1, total_count, prefix=progress_prefix, suffix='Complete', length=50)
-                    cypher.write(';')
-                    cypher.close()
-                    all_scripts_file.write('\n')
-        all_scripts_file.close()
+            file_names = get_page_file_names(cls_metadata.folder_path)
+            for index, file_name in enumerate(file_names):
+                pages.append((cls_metadata, file_name, index, len(file_names)))
+        content_hashes = [None] * len(pages)
+        records = [None] * len(pages)
+        if self.generation is not None:
+            content_hashes = [hash_file(os.path.join(cls_metadata.folder_path, file_name))
+                              for cls_metadata, file_name, _, _ in pages]
+            records = [self.generation.get_unchanged_page(self.get_page(cls_metadata, file_name), content_hash)
+                       for (cls_metadata, file_name, _, _), content_hash in zip(pages, content_hashes)]
+        function = convert_node_page if self.generation is None else convert_node_page_with_upserts
+        results = self.map_pages(function, [(os.path.join(cls_metadata.folder_path, file_name), cls_metadata, self.mode)
+                                            for (cls_metadata, file_name, _, _), record in zip(pages, records)
+                                            if record is None])
+        self.node_index.clear()
+        with self.open_all_scripts('nodes') as all_scripts_file:
+            for (cls_metadata, file_name, index, total_count), content_hash, record in zip(pages, content_hashes, records):
+                progress_prefix = f'Node: {cls_metadata.label}'.ljust(60)
+                with self.metrics.time_item('generate', self.get_item(cls_metadata)):
+                    if record is None or not self.reuse_node_page(cls_metadata, file_name, record, all_scripts_file):
+                        result = next(results) if record is None else function(
+                            os.path.join(cls_metadata.folder_path, file_name), cls_metadata, self.mode)
+                        if self.generation is None:
+                            self.write_node_page(
+                                cls_metadata, file_name, result, all_scripts_file)
+                        else:
+                            nodes, upserts = result
+                            written, skipped = self.write_node_page(
+                                cls_metadata, file_name, nodes, all_scripts_file)
+                            self.record_node_page(
+                                cls_metadata, file_name, content_hash, upserts, written, skipped)
+                printProgressBar(
+                    index + 1, total_count, prefix=progress_prefix, suffix='Complete', length=50)
+        self.report_node_index('cypher', self.node_index)
+
+    def write_node_page(self, cls_metadata: ClassMetaData, file_name: str, nodes: list[tuple[str, str, str]],
+                        all_scripts_file: TextIO) -> tuple[list[str], list[str]]:
+        """
+        Writes the nodes of one page, which are converted by convert_node_page, into its cypher file and into
+        "All.cypher". Nodes which are already in self.node_index are skipped, and counted as duplicates.
+
+        Parameters
+        ----------
+        cls_metadata: ClassMetaData
+            Metadata object of the class.
+
+        file_name: str
+            Name of the page file.
+
+        nodes: list[tuple[str, str, str]]
+            The converted nodes of the page.
+
+        all_scripts_file: TextIO
+            The "All.cypher" file.
+
+        Returns
+        -------
+        tuple[list[str], list[str]]
+            The IRIs of the written nodes, and the IRIs of the duplicate nodes.
+        """
+        class_directory_path = os.path.join(
+            os.getcwd() + '/cypher/Classes', cls_metadata.label)
+        os.makedirs(class_directory_path, exist_ok=True)
+        written = []
+        skipped = []
+        with open(f"{class_directory_path}/{file_name}.cypher", "w", buffering=self.buffer_size) as cypher:
+            batch_writer = None
+            if self.mode == 'unwind':
+                batch_writer = CypherBatchWriter(
+                    [cypher, all_scripts_file], self.batch_size)
+            for node_iri, statement, script in nodes:
+                if not self.node_index.add(node_iri):
+                    skipped.append(node_iri)
+                    continue
+                written.append(node_iri)
+                if batch_writer is not None:
+                    batch_writer.add_literal(statement, script)
+                    continue
+                cypher.write(script)
+                all_scripts_file.write(script)
+            if batch_writer is not None:
+                batch_writer.flush()
+            else:
+                cypher.write(';')
+                if self.edge_mode == 'match':
+                    all_scripts_file.write(';')
+        all_scripts_file.write('\n')
+        self.record_page(self.get_item(cls_metadata), 'cypher', len(written), len(skipped),
+                         os.path.getsize(cypher.name))
+        return written, skipped
+
+    def reuse_node_page(self, cls_metadata: ClassMetaData, file_name: str, record: dict,
+                        all_scripts_file: TextIO) -> bool:
+        """
+        Reuses the cypher file of a page whose content is unchanged since the previous generation, in incremental
+        mode. The page would write the same nodes, if none of them is written by an earlier page yet, and all the
+        nodes which it skipped as duplicates are, so then its nodes are added to self.node_index and its cypher
+        file is copied into "All.cypher".
+
+        Parameters
+        ----------
+        cls_metadata: ClassMetaData
+            Metadata object of the class.
+
+        file_name: str
+            Name of the page file.
+
+        record: dict
+            The record of the page in the previous generation.
+
+        all_scripts_file: TextIO
+            The "All.cypher" file.
+
+        Returns
+        -------
+        bool
+            Whether the page is reused. Otherwise it has to be converted again.
+        """
+        cypher_path = os.path.join(os.getcwd() + '/cypher/Classes', cls_metadata.label, f"{file_name}.cypher")
+        if not os.path.exists(cypher_path) or any(node_iri in self.node_index for node_iri, _ in record['nodes']) or \
+                any(node_iri not in self.node_index for node_iri in record['skipped']):
+            return False
+        for node_iri, _ in record['nodes']:
+            self.node_index.add(node_iri)
+        self.copy_page_script(cypher_path, all_scripts_file)
+        self.generation.pages[record['page']] = record
+        self.metrics.increment('generation_pages', kind='nodes', status='reused')
+        self.record_page(self.get_item(cls_metadata), 'cypher', len(record['nodes']), len(record['skipped']),
+                         os.path.getsize(cypher_path))
+        return True
+
+    def record_node_page(self, cls_metadata: ClassMetaData, file_name: str, content_hash: str,
+                         upserts: dict[str, tuple[str, str, str]], written: list[str], skipped: list[str]) -> None:
+        """
+        Records a converted page of nodes in the generation manifest, in incremental mode. Each written node which
+        is new, or whose labels or properties changed since the previous generation, is written into the delta
+        script. A node whose root class changed is moved to its new root label first, so that it keeps its
+        edges.
+
+        Parameters
+        ----------
+        cls_metadata: ClassMetaData
+            Metadata object of the class.
+
+        file_name: str
+            Name of the page file.
+
+        content_hash: str
+            SHA-256 hash of the page file.
+
+        upserts: dict[str, tuple[str, str, str]]
+            The digest, the MERGE statement and the row of each node of the page, from convert_node_upserts.
+
+        written: list[str]
+            The IRIs of the nodes which the page wrote.
+
+        skipped: list[str]
+            The IRIs of the nodes which the page skipped as duplicates.
+        """
+        label = cls_metadata.label.replace(' ', '_').upper()
+        nodes = []
+        for node_iri in written:
+            digest, statement, row = upserts[node_iri]
+            nodes.append([node_iri, digest])
+            previous = self.previous_nodes.get(node_iri)
+            if previous is not None and previous[1] == digest and previous[0] == label:
+                continue
+            if previous is not None and previous[0] != label:
+                self.write_delta(f"UNWIND $rows AS row MATCH (n:{previous[0]} {{IRI: row}}) "
+                                 f"REMOVE n:{previous[0]} SET n:{label}", to_cypher_literal(node_iri))
+                if self.delta_writer is not None:
+                    self.delta_writer.flush()
+            self.write_delta(statement, row)
+            self.delta_counts['nodes_changed' if previous is not None else 'nodes_added'] += 1
+        self.generation.node_page(self.get_page(cls_metadata, file_name), content_hash, label, nodes, skipped)
+        self.metrics.increment('generation_pages', kind='nodes', status='converted')
 
     def create_script_for_object_properties(self) -> None:
         """
         We read JSON data that are in "data/Object Properties" folder for each relation, and then generate the script for edges.
         Each object property record corresponds to one edge in the final cypher file. 
         At the end, each offset file in the "data/Properties" is mapped to one cypher file, named with its offset.
+        Pages are converted by convert_edge_page, in parallel if there are several workers, and then merged in
+        page order. Edges whose subject or object is not in self.node_index are dangling, and they are dropped
+        or only counted, depending on self.dangling_edge_mode. In incremental mode, a page whose content is
+        unchanged is not converted, and its cypher file is copied into "All.cypher", unless other edges of it are
+        dangling now.
 
         Parameters
         ----------
@@ -148,43 +638,901 @@ class GraphDBGenerator:
             os.getcwd() + '/cypher')
         os.makedirs(
             f"{object_properties_directory_path}/Object Properties/", exist_ok=True)
-        all_scripts_file = open(
-            f"{object_properties_directory_path}/All.cypher", "a+")
+        pages = []
+        arguments = []
         for object_prop_metadata in self.object_properties:
             os.makedirs(
                 f"{object_properties_directory_path}/Object Properties/{object_prop_metadata.label}", exist_ok=True)
-            progress_prefix = f'Edge: {object_prop_metadata.label}'.ljust(60)
-            script = ''
-            edge_name = sanitize_node_name(object_prop_metadata.label)
+            edge_arguments = self.get_edge_arguments(object_prop_metadata)
+            file_names = get_page_file_names(object_prop_metadata.folder_path)
+            for index, file_name in enumerate(file_names):
+                pages.append((object_prop_metadata, file_name,
+                             index, len(file_names)))
+                arguments.append(
+                    (os.path.join(object_prop_metadata.folder_path, file_name),) + edge_arguments)
+        content_hashes = [None] * len(pages)
+        records = [None] * len(pages)
+        if self.generation is not None:
+            content_hashes = [hash_file(argument[0]) for argument in arguments]
+            records = [self.generation.get_unchanged_page(self.get_page(object_prop_metadata, file_name), content_hash)
+                       for (object_prop_metadata, file_name, _, _), content_hash in zip(pages, content_hashes)]
+        results = self.map_pages(convert_edge_page, [argument for argument, record in zip(arguments, records)
+                                                     if record is None])
+        self.dangling_edges = 0
+        with self.open_all_scripts('edges') as all_scripts_file:
+            for (object_prop_metadata, file_name, index, total_count), argument, content_hash, record in \
+                    zip(pages, arguments, content_hashes, records):
+                progress_prefix = f'Edge: {object_prop_metadata.label}'.ljust(
+                    60)
+                with self.metrics.time_item('generate', self.get_item(object_prop_metadata)):
+                    if record is None or not self.reuse_edge_page(object_prop_metadata, file_name, record,
+                                                                  all_scripts_file):
+                        edges = next(results) if record is None else convert_edge_page(*argument)
+                        dropped = self.write_edge_page(
+                            object_prop_metadata, file_name, edges, all_scripts_file)
+                        if self.generation is not None:
+                            self.generation.edge_page(self.get_page(object_prop_metadata, file_name), content_hash,
+                                                      list(argument[1:4]), [[subject_uri, object_uri]
+                                                                           for subject_uri, object_uri, _, _ in edges],
+                                                      dropped)
+                            self.metrics.increment('generation_pages', kind='edges', status='converted')
+                printProgressBar(
+                    index + 1, total_count, prefix=progress_prefix, suffix='Complete', length=50)
+        self.finish_all_scripts()
+        self.report_dangling_edges()
+
+    def get_edge_arguments(self, object_prop_metadata: ObjectPropertyMetaData) -> tuple:
+        """
+        Returns the arguments of convert_edge_page for the pages of an object property, after the page itself.
+
+        Parameters
+        ----------
+        object_prop_metadata: ObjectPropertyMetaData
+            Metadata object of the object property.
+
+        Returns
+        -------
+        tuple
+            The edge name, the root labels of its domain and range, the cypher mode, the edge mode and the
+            DBPedia resource prefix.
+        """
+        return (sanitize_node_name(object_prop_metadata.label), self.get_root_label(object_prop_metadata.domain_iri),
+                self.get_root_label(object_prop_metadata.range_iri), self.mode, self.edge_mode, self.dbPedia_uri)
+
+    def write_edge_page(self, object_prop_metadata: ObjectPropertyMetaData, file_name: str,
+                        edges: list[tuple[str, str, str, str]], all_scripts_file: TextIO) -> list[int]:
+        """
+        Writes the edges of one page, which are converted by convert_edge_page, into its cypher file and into
+        "All.cypher". Dangling edges are dropped or only counted, depending on self.dangling_edge_mode.
+
+        Parameters
+        ----------
+        object_prop_metadata: ObjectPropertyMetaData
+            Metadata object of the object property.
+
+        file_name: str
+            Name of the page file.
+
+        edges: list[tuple[str, str, str, str]]
+            The converted edges of the page.
+
+        all_scripts_file: TextIO
+            The "All.cypher" file.
+
+        Returns
+        -------
+        list[int]
+            The indexes of the dropped edges in edges.
+        """
+        edge_directory_path = os.path.join(
+            os.getcwd() + '/cypher/Object Properties', object_prop_metadata.label)
+        os.makedirs(edge_directory_path, exist_ok=True)
+        dropped = []
+        with open(f"{edge_directory_path}/{file_name}.cypher", "w", buffering=self.buffer_size) as cypher:
+            batch_writer = None
+            if self.mode == 'unwind':
+                batch_writer = CypherBatchWriter(
+                    [cypher, all_scripts_file], self.batch_size)
+            for index, (subject_uri, object_uri, statement, script) in enumerate(edges):
+                if not self.is_edge_connected(subject_uri, object_uri):
+                    dropped.append(index)
+                    continue
+                if batch_writer is not None:
+                    batch_writer.add_literal(statement, script)
+                    continue
+                cypher.write(script)
+                all_scripts_file.write(script)
+            if batch_writer is not None:
+                batch_writer.flush()
+            elif self.edge_mode == 'variable':
+                cypher.write(';')
+        all_scripts_file.write('\n')
+        self.record_page(self.get_item(object_prop_metadata), 'cypher', len(edges) - len(dropped), 0,
+                         os.path.getsize(cypher.name))
+        return dropped
+
+    def reuse_edge_page(self, object_prop_metadata: ObjectPropertyMetaData, file_name: str, record: dict,
+                        all_scripts_file: TextIO) -> bool:
+        """
+        Reuses the cypher file of a page whose content is unchanged since the previous generation, in incremental
+        mode. The page would write the same edges, if the same edges are dropped as dangling with the nodes of
+        this generation, so then its cypher file is copied into "All.cypher".
+
+        Parameters
+        ----------
+        object_prop_metadata: ObjectPropertyMetaData
+            Metadata object of the object property.
+
+        file_name: str
+            Name of the page file.
+
+        record: dict
+            The record of the page in the previous generation.
+
+        all_scripts_file: TextIO
+            The "All.cypher" file.
+
+        Returns
+        -------
+        bool
+            Whether the page is reused. Otherwise it has to be converted again.
+        """
+        cypher_path = os.path.join(os.getcwd() + '/cypher/Object Properties', object_prop_metadata.label,
+                                   f"{file_name}.cypher")
+        if not os.path.exists(cypher_path):
+            return False
+        dangling = [index for index, (subject_uri, object_uri) in enumerate(record['edges'])
+                    if subject_uri not in self.node_index or object_uri not in self.node_index]
+        if (dangling if self.dangling_edge_mode == 'drop' else []) != record['dropped']:
+            return False
+        self.dangling_edges += len(dangling)
+        self.copy_page_script(cypher_path, all_scripts_file)
+        self.generation.pages[record['page']] = record
+        self.metrics.increment('generation_pages', kind='edges', status='reused')
+        self.record_page(self.get_item(object_prop_metadata), 'cypher', len(record['edges']) - len(record['dropped']),
+                         0, os.path.getsize(cypher_path))
+        return True
+
+    def start_generation(self) -> None:
+        """
+        Starts an incremental generation. The generation manifest of the previous generation is loaded, and
+        "All.cypher" or the shards are removed, since they are written again from all pages. The delta script "delta.cypher" is
+        opened, and the new and changed nodes are written into it while the pages are written.
+
+        Parameters
+        ----------
+        None
+        """
+        cypher_directory_path = os.path.join(os.getcwd() + '/cypher')
+        self.generation = GenerationManifest(cypher_directory_path, f"{self.mode} {self.edge_mode} {self.batch_size} "
+                                             f"{self.dangling_edge_mode} {self.dbPedia_uri} {self.script_version}")
+        self.previous_nodes = GenerationManifest.get_nodes(self.generation.previous)
+        self.delta_counts = {'nodes_added': 0, 'nodes_changed': 0, 'nodes_removed': 0,
+                             'edges_added': 0, 'edges_removed': 0}
+        if os.path.exists(f"{cypher_directory_path}/All.cypher"):
+            os.remove(f"{cypher_directory_path}/All.cypher")
+        if os.path.exists(f"{cypher_directory_path}/shards.json"):
+            os.remove(f"{cypher_directory_path}/shards.json")
+        if os.path.exists(f"{cypher_directory_path}/shards"):
+            shutil.rmtree(f"{cypher_directory_path}/shards")
+        self.delta_file = open(f"{cypher_directory_path}/delta.cypher", "w", buffering=self.buffer_size)
+        self.delta_writer = CypherBatchWriter(
+            [self.delta_file], self.batch_size) if self.mode == 'unwind' else None
+
+    def finish_generation(self) -> None:
+        """
+        Finishes an incremental generation. The nodes of the previous generation which no pages wrote any more are
+        deleted with their edges in the delta script, and the edges are compared with the previous generation,
+        to delete the removed ones and merge the added ones. Batches are flushed after each of these steps, so that
+        the nodes exist before the edges which match them. The cypher files of pages which no longer exist are
+        removed, and the generation manifest is saved.
+
+        Parameters
+        ----------
+        None
+        """
+        nodes = GenerationManifest.get_nodes(self.generation.pages)
+        if self.delta_writer is not None:
+            self.delta_writer.flush()
+        for node_iri, (label, _) in self.previous_nodes.items():
+            if node_iri not in nodes:
+                self.write_delta(f"UNWIND $rows AS row MATCH (n:{label} {{IRI: row}}) DETACH DELETE n",
+                                 to_cypher_literal(node_iri))
+                self.delta_counts['nodes_removed'] += 1
+        if self.delta_writer is not None:
+            self.delta_writer.flush()
+        previous_edges = GenerationManifest.get_edges(self.generation.previous)
+        edges = GenerationManifest.get_edges(self.generation.pages)
+        for edge_name, domain_label, range_label, subject_uri, object_uri in sorted(previous_edges - edges):
+            self.write_delta(f"UNWIND $rows AS row MATCH (a{domain_label} {{IRI: row.s}})-[r:{edge_name}]->"
+                             f"(b{range_label} {{IRI: row.o}}) DELETE r",
+                             to_cypher_literal({'s': subject_uri, 'o': object_uri}))
+            self.delta_counts['edges_removed'] += 1
+        if self.delta_writer is not None:
+            self.delta_writer.flush()
+        for edge_name, domain_label, range_label, subject_uri, object_uri in sorted(edges - previous_edges):
+            self.write_delta(f"UNWIND $rows AS row MATCH (a{domain_label} {{IRI: row.s}}), "
+                             f"(b{range_label} {{IRI: row.o}}) MERGE (a)-[:{edge_name}]->(b)",
+                             to_cypher_literal({'s': subject_uri, 'o': object_uri}))
+            self.delta_counts['edges_added'] += 1
+        if self.delta_writer is not None:
+            self.delta_writer.flush()
+        self.delta_file.close()
+        for page in self.generation.previous:
+            cypher_path = os.path.join(os.getcwd() + '/cypher', f"{page}.cypher")
+            if page not in self.generation.pages and os.path.exists(cypher_path):
+                os.remove(cypher_path)
+        self.generation.save()
+        for name, count in self.delta_counts.items():
+            self.metrics.set(f'delta_{name}', count)
+        print(f"Delta: {self.delta_counts['nodes_added']:,} nodes added, {self.delta_counts['nodes_changed']:,} "
+              f"changed, {self.delta_counts['nodes_removed']:,} removed, {self.delta_counts['edges_added']:,} edges "
+              f"added, {self.delta_counts['edges_removed']:,} removed")
+
+    def write_delta(self, statement: str, row: str) -> None:
+        """
+        Writes a statement of the delta script for one row. In 'unwind' mode, rows are batched by their statement
+        with self.delta_writer, otherwise the row is bound with WITH, so that each statement runs on its own.
+
+        Parameters
+        ----------
+        statement: str
+            The cypher statement which consumes the rows, starting with UNWIND $rows AS row.
+
+        row: str
+            The row, as a cypher literal.
+        """
+        if self.delta_writer is not None:
+            self.delta_writer.add_literal(statement, row)
+            return
+        self.delta_file.write(statement.replace('UNWIND $rows AS row', f"WITH {row} AS row", 1) + ';\n')
+
+    def copy_page_script(self, cypher_path: str, all_scripts_file: TextIO) -> None:
+        """
+        Appends the scripts of the cypher file of a page to "All.cypher", the same way as they were written from
+        the page. With variables in 'create' mode, "All.cypher" is one statement, so the ; which ends the cypher
+        file is left out. The statements are written one at a time, so that a shard writer can start a new shard
+        between any two of them.
+
+        Parameters
+        ----------
+        cypher_path: str
+            Path of the cypher file of the page.
+
+        all_scripts_file: TextIO
+            The "All.cypher" file.
+        """
+        with open(cypher_path, "r") as cypher:
+            script = cypher.read()
+        if self.mode == 'create' and self.edge_mode == 'variable':
+            script = script.removesuffix(';')
+        statements = script.split(';\n')
+        for statement in statements[:-1]:
+            all_scripts_file.write(statement + ';\n')
+        all_scripts_file.write(statements[-1] + '\n')
+
+    def open_all_scripts(self, phase: str) -> TextIO:
+        """
+        Opens the file that the scripts of all pages are written into: "All.cypher" in append mode, or, with
+        sharding, a shard writer for the nodes or the edges, which records its shards in self.shards.
+
+        Parameters
+        ----------
+        phase: str
+            Either 'nodes' or 'edges'.
+
+        Returns
+        -------
+        TextIO
+            The file or the shard writer, which are closed by the caller.
+        """
+        cypher_directory_path = os.path.join(os.getcwd() + '/cypher')
+        if self.shards is None:
+            return open(f"{cypher_directory_path}/All.cypher", "a", buffering=self.buffer_size)
+        return CypherShardWriter(f"{cypher_directory_path}/shards", phase, self.shard_bytes, self.shard_statements,
+                                 self.shard_compression, self.shards)
+
+    def finish_all_scripts(self) -> None:
+        """
+        Records the size of "All.cypher", or, with sharding, writes the load manifest "cypher/shards.json". It lists
+        the constraints script, and then the node shards and the edge shards, each with its number of statements,
+        size and SHA-256 checksum. All node shards have to be loaded before the edge shards, but the shards of one
+        phase are independent, so a loader can run them in parallel, and resume a failed load from the shards
+        which it has not loaded yet. The manifest is replaced through a temporary file, so it always lists
+        complete shards.
+
+        Parameters
+        ----------
+        None
+        """
+        cypher_directory_path = os.path.join(os.getcwd() + '/cypher')
+        if self.shards is None:
+            self.metrics.set('all_cypher_bytes', os.path.getsize(f"{cypher_directory_path}/All.cypher"))
+            return
+        phases = [{'phase': phase, 'shards': [{**shard, 'file': f"shards/{shard['file']}"}
+                                              for shard in self.shards if shard['phase'] == phase]}
+                  for phase in ('nodes', 'edges')]
+        manifest = {'constraints': 'constraints.cypher', 'compression': self.shard_compression, 'phases': phases}
+        write_file_atomic(f"{cypher_directory_path}/shards.json",
+                          json.dumps(manifest, indent=2).encode('utf8'))
+        total_bytes = sum(shard['bytes'] for shard in self.shards)
+        self.metrics.set('all_cypher_bytes', total_bytes)
+        self.metrics.set('cypher_shards', len(self.shards))
+        print(f"Shards: {len(phases[0]['shards']):,} node shards and {len(phases[1]['shards']):,} edge shards, "
+              f"{sum(shard['statements'] for shard in self.shards):,} statements, {total_bytes / (1 << 20):,.1f} MiB")
+
+    def get_page(self, metadata, file_name: str) -> str:
+        """
+        Returns the path of a page, relative to the "data" folder, which identifies it in the generation manifest.
+
+        Parameters
+        ----------
+        metadata: ClassMetaData or ObjectPropertyMetaData
+            Metadata object of the class or object property.
+
+        file_name: str
+            Name of the page file.
+
+        Returns
+        -------
+        str
+            For example "Classes/Film/0".
+        """
+        return f"{self.get_item(metadata)}/{file_name}"
+
+    def is_edge_connected(self, subject_uri: str, object_uri: str) -> bool:
+        """
+        Checks that the subject and the object of an edge are nodes. A dangling edge is counted, and it is
+        kept only if self.dangling_edge_mode is 'keep'.
+
+        Parameters
+        ----------
+        subject_uri: str
+            IRI of the subject.
+
+        object_uri: str
+            IRI of the object.
+
+        Returns
+        -------
+        bool
+            Whether the edge should be written.
+        """
+        if subject_uri in self.node_index and object_uri in self.node_index:
+            return True
+        self.dangling_edges += 1
+        return self.dangling_edge_mode == 'keep'
+
+    def report_dangling_edges(self) -> None:
+        """
+        Prints the number of dangling edges of the last edge-generation step.
+
+        Parameters
+        ----------
+        None
+        """
+        action = 'dropped' if self.dangling_edge_mode == 'drop' else 'kept'
+        print(f"Dangling edges: {self.dangling_edges} {action}")
+        self.metrics.set('dangling_edges', self.dangling_edges,
+                         action=action)
+
+    def report_node_index(self, target: str, node_index: NodeIndex) -> None:
+        """
+        Prints the size of a node index, and records its size and the deduplication hit rate of a target, which
+        is the fraction of the node records that were duplicates.
+
+        Parameters
+        ----------
+        target: str
+            Either 'cypher' or 'csv'.
+
+        node_index: NodeIndex
+            The node index of the target.
+        """
+        print(node_index.get_report())
+        duplicates = self.metrics.get('duplicate_nodes', target=target)
+        records = duplicates + self.metrics.get('nodes', target=target)
+        self.metrics.set('node_index_bytes', node_index.get_size(), target=target)
+        self.metrics.set('node_dedup_hit_ratio', duplicates / records if records > 0 else 0.0,
+                         target=target)
+
+    def record_page(self, item: str, target: str, rows: int, duplicates: int, size: int = None) -> None:
+        """
+        Records a written page in self.metrics: its pages, rows and bytes in the counters of its class or object
+        property, and its rows and duplicate nodes in the counters of the target.
+
+        Parameters
+        ----------
+        item: str
+            The class or object property, as its folder relative to the "data" folder.
+
+        target: str
+            Either 'cypher' or 'csv'.
+
+        rows: int
+            Number of written nodes or edges.
+
+        duplicates: int
+            Number of node records which were skipped as duplicates.
+
+        size: int
+            Size of the cypher file of the page in bytes, for the cypher target.
+        """
+        kind = 'nodes' if item.startswith('Classes') else 'edges'
+        self.metrics.increment('item_pages', stage='generate', item=item, target=target)
+        self.metrics.increment('item_rows', rows, stage='generate', item=item, target=target)
+        self.metrics.increment(kind, rows, target=target)
+        if duplicates > 0:
+            self.metrics.increment('duplicate_nodes', duplicates, target=target)
+        if size is not None:
+            self.metrics.increment('item_bytes', size, stage='generate', item=item)
+            self.metrics.increment('cypher_bytes', size)
+
+    def get_item(self, metadata) -> str:
+        """
+        Returns the folder of a class or object property, relative to the "data" folder, which labels its
+        metrics the same way as the crawler does.
+
+        Parameters
+        ----------
+        metadata: ClassMetaData or ObjectPropertyMetaData
+            Metadata object of the class or object property.
+
+        Returns
+        -------
+        str
+            For example "Classes/Film".
+        """
+        return os.path.relpath(metadata.folder_path, os.path.join(os.getcwd(), 'data'))
+
+    def map_pages(self, function: Callable, arguments: list[tuple]) -> Iterator:
+        """
+        Applies a page conversion function to each tuple of arguments and yields the results in order. With more
+        than one worker, pages are converted in a process pool, with at most two pages per worker in flight, so
+        that the results which wait to be merged stay bounded.
+
+        Parameters
+        ----------
+        function: Callable
+            A module-level page conversion function, such as convert_node_page.
+
+        arguments: list[tuple]
+            Arguments of each call.
+
+        Returns
+        -------
+        Iterator
+            The results, in the order of arguments.
+        """
+        if self.workers <= 1:
+            for argument in arguments:
+                yield function(*argument)
+            return
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = deque()
+            for argument in arguments:
+                futures.append(executor.submit(function, *argument))
+                if len(futures) >= 2 * self.workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+
+    def create_constraints(self) -> None:
+        """
+        Creates "cypher/constraints.cypher", with a uniqueness constraint on the IRI property for the label of each
+        root class. Every node has the label of its root class, so these constraints also index the lookups of
+        edges which match their nodes by label and IRI.
+
+        Parameters
+        ----------
+        None
+        """
+        cypher_directory_path = os.path.join(os.getcwd() + '/cypher')
+        os.makedirs(cypher_directory_path, exist_ok=True)
+        with open(f"{cypher_directory_path}/constraints.cypher", "w") as constraints:
+            for _, cls_metadata in self.classes.items():
+                if len(cls_metadata.parentClass) > 0:
+                    continue
+                label = cls_metadata.label.replace(' ', '_').upper()
+                constraints.write(
+                    f"CREATE CONSTRAINT {label.lower()}_iri IF NOT EXISTS FOR (n:{label}) REQUIRE n.IRI IS UNIQUE;\n")
+
+    def create_csv_for_classes(self) -> None:
+        """
+        We read JSON data that are in "data/Classes" folder for each class, and then write the nodes into
+        "csv/nodes_<Label>" files for neo4j-admin. The IRI is the node ID, the class and each Is_<Subclass> flag
+        which is 1 give the labels of the node, and the other variables are node properties. Each class is split
+        into part files of at most self.csv_part_rows rows. Nodes are deduplicated by IRI over all classes with
+        self.node_index.
+
+        Parameters
+        ----------
+        None
+        """
+        os.makedirs(os.path.join(os.getcwd() + '/csv'), exist_ok=True)
+        self.node_index.clear()
+        for _, cls_metadata in self.classes.items():
+            if len(cls_metadata.parentClass) > 0:
+                continue
+            progress_prefix = f'Node CSV: {cls_metadata.label}'.ljust(60)
+            folder_path = cls_metadata.folder_path
+            file_names = get_page_file_names(folder_path)
+            total_count = len(file_names)
+            for index, file_name in enumerate(file_names):
+                self.write_node_csv_page(
+                    cls_metadata, os.path.join(folder_path, file_name))
+                printProgressBar(
+                    index + 1, total_count, prefix=progress_prefix, suffix='Complete', length=50)
+        self.report_node_index('csv', self.node_index)
+
+    def write_node_csv_page(self, cls_metadata: ClassMetaData, page) -> None:
+        """
+        Writes the nodes of one page into the CSV files of its class. The files of a class are created with the
+        variables of its first record as columns.
+
+        Parameters
+        ----------
+        cls_metadata: ClassMetaData
+            Metadata object of the class.
+
+        page: str or dict
+            Path of the page file, or its SPARQL JSON result.
+        """
+        with self.metrics.time_item('generate', self.get_item(cls_metadata)):
+            rows, duplicates = self.write_node_csv_rows(cls_metadata, page)
+        self.record_page(self.get_item(cls_metadata), 'csv', rows, duplicates)
+
+    def write_node_csv_rows(self, cls_metadata: ClassMetaData, page) -> tuple[int, int]:
+        """
+        Writes the nodes of one page into the CSV files of its class, for write_node_csv_page.
+
+        Parameters
+        ----------
+        cls_metadata: ClassMetaData
+            Metadata object of the class.
+
+        page: str or dict
+            Path of the page file, or its SPARQL JSON result.
+
+        Returns
+        -------
+        tuple[int, int]
+            Number of written nodes, and number of duplicate nodes.
+        """
+        rows = 0
+        duplicates = 0
+        reader = open_page(page)
+        for values in reader.values():
+            if cls_metadata.label not in self.csv_node_writers:
+                columns = [variable for variable in reader.variables
+                           if variable.lower() != cls_metadata.label.lower() and 'Is_' not in variable]
+                writer = CSVPartWriter(os.path.join(os.getcwd() + '/csv'), f"nodes_{cls_metadata.label.replace(' ', '_').upper()}",
+                                       ['IRI:ID', ':LABEL'] + columns, self.csv_part_rows)
+                self.csv_node_writers[cls_metadata.label] = (writer, columns)
+            writer, columns = self.csv_node_writers[cls_metadata.label]
+            _, labels, properties = GraphDBGenerator.parse_node_record(
+                values, reader.variables, cls_metadata)
+            if not self.csv_node_index.add(properties.get('IRI', '')):
+                duplicates += 1
+                continue
+            writer.write_row([properties.get('IRI', ''), ';'.join(labels)] +
+                             [properties.get(column, '') for column in columns])
+            rows += 1
+        return rows, duplicates
+
+    def create_csv_for_object_properties(self) -> None:
+        """
+        We read JSON data that are in "data/Object Properties" folder for each relation, and then write the edges
+        into "csv/rels_<TYPE>" files for neo4j-admin. The subject and object IRIs are the start and end IDs.
+        Object properties with the same label share their files, and each type is split into part files of at
+        most self.csv_part_rows rows. Dangling edges are dropped or only counted, as in cypher files.
+
+        Parameters
+        ----------
+        None
+        """
+        os.makedirs(os.path.join(os.getcwd() + '/csv'), exist_ok=True)
+        self.dangling_edges = 0
+        for object_prop_metadata in self.object_properties:
+            progress_prefix = f'Edge CSV: {object_prop_metadata.label}'.ljust(
+                60)
+            self.get_edge_csv_writer(object_prop_metadata.label)
             folder_path = object_prop_metadata.folder_path
-            for index, file_name in enumerate(os.listdir(folder_path)):
-                with open(f"{object_properties_directory_path}/Object Properties/{object_prop_metadata.label}/{file_name}.cypher", "w+") as cypher:
-                    total_count = len(os.listdir(folder_path))
-                    file_path = os.path.join(folder_path, file_name)
-                    with open(file_path, "r") as file:
-                        data = json.load(file)
-                        bindings = data['results']['bindings']
-                        subject = data['head']['vars'][0]
-                        object = data['head']['vars'][1]
-                        for record in bindings:
-                            subject_uri = record[f"{subject}"]['value']
-                            object_uri = record[f"{object}"]['value']
-                            if self.dbPedia_uri not in subject_uri or self.dbPedia_uri not in object_uri:
-                                continue
-                            subject_node = sanitize_node_name(
-                                get_last_part(subject_uri))
-                            object_node = sanitize_node_name(
-                                get_last_part(object_uri))
-                            script += f"CREATE ({subject_node})-[:{edge_name}]->({object_node})\n"
-                        cypher.write(script)
-                        cypher.flush()
-                        all_scripts_file.write(script)
-                        all_scripts_file.flush()
-                        time.sleep(0.1)
-                        printProgressBar(
-                            index + 1, total_count, prefix=progress_prefix, suffix='Complete', length=50)
-                        script = ''
-                    cypher.write(';')
-                    all_scripts_file.write('\n')
-                    cypher.close()
-        all_scripts_file.close()
+            file_names = get_page_file_names(folder_path)
+            total_count = len(file_names)
+            for index, file_name in enumerate(file_names):
+                self.write_edge_csv_page(
+                    object_prop_metadata, os.path.join(folder_path, file_name))
+                printProgressBar(
+                    index + 1, total_count, prefix=progress_prefix, suffix='Complete', length=50)
+        self.report_dangling_edges()
+
+    def get_edge_csv_writer(self, edge_type: str) -> CSVPartWriter:
+        """
+        Returns the CSV writer of an edge type, and creates it if it does not exist yet.
+
+        Parameters
+        ----------
+        edge_type: str
+            The label of the object property.
+
+        Returns
+        -------
+        CSVPartWriter
+            The writer of "csv/rels_<TYPE>" files.
+        """
+        if edge_type not in self.csv_edge_writers:
+            self.csv_edge_writers[edge_type] = CSVPartWriter(os.path.join(os.getcwd() + '/csv'), f"rels_{sanitize_edge_name(edge_type)}",
+                                                             [':START_ID', ':END_ID', ':TYPE'], self.csv_part_rows)
+        return self.csv_edge_writers[edge_type]
+
+    def write_edge_csv_page(self, object_prop_metadata: ObjectPropertyMetaData, page) -> None:
+        """
+        Writes the edges of one page into the CSV files of its type.
+
+        Parameters
+        ----------
+        object_prop_metadata: ObjectPropertyMetaData
+            Metadata object of the object property.
+
+        page: str or dict
+            Path of the page file, or its SPARQL JSON result.
+        """
+        edge_type = object_prop_metadata.label
+        writer = self.get_edge_csv_writer(edge_type)
+        rows = 0
+        with self.metrics.time_item('generate', self.get_item(object_prop_metadata)):
+            reader = open_page(page)
+            for values in reader.values():
+                subject_uri, object_uri = values[0], values[1]
+                if self.dbPedia_uri not in subject_uri or self.dbPedia_uri not in object_uri:
+                    continue
+                if not self.is_edge_connected(subject_uri, object_uri):
+                    continue
+                writer.write_row([subject_uri, object_uri, edge_type])
+                rows += 1
+        self.record_page(self.get_item(object_prop_metadata), 'csv', rows, 0)
+
+    def finish_csv(self) -> None:
+        """
+        Closes the CSV writers, and writes "csv/import.args" with the node and relationship files.
+
+        Parameters
+        ----------
+        None
+        """
+        for writer, _ in self.csv_node_writers.values():
+            writer.close()
+            self.import_args.append(f"--nodes={','.join(writer.file_names)}")
+        for writer in self.csv_edge_writers.values():
+            writer.close()
+            if len(writer.file_names) > 1:
+                self.import_args.append(
+                    f"--relationships={','.join(writer.file_names)}")
+        csv_directory_path = os.path.join(os.getcwd() + '/csv')
+        self.metrics.set('csv_bytes', sum(os.path.getsize(os.path.join(csv_directory_path, file_name))
+                                          for file_name in os.listdir(csv_directory_path)))
+        self.import_args += ['--skip-duplicate-nodes=true', '--skip-bad-relationships=true',
+                             '--ignore-empty-strings=true', '--multiline-fields=true']
+        with open(os.path.join(os.getcwd() + '/csv', 'import.args'), "w", encoding='utf8') as file:
+            file.write('\n'.join(self.import_args) + '\n')
+
+    @staticmethod
+    def parse_node_record(values: list[str], variables: list[str], cls_metadata: ClassMetaData) -> tuple[str, list[str], dict]:
+        """
+        Extracts a node from a class record. The class variable gives the node name, which is its cypher variable
+        from get_node_variable, the first label and the IRI property, each Is_<Subclass> variable which is 1 gives an extra label, and the other variables give
+        the node properties.
+
+        Parameters
+        ----------
+        values: list[str]
+            The value of each variable of the record, or None if it is unbound.
+
+        variables: list[str]
+            The variables of the class query.
+
+        cls_metadata: ClassMetaData
+            Metadata object of the class.
+
+        Returns
+        -------
+        tuple[str, list[str], dict]
+            The node name, the node labels, and the node properties with their raw values.
+        """
+        node_name = ''
+        labels = ['']
+        properties = dict()
+        for variable, value in zip(variables, values):
+            if value is None:
+                continue
+            if variable.lower() == cls_metadata.label.lower():
+                record_iri = value
+                node_name = get_node_variable(record_iri)
+                labels[0] = variable.upper()
+                properties['IRI'] = record_iri
+            elif 'Is_' in variable:
+                if value == '1':
+                    labels.append(variable.removeprefix('Is_').upper())
+            else:
+                properties[variable] = value
+        return node_name, labels, properties
+
+    def get_root_label(self, cls_iri: str) -> str:
+        """
+        Returns the node label of the root class of a class, which every node of the class has, for matching
+        nodes by label and IRI. If the class is not in the ontology, it returns an empty string.
+
+        Parameters
+        ----------
+        cls_iri: str
+            IRI of the class.
+
+        Returns
+        -------
+        str
+            The label with its leading : character, or an empty string.
+        """
+        if cls_iri not in self.classes:
+            return ''
+        return ':' + self.classes[self.index.get_root(cls_iri)].label.replace(' ', '_').upper()
+
+
+def convert_node_page(page, cls_metadata: ClassMetaData, mode: str) -> list[tuple[str, str, str]]:
+    """
+    Converts one page of class records into cypher. It runs in a worker process, so it only depends on its
+    arguments. Nodes are deduplicated by IRI within the page, and the caller deduplicates them across pages.
+
+    Parameters
+    ----------
+    page: str or dict
+        Path of the page file, or its SPARQL JSON result.
+
+    cls_metadata: ClassMetaData
+        Metadata object of the class.
+
+    mode: str
+        Either 'create' or 'unwind'.
+
+    Returns
+    -------
+    list[tuple[str, str, str]]
+        For each node, its IRI, and either no statement and its CREATE statement in 'create' mode, or its
+        UNWIND statement and its row as a cypher literal in 'unwind' mode.
+    """
+    nodes = []
+    nodes_set = set()
+    reader = open_page(page)
+    for values in reader.values():
+        node_name, labels, properties = GraphDBGenerator.parse_node_record(
+            values, reader.variables, cls_metadata)
+        node_iri = properties.get('IRI', '')
+        if node_iri in nodes_set:
+            continue
+        nodes_set.add(node_iri)
+        if mode == 'unwind':
+            nodes.append((node_iri, f"UNWIND $rows AS row CREATE (n:{':'.join(labels)}) SET n = row",
+                          to_cypher_literal(properties)))
+            continue
+        extended_classes = ' ' + ''.join(f":{label} " for label in labels[1:])
+        vars_script = ''
+        for key, value in properties.items():
+            if key == 'IRI':
+                vars_script += f"IRI" + ":\"" + value + "\","
+            else:
+                vars_script += f"{key}" + ":\"" + \
+                    value.replace('"', ('\'')).replace('\\', ('\'')) + "\","
+        nodes.append((node_iri, None,
+                      f"CREATE ({node_name}:{labels[0]}{extended_classes} {{{vars_script[:-1]}}})\n"))
+    return nodes
+
+
+def convert_node_upserts(page, cls_metadata: ClassMetaData) -> dict[str, tuple[str, str, str]]:
+    """
+    Converts one page of class records into the MERGE statements of a delta script, for incremental generation.
+    A node is matched by its root label and IRI, its properties are replaced, and its subclass labels are set
+    or removed, so that the statement turns any earlier version of the node into this one. It runs in a worker
+    process, so it only depends on its arguments.
+
+    Parameters
+    ----------
+    page: str or dict
+        Path of the page file, or its SPARQL JSON result.
+
+    cls_metadata: ClassMetaData
+        Metadata object of the class.
+
+    Returns
+    -------
+    dict[str, tuple[str, str, str]]
+        For each node IRI, a digest of its labels and properties, its UNWIND MERGE statement and its row as a
+        cypher literal. The first record of a node in the page wins, as in convert_node_page.
+    """
+    upserts = dict()
+    reader = open_page(page)
+    for values in reader.values():
+        _, labels, properties = GraphDBGenerator.parse_node_record(
+            values, reader.variables, cls_metadata)
+        node_iri = properties.get('IRI', '')
+        if node_iri in upserts:
+            continue
+        removed_labels = [variable.removeprefix('Is_').upper() for variable in reader.variables
+                          if 'Is_' in variable and variable.removeprefix('Is_').upper() not in labels[1:]]
+        statement = f"UNWIND $rows AS row MERGE (n:{labels[0]} {{IRI: row.IRI}}) SET n = row"
+        if len(labels) > 1:
+            statement += f" SET n:{':'.join(labels[1:])}"
+        if len(removed_labels) > 0:
+            statement += f" REMOVE n:{':'.join(removed_labels)}"
+        row = to_cypher_literal(properties)
+        upserts[node_iri] = (hashlib.sha256(f"{statement}\n{row}".encode('utf8')).hexdigest()[:32], statement, row)
+    return upserts
+
+
+def convert_node_page_with_upserts(page, cls_metadata: ClassMetaData, mode: str) -> tuple[list[tuple[str, str, str]],
+                                                                                          dict[str, tuple[str, str, str]]]:
+    """
+    Converts one page of class records with convert_node_page and convert_node_upserts, in one worker call.
+
+    Returns
+    -------
+    tuple[list[tuple[str, str, str]], dict[str, tuple[str, str, str]]]
+        The converted nodes and their MERGE statements.
+    """
+    return convert_node_page(page, cls_metadata, mode), convert_node_upserts(page, cls_metadata)
+
+
+def convert_edge_page(page, edge_name: str, domain_label: str, range_label: str, mode: str, edge_mode: str,
+                      dbPedia_uri: str) -> list[tuple[str, str, str, str]]:
+    """
+    Converts one page of object property records into cypher. It runs in a worker process, so it only depends
+    on its arguments. Records whose subject or object is not a DBPedia resource are skipped.
+
+    Parameters
+    ----------
+    page: str or dict
+        Path of the page file, or its SPARQL JSON result.
+
+    edge_name: str
+        The sanitized edge name.
+
+    domain_label: str
+        The root class label of the domain, with its leading : character.
+
+    range_label: str
+        The root class label of the range, with its leading : character.
+
+    mode: str
+        Either 'create' or 'unwind'.
+
+    edge_mode: str
+        Either 'variable' or 'match', in 'create' mode.
+
+    dbPedia_uri: str
+        The prefix URI of instances in DBPedia.
+
+    Returns
+    -------
+    list[tuple[str, str, str, str]]
+        For each edge, the subject and object IRIs, and either no statement and its cypher statement in
+        'create' mode, or its UNWIND statement and its row as a cypher literal in 'unwind' mode.
+    """
+    edges = []
+    edge_statement = f"UNWIND $rows AS row MATCH (a{domain_label} {{IRI: row.s}}), " \
+        f"(b{range_label} {{IRI: row.o}}) CREATE (a)-[:{edge_name}]->(b)"
+    reader = open_page(page)
+    for values in reader.values():
+        subject_uri, object_uri = values[0], values[1]
+        if dbPedia_uri not in subject_uri or dbPedia_uri not in object_uri:
+            continue
+        if mode == 'unwind':
+            edges.append((subject_uri, object_uri, edge_statement, to_cypher_literal(
+                {'s': subject_uri, 'o': object_uri})))
+        elif edge_mode == 'match':
+            edges.append((subject_uri, object_uri, None, f"MATCH (a{domain_label} {{IRI: {to_cypher_literal(subject_uri)}}}), "
+                          f"(b{range_label} {{IRI: {to_cypher_literal(object_uri)}}}) CREATE (a)-[:{edge_name}]->(b);\n"))
+        else:
+            subject_node = get_node_variable(subject_uri)
+            object_node = get_node_variable(object_uri)
+            edges.append(
+                (subject_uri, object_uri, None, f"CREATE ({subject_node})-[:{edge_name}]->({object_node})\n"))
+    return edges
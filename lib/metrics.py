@@ -0,0 +1,440 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator
+from lib.utils import *
+
+
+class Metrics:
+    """
+    A Python class for recording the timing and throughput of the pipeline, and writing them as JSON lines or as a
+    Prometheus textfile.
+
+    ...
+
+    A metric is a counter, a gauge or a histogram, with a name and a set of labels, for example
+    sparql_query_seconds{kind="page"}. The three steps of the pipeline are timed with stage(), which records their
+    wall and CPU time, and the work of each class and object property is timed with time_item(). All methods
+    are thread-safe, and without a file the metrics are only kept in memory, so the pipeline can always record
+    them.
+
+    In 'jsonl' format, one line is appended for each finished stage, and close() appends one line for each
+    metric. In 'prometheus' format, the file is written again in the text exposition format after each stage
+    and on close(), through a rename, so that a node_exporter textfile collector never reads a partial file.
+
+    With profiling, each stage is profiled with cProfile or tracemalloc. cProfile only profiles the threads which
+    run inside profile_thread(), and the statistics of all threads of a stage are merged into
+    "<file>.<stage>.prof", which can be read with pstats or snakeviz. tracemalloc traces all threads, and the
+    peak traced memory of the stage is recorded, with its top allocation sites in "<file>.<stage>.tracemalloc.txt".
+    The process pool workers of GraphDBGenerator are not profiled.
+
+    Attributes
+    ----------
+    file_path: str
+        Path of the metrics file, or None if the metrics are not written.
+
+    format: str
+        Either 'jsonl' or 'prometheus'.
+
+    profile: str
+        Either 'none', 'cprofile' or 'tracemalloc'.
+
+    buckets: dict[str, tuple[float]]
+        Upper bounds of the buckets of each histogram.
+
+    Methods
+    -------
+    stage(name: str) -> Iterator:
+        A context manager which times a stage of the pipeline, and profiles it.
+
+    time_item(stage: str, item: str, wall: bool) -> Iterator:
+        A context manager which adds the wall and CPU time of a block to a class or object property.
+
+    profile_thread() -> Iterator:
+        A context manager which profiles the current thread with cProfile, within the current stage.
+
+    increment(name: str, value: float, **labels) -> None:
+        Adds a value to a counter.
+
+    set(name: str, value: float, **labels) -> None:
+        Sets the value of a gauge.
+
+    observe(name: str, value: float, **labels) -> None:
+        Adds an observation to a histogram.
+
+    get(name: str, **labels) -> float:
+        Returns the value of a counter or a gauge.
+
+    close() -> None:
+        Writes all metrics into the file.
+    """
+
+    buckets = {
+        'sparql_query_seconds': (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+        'page_rows': (0, 10, 100, 1000, 2500, 5000, 10000, 50000),
+        'page_parse_seconds': (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    }
+
+    def __init__(self, file_path: str = None, format: str = 'jsonl', profile: str = 'none') -> None:
+        """
+        Initializes the metrics, without any recorded values.
+
+        Parameters
+        ----------
+        file_path: str
+            Path of the metrics file. The metrics are only kept in memory if it is not given.
+
+        format: str
+            Either 'jsonl', for JSON lines which are appended to the file, or 'prometheus', for a textfile in
+            the Prometheus text exposition format.
+
+        profile: str
+            Either 'none', 'cprofile', which profiles the functions of each stage, or 'tracemalloc', which traces
+            the memory allocations of each stage.
+        """
+
+        if format not in ('jsonl', 'prometheus'):
+            raise ValueError(f"Unknown metrics format: {format}")
+        if profile not in ('none', 'cprofile', 'tracemalloc'):
+            raise ValueError(f"Unknown profiler: {profile}")
+        self.file_path = file_path
+        self.format = format
+        self.profile = profile
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.counters: dict[tuple, float] = dict()
+        self.gauges: dict[tuple, float] = dict()
+        self.histograms: dict[tuple, list] = dict()
+        self.profilers: list[cProfile.Profile] = None
+        if self.file_path is not None:
+            directory_path = os.path.dirname(os.path.abspath(self.file_path))
+            os.makedirs(directory_path, exist_ok=True)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator:
+        """
+        Times a stage of the pipeline, and profiles it if profiling is enabled. The wall time, the CPU time of
+        this process and the CPU time of its finished child processes are recorded as stage_*_seconds gauges.
+
+        Parameters
+        ----------
+        name: str
+            Name of the stage, such as 'extract', 'crawl' or 'generate'.
+        """
+
+        if self.profile == 'cprofile':
+            self.profilers = []
+        elif self.profile == 'tracemalloc':
+            tracemalloc.start()
+        start_time = time.perf_counter()
+        start_cpu = time.process_time()
+        start_times = os.times()
+        try:
+            with self.profile_thread():
+                yield
+        finally:
+            end_times = os.times()
+            wall_seconds = time.perf_counter() - start_time
+            cpu_seconds = time.process_time() - start_cpu
+            children_cpu_seconds = round(end_times.children_user + end_times.children_system -
+                                         start_times.children_user - start_times.children_system, 6)
+            self.set('stage_wall_seconds', wall_seconds, stage=name)
+            self.set('stage_cpu_seconds', cpu_seconds, stage=name)
+            self.set('stage_children_cpu_seconds', children_cpu_seconds, stage=name)
+            record = {'type': 'stage', 'stage': name, 'wall_seconds': wall_seconds, 'cpu_seconds': cpu_seconds,
+                      'children_cpu_seconds': children_cpu_seconds}
+            record.update(self.finish_profile(name))
+            if self.format == 'jsonl':
+                self.write_lines([record])
+            else:
+                self.write_textfile()
+
+    @contextmanager
+    def time_item(self, stage: str, item: str, wall: bool = True) -> Iterator:
+        """
+        Adds the wall time and the CPU time of the current thread, in a block, to the item_wall_seconds and
+        item_cpu_seconds counters of a class or object property. Work which is done for an item on other
+        threads is added with wall set to False, so that its CPU time is counted but its wall time, which
+        overlaps with the item, is not.
+
+        Parameters
+        ----------
+        stage: str
+            Name of the stage.
+
+        item: str
+            The class or object property, as its folder relative to the "data" folder.
+
+        wall: bool
+            Whether the wall time of the block is added.
+        """
+
+        start_time = time.perf_counter()
+        start_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            if wall:
+                self.increment('item_wall_seconds', time.perf_counter() - start_time, stage=stage, item=item)
+            self.increment('item_cpu_seconds', time.thread_time() - start_cpu, stage=stage, item=item)
+
+    @contextmanager
+    def profile_thread(self) -> Iterator:
+        """
+        Profiles the current thread with cProfile until the end of the block, if cProfile profiling is enabled
+        and a stage is running. Nested blocks on the same thread are profiled once.
+
+        Parameters
+        ----------
+        None
+        """
+
+        profilers = self.profilers
+        if profilers is None or getattr(self.local, 'profiler', None) is not None:
+            yield
+            return
+        profiler = cProfile.Profile()
+        with self.lock:
+            profilers.append(profiler)
+        self.local.profiler = profiler
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self.local.profiler = None
+
+    def finish_profile(self, stage: str) -> dict:
+        """
+        Stops the profiler of a stage and writes its output next to the metrics file.
+
+        Parameters
+        ----------
+        stage: str
+            Name of the stage.
+
+        Returns
+        -------
+        dict
+            The fields which are added to the record of the stage.
+        """
+
+        record = dict()
+        if self.profile == 'cprofile' and self.profilers is not None:
+            profilers, self.profilers = self.profilers, None
+            if len(profilers) > 0 and self.file_path is not None:
+                stats = pstats.Stats(profilers[0])
+                for profiler in profilers[1:]:
+                    stats.add(profiler)
+                record['profile'] = f"{self.file_path}.{stage}.prof"
+                stats.dump_stats(record['profile'])
+        elif self.profile == 'tracemalloc' and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.set('stage_peak_traced_bytes', peak, stage=stage)
+            record['peak_traced_bytes'] = peak
+            if self.file_path is not None:
+                record['profile'] = f"{self.file_path}.{stage}.tracemalloc.txt"
+                with open(record['profile'], 'w', encoding='utf8') as file:
+                    for statistic in snapshot.statistics('lineno')[:25]:
+                        file.write(f"{statistic}\n")
+        return record
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        """
+        Adds a value to a counter.
+
+        Parameters
+        ----------
+        name: str
+            Name of the counter.
+
+        value: float
+            The value which is added.
+
+        labels: dict
+            Labels of the counter.
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        """
+        Sets the value of a gauge.
+
+        Parameters
+        ----------
+        name: str
+            Name of the gauge.
+
+        value: float
+            The new value.
+
+        labels: dict
+            Labels of the gauge.
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """
+        Adds an observation to a histogram, whose buckets are given in self.buckets.
+
+        Parameters
+        ----------
+        name: str
+            Name of the histogram.
+
+        value: float
+            The observed value.
+
+        labels: dict
+            Labels of the histogram.
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+        bounds = self.buckets[name]
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(bounds), 0, 0.0]
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += 1
+            histogram[2] += value
+
+    def get(self, name: str, **labels) -> float:
+        """
+        Returns the value of a counter or a gauge, or zero if it is not recorded.
+
+        Parameters
+        ----------
+        name: str
+            Name of the counter or the gauge.
+
+        labels: dict
+            Labels of the counter or the gauge.
+
+        Returns
+        -------
+        float
+            The value.
+        """
+
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            return self.counters.get(key, self.gauges.get(key, 0))
+
+    def close(self) -> None:
+        """
+        Writes all metrics into the file, as one JSON line per metric, or as a Prometheus textfile.
+
+        Parameters
+        ----------
+        None
+        """
+
+        if self.format == 'jsonl':
+            records = []
+            with self.lock:
+                for metric_type, values in (('counter', self.counters), ('gauge', self.gauges)):
+                    for (name, labels), value in sorted(values.items()):
+                        records.append({'type': metric_type, 'metric': name, 'labels': dict(labels), 'value': value})
+                for (name, labels), (counts, count, total) in sorted(self.histograms.items()):
+                    records.append({'type': 'histogram', 'metric': name, 'labels': dict(labels),
+                                    'buckets': dict(zip(map(str, self.buckets[name]), counts)), 'count': count,
+                                    'sum': total})
+            self.write_lines(records)
+        else:
+            self.write_textfile()
+
+    def write_lines(self, records: list[dict]) -> None:
+        """
+        Appends records to the JSON-lines file, with the current time.
+
+        Parameters
+        ----------
+        records: list[dict]
+            The records.
+        """
+
+        if self.file_path is None:
+            return
+        now = time.time()
+        with open(self.file_path, 'a', encoding='utf8') as file:
+            for record in records:
+                file.write(json.dumps({'time': now, **record}, ensure_ascii=False) + '\n')
+
+    def write_textfile(self) -> None:
+        """
+        Writes all metrics into the file in the Prometheus text exposition format. Metric names get the
+        "ontology_to_graphdb_" prefix, and histograms get cumulative buckets.
+
+        Parameters
+        ----------
+        None
+        """
+
+        if self.file_path is None:
+            return
+        lines = []
+        with self.lock:
+            for metric_type, values in (('counter', self.counters), ('gauge', self.gauges)):
+                last_name = None
+                for (name, labels), value in sorted(values.items()):
+                    name = f"ontology_to_graphdb_{name}" + ('_total' if metric_type == 'counter' else '')
+                    if name != last_name:
+                        lines.append(f"# TYPE {name} {metric_type}")
+                        last_name = name
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+            last_name = None
+            for (name, labels), (counts, count, total) in sorted(self.histograms.items()):
+                bounds = self.buckets[name]
+                name = f"ontology_to_graphdb_{name}"
+                if name != last_name:
+                    lines.append(f"# TYPE {name} histogram")
+                    last_name = name
+                cumulative = 0
+                for bound, bucket_count in zip(bounds, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total}")
+                lines.append(f"{name}_count{format_labels(labels)} {count}")
+        write_file_atomic(self.file_path, ('\n'.join(lines) + '\n').encode('utf8'))
+
+
+def format_labels(labels: tuple[tuple[str, str]]) -> str:
+    """
+    Formats labels for the Prometheus text exposition format, such as {stage="crawl",item="Classes/Film"}.
+
+    Parameters
+    ----------
+    labels: tuple[tuple[str, str]]
+        Pairs of label name and value.
+
+    Returns
+    -------
+    str
+        The formatted labels, or an empty string if there are none.
+    """
+
+    if len(labels) == 0:
+        return ''
+    escaped = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
@@ -0,0 +1,260 @@
+import hashlib
+import math
+from array import array
+
+
+class NodeIndex:
+    """
+    A Python class for keeping the set of node IRIs which are written, over all classes, in a compact form.
+
+    ...
+
+    A Python set of IRI strings costs more than 100 bytes per IRI, which is gigabytes at DBPedia scale. Instead,
+    each IRI is reduced to a 64-bit hash. In 'hash' mode the hashes are kept in an open-addressing hash table,
+    which is an array of 64-bit integers that is at most half full, so an IRI costs 16 to 32 bytes. Two IRIs
+    collide with a probability of about n² / 2⁶⁵, which is negligible for a few billion IRIs. In 'bloom' mode the
+    IRIs are kept in a Bloom filter, which is sized for the given capacity and error rate, for example about
+    1.8 bytes per IRI for an error rate of 0.001. A false positive makes a new node look like a duplicate, so in
+    'bloom' mode a small fraction of the nodes may be dropped.
+
+    Attributes
+    ----------
+    kind: str
+        Either 'hash' or 'bloom'.
+
+    count: int
+        Number of IRIs which are added.
+
+    capacity: int
+        Number of IRIs that the Bloom filter is sized for.
+
+    error_rate: float
+        False positive rate of the Bloom filter at its capacity.
+
+    Methods
+    -------
+    add(iri: str) -> bool:
+        Adds an IRI, and returns whether it was not in the index yet.
+
+    __contains__(iri: str) -> bool:
+        Returns whether an IRI is in the index.
+
+    clear() -> None:
+        Removes all IRIs.
+
+    get_size() -> int:
+        Returns the memory size of the index in bytes.
+
+    get_report() -> str:
+        Returns a line which describes the size of the index.
+    """
+
+    initial_slots = 1 << 10
+
+    def __init__(self, kind: str = 'hash', capacity: int = 10000000, error_rate: float = 0.001) -> None:
+        """
+        Initializes an empty index.
+
+        Parameters
+        ----------
+        kind: str
+            Either 'hash', for a hash table of 64-bit IRI hashes, or 'bloom', for a Bloom filter.
+
+        capacity: int
+            Number of IRIs that the Bloom filter is sized for, in 'bloom' mode.
+
+        error_rate: float
+            False positive rate of the Bloom filter at its capacity, in 'bloom' mode.
+        """
+
+        if kind not in ('hash', 'bloom'):
+            raise ValueError(f"Unknown node index: {kind}")
+        if not 0 < error_rate < 1:
+            raise ValueError(f"Invalid error rate: {error_rate}")
+        self.kind = kind
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+        self.clear()
+
+    def clear(self) -> None:
+        """
+        Removes all IRIs from the index.
+
+        Parameters
+        ----------
+        None
+        """
+
+        self.count = 0
+        if self.kind == 'hash':
+            self.slots = array('Q', bytes(8 * self.initial_slots))
+            self.mask = self.initial_slots - 1
+        else:
+            self.bit_count = max(8, math.ceil(-self.capacity *
+                                 math.log(self.error_rate) / math.log(2) ** 2))
+            self.hash_count = max(
+                1, round(self.bit_count / self.capacity * math.log(2)))
+            self.bits = bytearray((self.bit_count + 7) // 8)
+
+    def add(self, iri: str) -> bool:
+        """
+        Adds an IRI to the index.
+
+        Parameters
+        ----------
+        iri: str
+            The IRI of the node.
+
+        Returns
+        -------
+        bool
+            True if the IRI was not in the index, False if it was already added.
+        """
+
+        if self.kind == 'bloom':
+            added = False
+            for position in self.get_bit_positions(iri):
+                if not self.bits[position >> 3] & (1 << (position & 7)):
+                    self.bits[position >> 3] |= 1 << (position & 7)
+                    added = True
+            if added:
+                self.count += 1
+            return added
+        key = self.get_key(iri)
+        slots = self.slots
+        slot = key & self.mask
+        while slots[slot] != 0:
+            if slots[slot] == key:
+                return False
+            slot = (slot + 1) & self.mask
+        slots[slot] = key
+        self.count += 1
+        if 2 * self.count > len(slots):
+            self.grow()
+        return True
+
+    def __contains__(self, iri: str) -> bool:
+        """
+        Returns whether an IRI is in the index. In 'bloom' mode, it may return True for an IRI which was not
+        added, with a probability of about self.error_rate.
+
+        Parameters
+        ----------
+        iri: str
+            The IRI of the node.
+
+        Returns
+        -------
+        bool
+            Whether the IRI was added.
+        """
+
+        if self.kind == 'bloom':
+            return all(self.bits[position >> 3] & (1 << (position & 7))
+                       for position in self.get_bit_positions(iri))
+        key = self.get_key(iri)
+        slots = self.slots
+        slot = key & self.mask
+        while slots[slot] != 0:
+            if slots[slot] == key:
+                return True
+            slot = (slot + 1) & self.mask
+        return False
+
+    def grow(self) -> None:
+        """
+        Doubles the number of slots of the hash table, and inserts the keys again.
+
+        Parameters
+        ----------
+        None
+        """
+
+        old_slots = self.slots
+        self.slots = array('Q', bytes(16 * len(old_slots)))
+        self.mask = len(self.slots) - 1
+        slots = self.slots
+        for key in old_slots:
+            if key == 0:
+                continue
+            slot = key & self.mask
+            while slots[slot] != 0:
+                slot = (slot + 1) & self.mask
+            slots[slot] = key
+
+    @staticmethod
+    def get_key(iri: str) -> int:
+        """
+        Returns the 64-bit hash of an IRI. Zero marks an empty slot, so it is never returned.
+
+        Parameters
+        ----------
+        iri: str
+            The IRI of the node.
+
+        Returns
+        -------
+        int
+            The hash, which is not zero.
+        """
+
+        key = int.from_bytes(hashlib.blake2b(
+            iri.encode('utf8'), digest_size=8).digest(), 'little')
+        return key or 1
+
+    def get_bit_positions(self, iri: str) -> list[int]:
+        """
+        Returns the bits of an IRI in the Bloom filter, with double hashing of a 128-bit hash.
+
+        Parameters
+        ----------
+        iri: str
+            The IRI of the node.
+
+        Returns
+        -------
+        list[int]
+            self.hash_count bit positions.
+        """
+
+        digest = hashlib.blake2b(iri.encode('utf8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.bit_count for i in range(self.hash_count)]
+
+    def get_size(self) -> int:
+        """
+        Returns the memory size of the hash table or the Bloom filter.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        int
+            The size in bytes.
+        """
+
+        if self.kind == 'bloom':
+            return len(self.bits)
+        return len(self.slots) * self.slots.itemsize
+
+    def get_report(self) -> str:
+        """
+        Returns a line with the number of IRIs, the size of the index, and its size per million IRIs.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        str
+            The report line.
+        """
+
+        size = self.get_size()
+        per_million = size / max(1, self.count) * 1000000
+        return (f"Node index ({self.kind}): {self.count} IRIs, {size / (1 << 20):.1f} MiB, "
+                f"{per_million / (1 << 20):.1f} MiB per million IRIs")
@@ -17,16 +17,40 @@ class OntologyExtractor:
     objectPropertiesMetaData: list[ObjectPropertyMetaData]
         A list for storing metadata of object properties.
 
+    metadataIndex: MetadataIndex
+        The class hierarchy and domain/range indexes over the metadata.
+
     Methods
     -------
     start() -> None:
         Starts the metadata-extraction process.
 
+    extract(source) -> None:
+        Extracts the metadata from an ontology file in a single streaming pass.
+
     """
 
     classesMetaData: dict[str, ClassMetaData] = dict()
     objectPropertiesMetaData: list[ObjectPropertyMetaData] = []
 
+    namespaces = {
+        'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+        'rdfs': 'http://www.w3.org/2000/01/rdf-schema#',
+        'owl': 'http://www.w3.org/2002/07/owl#'
+    }
+    class_tag = f"{{{namespaces['owl']}}}Class"
+    datatype_property_tag = f"{{{namespaces['owl']}}}DatatypeProperty"
+    object_property_tag = f"{{{namespaces['owl']}}}ObjectProperty"
+    element_tags = [class_tag, datatype_property_tag, object_property_tag]
+    about_xpath = etree.XPath('@rdf:about', namespaces=namespaces)
+    label_xpath = etree.XPath('rdfs:label', namespaces=namespaces)
+    subclass_xpath = etree.XPath(
+        'rdfs:subClassOf/@rdf:resource', namespaces=namespaces)
+    domain_xpath = etree.XPath(
+        'rdfs:domain/@rdf:resource', namespaces=namespaces)
+    range_xpath = etree.XPath(
+        'rdfs:range/@rdf:resource', namespaces=namespaces)
+
     def __init__(self, file: str, url: str) -> None:
         """
         Initilaizes the self.file and self.url properties
@@ -47,7 +71,8 @@ class OntologyExtractor:
         Starts the metadata-extraction process from the specified ontology. Note that ontologies should
         be given in RDF/XML format and match the structure of DBPedia. TO get started, some sample ontologies
         are already given in 'ontologies' folder. If the file path is specified, we read from file, otherwise 
-        we read from URL. We extract these metadata using XPATH and save thethe objects into 'metadata' folder.
+        we stream it from URL. We extract these metadata using XPATH in the extract method and save the objects
+        into 'metadata' folder.
 
         We extract the following information from the ontology using XPATH:
             
@@ -73,63 +98,77 @@ class OntologyExtractor:
 
         print('Step 1, Crawling Ontology '.ljust(129, '#'))
         if self.file:
-            xml_content = open(self.file, 'r').read()
+            source = self.file
         elif self.url:
-            response = requests.get(self.url)
-            xml_content = response.content
+            response = requests.get(self.url, stream=True)
+            response.raise_for_status()
+            response.raw.decode_content = True
+            source = response.raw
         else:
             exit()
 
-        xml_tree = etree.fromstring(xml_content)
-
-        namespaces = {
-            'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
-            'rdfs': 'http://www.w3.org/2000/01/rdf-schema#',
-            'owl': 'http://www.w3.org/2002/07/owl#'
-        }
-
-        classes = xml_tree.xpath('//owl:Class', namespaces=namespaces)
-
-        for cls in classes:
-            class_iri = cls.xpath('@rdf:about', namespaces=namespaces)[0]
-            class_label = cls.xpath(
-                "rdfs:label", namespaces=namespaces)[0].text
-            subClassOf_element = cls.xpath(
-                "rdfs:subClassOf/@rdf:resource", namespaces=namespaces)
-            parentClass = ''
-            if (len(subClassOf_element) > 0):
-                parentClass = str(subClassOf_element[0])
-            self.classesMetaData[class_iri] = ClassMetaData(
-                label=class_label, parentClass=parentClass)
-
-        dtProperties = xml_tree.xpath(
-            '//owl:DatatypeProperty', namespaces=namespaces)
-
-        for dtProperty in dtProperties:
-            dtProperty_iri = dtProperty.xpath(
-                '@rdf:about', namespaces=namespaces)[0]
-            dtProperty_label = dtProperty.xpath(
-                "rdfs:label", namespaces=namespaces)[0].text
-            dtProperty_domain = dtProperty.xpath(
-                "rdfs:domain/@rdf:resource", namespaces=namespaces)[0]
+        self.extract(source)
+
+        dump_metadata_to_file(self.classesMetaData,
+                              self.objectPropertiesMetaData, self.metadataIndex)
+
+    def extract(self, source) -> None:
+        """
+        Extracts the metadata of classes, datatype properties and object properties in a single streaming pass
+        over the ontology, with lxml iterparse and precompiled XPath expressions. Each top-level element is
+        cleared as soon as it is processed, so memory does not grow with the size of the ontology. Since
+        properties may come before their classes in the document, we first collect the elements in document
+        order, and then attach properties to their classes. Each class then gets the properties of all its
+        subclasses, at any depth, from the MetadataIndex. Elements without an rdf:about IRI, like anonymous
+        classes, are skipped, as well as properties without a domain or a range.
 
+        Parameters
+        ----------
+        source: str or file
+            Path of the ontology file, or a file-like object which returns its bytes.
+        """
+
+        self.classesMetaData = dict()
+        self.objectPropertiesMetaData = []
+        dtProperties = []
+        objProperties = []
+
+        for _, element in etree.iterparse(source, events=('end',), tag=self.element_tags):
+            element_iri = self.about_xpath(element)
+            element_label = self.label_xpath(element)
+            if len(element_iri) > 0:
+                element_iri = str(element_iri[0])
+                element_label = element_label[0].text
+                if element.tag == self.class_tag:
+                    subClassOf_element = self.subclass_xpath(element)
+                    parentClass = ''
+                    if (len(subClassOf_element) > 0):
+                        parentClass = str(subClassOf_element[0])
+                    self.classesMetaData[element_iri] = ClassMetaData(
+                        label=element_label, parentClass=parentClass)
+                elif element.tag == self.datatype_property_tag:
+                    dtProperty_domain = self.domain_xpath(element)
+                    if len(dtProperty_domain) > 0:
+                        dtProperties.append(
+                            (element_iri, element_label, str(dtProperty_domain[0])))
+                else:
+                    objProperty_domain = self.domain_xpath(element)
+                    objProperty_range = self.range_xpath(element)
+                    if len(objProperty_domain) > 0 and len(objProperty_range) > 0:
+                        objProperties.append((element_iri, element_label, str(objProperty_domain[0]),
+                                              str(objProperty_range[0])))
+            parent = element.getparent()
+            if parent is not None and parent.getparent() is None:
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+        for dtProperty_iri, dtProperty_label, dtProperty_domain in dtProperties:
             if dtProperty_domain in self.classesMetaData:
                 self.classesMetaData[dtProperty_domain].properties.append(
                     Property(dtProperty_label, dtProperty_iri))
 
-        objProperties = xml_tree.xpath(
-            '//owl:ObjectProperty', namespaces=namespaces)
-
-        for objProperty in objProperties:
-            objProperty_iri = objProperty.xpath(
-                '@rdf:about', namespaces=namespaces)[0]
-            objProperty_label = objProperty.xpath(
-                "rdfs:label", namespaces=namespaces)[0].text
-            objProperty_domain = objProperty.xpath(
-                "rdfs:domain/@rdf:resource", namespaces=namespaces)[0]
-            objProperty_range = objProperty.xpath(
-                "rdfs:range/@rdf:resource", namespaces=namespaces)[0]
-
+        for objProperty_iri, objProperty_label, objProperty_domain, objProperty_range in objProperties:
             objProperty_domain_label = get_last_part(objProperty_domain)
             objProperty_range_label = get_last_part(objProperty_range)
 
@@ -142,10 +181,7 @@ class OntologyExtractor:
             self.objectPropertiesMetaData.append(ObjectPropertyMetaData(
                 objProperty_iri, objProperty_label, objProperty_domain, objProperty_domain_label, objProperty_range, objProperty_range_label))
 
-        for _, cls_metadata in self.classesMetaData.items():
-            if len(cls_metadata.parentClass) > 0:
-                self.classesMetaData[cls_metadata.parentClass].properties.extend(
-                    cls_metadata.properties)
-
-        dump_metadata_to_file(self.classesMetaData,
-                              self.objectPropertiesMetaData)
+        self.metadataIndex = MetadataIndex(
+            self.classesMetaData, self.objectPropertiesMetaData)
+        for cls_iri, cls_metadata in self.classesMetaData.items():
+            cls_metadata.properties = self.metadataIndex.inherited_properties[cls_iri]
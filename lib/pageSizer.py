@@ -0,0 +1,139 @@
+class PageSizer:
+    """
+    A Python class for choosing the number of rows per page of a class or object property, from the response
+    times of the previous pages.
+
+    ...
+
+    The page size starts at max_size, which is the LIMIT of DBPediaCrawler and should not be larger than the
+    maximum result size of the endpoint, since larger pages would be truncated. When a page fails because the
+    endpoint timed out or returned a partial result, or takes longer than target_seconds, the size is halved,
+    down to min_size. When grow_after full pages in a row take less than a quarter of target_seconds each, the
+    size is doubled, up to max_size. After a failure, four times as many fast pages are required, so that a size
+    which failed is not tried again at once. Without adaptation, the size is always max_size.
+
+    Attributes
+    ----------
+    size: int
+        The current page size.
+
+    max_size: int
+        The largest page size.
+
+    min_size: int
+        The smallest page size.
+
+    target_seconds: float
+        Number of seconds that a page should take.
+
+    adaptive: bool
+        Whether the page size adapts.
+
+    grow_after: int
+        Number of fast full pages in a row after which the page size is doubled.
+
+    Methods
+    -------
+    page_finished(rows: int, requested: int, seconds: float) -> None:
+        Adjusts the page size after a page is fetched.
+
+    page_failed() -> bool:
+        Halves the page size after a page failed, and returns whether it could be halved.
+
+    can_shrink() -> bool:
+        Returns whether the page size can still be halved.
+    """
+
+    grow_after = 4
+
+    def __init__(self, max_size: int, min_size: int = 500, target_seconds: float = 10.0, adaptive: bool = False) -> None:
+        """
+        Initializes the page size to max_size.
+
+        Parameters
+        ----------
+        max_size: int
+            The largest page size.
+
+        min_size: int
+            The smallest page size.
+
+        target_seconds: float
+            Number of seconds that a page should take.
+
+        adaptive: bool
+            Whether the page size adapts.
+        """
+
+        self.max_size = max(1, int(max_size))
+        self.min_size = min(max(1, int(min_size)), self.max_size)
+        self.target_seconds = target_seconds
+        self.adaptive = adaptive
+        self.size = self.max_size
+        self.streak = 0
+
+    def page_finished(self, rows: int, requested: int, seconds: float) -> None:
+        """
+        Halves the page size if the page was slower than self.target_seconds, and doubles it after enough full
+        pages which were faster than a quarter of it.
+
+        Parameters
+        ----------
+        rows: int
+            Number of rows of the page.
+
+        requested: int
+            The page size of the page query.
+
+        seconds: float
+            Number of seconds that the page took.
+        """
+
+        if not self.adaptive:
+            return
+        if seconds > self.target_seconds:
+            self.size = max(self.min_size, min(self.size, requested) // 2)
+            self.streak = 0
+        elif rows >= requested and seconds < self.target_seconds / 4:
+            self.streak += 1
+            if self.streak >= self.grow_after:
+                self.size = min(self.max_size, max(self.size, requested) * 2)
+                self.streak = 0
+
+    def page_failed(self) -> bool:
+        """
+        Halves the page size after the endpoint timed out or returned a partial result.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        bool
+            Whether the page should be fetched again with the smaller size, which is False when the size is
+            already self.min_size or does not adapt.
+        """
+
+        if not self.can_shrink():
+            return False
+        self.size = max(self.min_size, self.size // 2)
+        self.streak = -3 * self.grow_after
+        return True
+
+    def can_shrink(self) -> bool:
+        """
+        Returns whether the page size adapts and is still larger than self.min_size, so that a page which times
+        out can be fetched again with a smaller size.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        bool
+            Whether page_failed would halve the page size.
+        """
+
+        return self.adaptive and self.size > self.min_size
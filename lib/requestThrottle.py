@@ -0,0 +1,372 @@
+import email.utils
+import http.client
+import random
+import socket
+import threading
+import time
+import urllib.error
+from typing import Callable
+
+
+class ConnectTimeoutError(TimeoutError):
+    """
+    A timeout while a connection to the endpoint is opened, before the query is sent. Unlike a timeout while the
+    response is read, which usually means that the query itself is slow, it means that the endpoint is overloaded.
+    """
+
+
+class RequestThrottle:
+    """
+    A Python class for limiting the rate and the concurrency of SPARQL requests, and retrying the requests which
+    fail for a transient reason.
+
+    ...
+
+    Requests take a token from a token bucket, which is refilled at rate tokens per second up to burst tokens, so
+    the average rate stays below rate while short bursts are allowed. The number of requests in flight is bounded
+    by a concurrency limit, which is adjusted with AIMD (additive increase, multiplicative decrease): every
+    successful request raises the limit by 1 / limit, which is about one more request per round trip, and every
+    throttled request, or request slower than the target latency, halves it. The limit never goes below
+    min_concurrency or above max_concurrency, and it is halved at most once per round of requests, so that one
+    burst of errors is counted as one congestion signal. In this way, the crawler can be started with a high
+    concurrency and settles just under the limit of the endpoint.
+
+    Responses with 429 Too Many Requests, 502, 503 or 504, timeouts and broken connections are retried up to
+    max_retries times. If the response has a Retry-After header, all requests wait until that time, otherwise the
+    request waits for an exponential backoff with full jitter, a random delay between zero and
+    min(backoff_max, backoff_base * 2^attempt). Other errors, such as a malformed query, are raised at once.
+
+    Only connect timeouts count as congestion. A 504 Gateway Timeout or a timeout while the response is read
+    usually means that the query is too slow, which neither a retry nor a lower concurrency fixes, and every
+    attempt can take the whole read timeout. So such a query timeout is not a congestion signal, and it is only
+    retried max_timeout_retries times.
+
+    Attributes
+    ----------
+    rate: float
+        Maximum average number of requests per second. Zero means the rate is not limited.
+
+    burst: float
+        Maximum number of tokens in the bucket.
+
+    max_concurrency: int
+        The highest concurrency limit, which is also the initial one.
+
+    min_concurrency: int
+        The lowest concurrency limit.
+
+    limit: float
+        The current concurrency limit.
+
+    max_retries: int
+        Maximum number of retries of a request.
+
+    max_timeout_retries: int
+        Maximum number of retries of a request after query timeouts, which also count towards max_retries.
+
+    backoff_base: float
+        Number of seconds of the first backoff.
+
+    backoff_max: float
+        Maximum number of seconds of a backoff.
+
+    target_latency: float
+        Number of seconds that a request may take before it counts as a congestion signal. Zero means latency
+        is not used.
+
+    retries: int
+        Number of retried requests.
+
+    throttled: int
+        Number of requests which were throttled by the endpoint or could not connect in time.
+
+    Methods
+    -------
+    call(function: Callable, retry_timeouts: bool) -> object:
+        Runs a request when the throttle allows it, and retries it if it fails for a transient reason.
+
+    acquire() -> float:
+        Waits for a token and a free slot under the concurrency limit.
+
+    release(started: float, congested: bool, retry_after: float) -> None:
+        Frees the slot of a request, and adjusts the concurrency limit.
+
+    is_query_timeout(error: Exception) -> bool:
+        Checks whether a request failed because the query was too slow.
+
+    get_report() -> str:
+        Returns a line which describes the retries and the concurrency limit.
+    """
+
+    retry_codes = (429, 502, 503, 504)
+    throttle_codes = (429, 503)
+
+    def __init__(self, max_concurrency: int = 1, rate: float = 0, burst: float = 0, max_retries: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0, target_latency: float = 0,
+                 min_concurrency: int = 1, seed: int = None, max_timeout_retries: int = 1) -> None:
+        """
+        Initializes the throttle with a full token bucket and the highest concurrency limit.
+
+        Parameters
+        ----------
+        max_concurrency: int
+            The highest concurrency limit, which is usually the number of crawler threads.
+
+        rate: float
+            Maximum average number of requests per second. Zero means the rate is not limited.
+
+        burst: float
+            Maximum number of requests which can be sent at once after an idle period. By default, it is one
+            second of requests.
+
+        max_retries: int
+            Maximum number of retries of a request.
+
+        backoff_base: float
+            Number of seconds of the first backoff.
+
+        backoff_max: float
+            Maximum number of seconds of a backoff.
+
+        target_latency: float
+            Number of seconds that a request may take before it counts as a congestion signal. Zero means latency
+            is not used.
+
+        min_concurrency: int
+            The lowest concurrency limit.
+
+        seed: int
+            Seed of the jitter.
+
+        max_timeout_retries: int
+            Maximum number of retries of a request after query timeouts.
+        """
+
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = min(max(1, int(min_concurrency)), self.max_concurrency)
+        self.rate = max(0.0, float(rate))
+        self.burst = max(1.0, float(burst) if burst > 0 else self.rate)
+        self.max_retries = max(0, int(max_retries))
+        self.max_timeout_retries = max(0, int(max_timeout_retries))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.target_latency = target_latency
+        self.limit = float(self.max_concurrency)
+        self.tokens = self.burst
+        self.refilled = time.monotonic()
+        self.paused_until = 0.0
+        self.decreased = 0.0
+        self.in_flight = 0
+        self.retries = 0
+        self.throttled = 0
+        self.random = random.Random(seed)
+        self.condition = threading.Condition()
+
+    def call(self, function: Callable, retry_timeouts: bool = True) -> object:
+        """
+        Runs a request when the throttle allows it. If it fails for a transient reason, it is retried after the
+        Retry-After time of the response or after a backoff, up to self.max_retries times, of which at most
+        self.max_timeout_retries after query timeouts.
+
+        Parameters
+        ----------
+        function: Callable
+            A function without arguments which sends the request and reads its response. It is called again for
+            each retry.
+
+        retry_timeouts: bool
+            Whether query timeouts are retried. A caller which can make the query cheaper, such as a page which
+            can shrink, handles them itself.
+
+        Returns
+        -------
+        object
+            The result of the function.
+        """
+
+        attempt = 0
+        timeouts = 0
+        while True:
+            started = self.acquire()
+            try:
+                result = function()
+            except Exception as error:
+                retryable, congested, retry_after = self.classify(error)
+                self.release(started, congested, retry_after)
+                if self.is_query_timeout(error):
+                    timeouts += 1
+                    if not retry_timeouts:
+                        raise
+                if not retryable or attempt >= self.max_retries or timeouts > self.max_timeout_retries:
+                    raise
+                if retry_after is None:
+                    retry_after = self.random.uniform(
+                        0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                with self.condition:
+                    self.retries += 1
+                attempt += 1
+                time.sleep(retry_after)
+                continue
+            self.release(started, False)
+            return result
+
+    def acquire(self) -> float:
+        """
+        Waits until the endpoint is not paused by a Retry-After, there is a token in the bucket, and fewer than
+        self.limit requests are in flight. Then it takes the token and the slot.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        float
+            The time that the request started, which is passed to release().
+        """
+
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.rate > 0:
+                    self.tokens = min(self.burst, self.tokens +
+                                      (now - self.refilled) * self.rate)
+                    self.refilled = now
+                wait = None
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.rate > 0 and self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                elif self.in_flight < int(self.limit):
+                    if self.rate > 0:
+                        self.tokens -= 1
+                    self.in_flight += 1
+                    return now
+                self.condition.wait(wait)
+
+    def release(self, started: float, congested: bool, retry_after: float = None) -> None:
+        """
+        Frees the slot of a finished request, and adjusts the concurrency limit. A congested request, or one that
+        took longer than self.target_latency, halves the limit, unless it started before the last decrease.
+        Any other request raises it by 1 / limit.
+
+        Parameters
+        ----------
+        started: float
+            The time that the request started, as returned by acquire().
+
+        congested: bool
+            Whether the request was throttled by the endpoint or could not connect in time.
+
+        retry_after: float
+            Number of seconds that the endpoint asked to wait, which pauses all requests.
+        """
+
+        with self.condition:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if congested:
+                self.throttled += 1
+            if retry_after is not None:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            if congested or (self.target_latency > 0 and now - started > self.target_latency):
+                if started >= self.decreased:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self.decreased = now
+            else:
+                self.limit = min(self.max_concurrency,
+                                 self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def classify(self, error: Exception) -> tuple[bool, bool, float]:
+        """
+        Decides whether an error is transient, and whether it is a congestion signal.
+
+        Parameters
+        ----------
+        error: Exception
+            The error of a request.
+
+        Returns
+        -------
+        tuple[bool, bool, float]
+            Whether the request should be retried, whether it signals congestion, and the Retry-After time in
+            seconds, or None if there is none.
+        """
+
+        if isinstance(error, urllib.error.HTTPError):
+            return (error.code in self.retry_codes, error.code in self.throttle_codes,
+                    parse_retry_after(error.headers.get('Retry-After') if error.headers is not None else None))
+        if isinstance(error, urllib.error.URLError):
+            error = error.reason
+        if isinstance(error, ConnectTimeoutError):
+            return True, True, None
+        if isinstance(error, (TimeoutError, socket.timeout, ConnectionError, http.client.HTTPException)):
+            return True, False, None
+        return False, False, None
+
+    def is_query_timeout(self, error: Exception) -> bool:
+        """
+        Checks whether a request failed because the query was too slow, which is a 504 Gateway Timeout or a
+        timeout while the response is read, as opposed to a connect timeout.
+
+        Parameters
+        ----------
+        error: Exception
+            The error of a request.
+
+        Returns
+        -------
+        bool
+            Whether the error is a query timeout.
+        """
+
+        if isinstance(error, urllib.error.HTTPError):
+            return error.code == 504
+        if isinstance(error, urllib.error.URLError):
+            error = error.reason
+        return isinstance(error, (TimeoutError, socket.timeout)) and not isinstance(error, ConnectTimeoutError)
+
+    def get_report(self) -> str:
+        """
+        Returns a line with the number of retries and throttled requests, and the current concurrency limit.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        str
+            The report line.
+        """
+
+        return (f"Throttle: {self.retries:,} retries, {self.throttled:,} throttled requests, "
+                f"concurrency limit {int(self.limit)} of {self.max_concurrency}")
+
+
+def parse_retry_after(value: str) -> float:
+    """
+    Parses a Retry-After header, which is either a number of seconds or an HTTP date.
+
+    Parameters
+    ----------
+    value: str
+        The value of the header, or None.
+
+    Returns
+    -------
+    float
+        The number of seconds to wait, or None if the header is missing or invalid.
+    """
+
+    if value is None:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
@@ -0,0 +1,313 @@
+import os
+import shutil
+import threading
+import time
+from typing import BinaryIO
+from lib.utils import *
+
+
+class ResponseCache:
+    """
+    A Python class for caching SPARQL responses on disk, so that re-running the pipeline does not send the same
+    queries to DBPedia again.
+
+    ...
+
+    Each response is saved into one file, named with the hash of the endpoint and the normalized query. The
+    modification time of the file is the time it was cached, which is used for the TTL, and the access time is
+    the time it was last used, which is used for the LRU eviction when the cache grows beyond its maximum size.
+
+    Attributes
+    ----------
+    directory_path: str
+        The folder that responses are saved into.
+
+    ttl: float
+        Number of seconds that a response stays valid. Zero means responses never expire.
+
+    max_bytes: int
+        Maximum total size of the cached responses. Zero means the cache is not bounded.
+
+    hits: int
+        Number of queries which were answered from the cache.
+
+    misses: int
+        Number of queries which were not found in the cache.
+
+    Methods
+    -------
+    get(endpoint: str, query: str, result_format: str) -> bytes:
+        Returns the cached response of a query, if there is a valid one.
+
+    put(endpoint: str, query: str, response: bytes, result_format: str) -> None:
+        Saves the response of a query, and evicts the least recently used responses if the cache is full.
+
+    open_response(endpoint: str, query: str, result_format: str) -> BinaryIO:
+        Opens the cached response of a query for reading, if there is a valid one.
+
+    put_file(endpoint: str, query: str, file_path: str, result_format: str) -> None:
+        Saves a response which is already written into a file.
+
+    get_key(endpoint: str, query: str, result_format: str) -> str:
+        Returns the file name of the response of a query.
+    """
+
+    def __init__(self, directory_path: str, ttl: float = 0, max_bytes: int = 0) -> None:
+        """
+        Opens the cache folder, and indexes the responses which are already cached.
+
+        Parameters
+        ----------
+        directory_path: str
+            The folder that responses are saved into.
+
+        ttl: float
+            Number of seconds that a response stays valid. Zero means responses never expire.
+
+        max_bytes: int
+            Maximum total size of the cached responses. Zero means the cache is not bounded.
+        """
+
+        self.directory_path = directory_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.entries: dict[str, list] = dict()
+        self.total_bytes = 0
+        os.makedirs(directory_path, exist_ok=True)
+        remove_temporary_files(directory_path)
+        for file_name in os.listdir(directory_path):
+            stat = os.stat(os.path.join(directory_path, file_name))
+            self.entries[file_name] = [stat.st_size, stat.st_atime]
+            self.total_bytes += stat.st_size
+        self.evict()
+
+    def get(self, endpoint: str, query: str, result_format: str = 'json') -> bytes:
+        """
+        Returns the cached response of a query, if it exists and is not expired. Otherwise it returns None.
+
+        Parameters
+        ----------
+        endpoint: str
+            URL of the SPARQL endpoint.
+
+        query: str
+            The SPARQL query.
+
+        result_format: str
+            The result format of the response, either 'json' or 'tsv'.
+
+        Returns
+        -------
+        bytes
+            The response body, or None.
+        """
+
+        file = self.open_response(endpoint, query, result_format)
+        if file is None:
+            return None
+        with file:
+            return file.read()
+
+    def open_response(self, endpoint: str, query: str, result_format: str = 'json') -> BinaryIO:
+        """
+        Opens the cached response of a query for reading, if it exists and is not expired. Otherwise it returns
+        None. The response is counted as used, so it is not evicted soon. The file is opened while self.lock is
+        held, so another thread which saves a response cannot evict it in between, and the open file can still
+        be read if it is evicted afterwards. A response whose file is gone is counted as a miss.
+
+        Parameters
+        ----------
+        endpoint: str
+            URL of the SPARQL endpoint.
+
+        query: str
+            The SPARQL query.
+
+        result_format: str
+            The result format of the response, either 'json' or 'tsv'.
+
+        Returns
+        -------
+        BinaryIO
+            The open response file, which the caller should close, or None.
+        """
+
+        key = self.get_key(endpoint, query, result_format)
+        file_path = os.path.join(self.directory_path, key)
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            try:
+                file = open(file_path, 'rb')
+            except FileNotFoundError:
+                self.remove(key)
+                self.misses += 1
+                return None
+            now = time.time()
+            modified = os.fstat(file.fileno()).st_mtime
+            if self.ttl > 0 and now - modified > self.ttl:
+                file.close()
+                self.remove(key)
+                self.misses += 1
+                return None
+            os.utime(file_path, (now, modified))
+            self.entries[key][1] = now
+            self.hits += 1
+            return file
+
+    def put(self, endpoint: str, query: str, response: bytes, result_format: str = 'json') -> None:
+        """
+        Saves the response of a query. If the cache grows beyond self.max_bytes, the least recently used
+        responses are evicted.
+
+        Parameters
+        ----------
+        endpoint: str
+            URL of the SPARQL endpoint.
+
+        query: str
+            The SPARQL query.
+
+        response: bytes
+            The response body.
+
+        result_format: str
+            The result format of the response, either 'json' or 'tsv'.
+        """
+
+        key = self.get_key(endpoint, query, result_format)
+        cache_path = os.path.join(self.directory_path, key)
+        write_file_atomic(cache_path, response, self.get_temp_path(cache_path))
+        self.add(key, len(response))
+
+    def put_file(self, endpoint: str, query: str, file_path: str, result_format: str = 'json') -> None:
+        """
+        Saves a response which is already written into a file, by copying the file into the cache.
+
+        Parameters
+        ----------
+        endpoint: str
+            URL of the SPARQL endpoint.
+
+        query: str
+            The SPARQL query.
+
+        file_path: str
+            Path of the file which contains the response body.
+
+        result_format: str
+            The result format of the response, either 'json' or 'tsv'.
+        """
+
+        key = self.get_key(endpoint, query, result_format)
+        cache_path = os.path.join(self.directory_path, key)
+        temp_path = self.get_temp_path(cache_path)
+        shutil.copyfile(file_path, temp_path)
+        os.replace(temp_path, cache_path)
+        self.add(key, os.path.getsize(cache_path))
+
+    def get_key(self, endpoint: str, query: str, result_format: str = 'json') -> str:
+        """
+        Returns the file name of the response of a query, which is the hash of the endpoint and the normalized
+        query, and of the result format unless it is JSON, so that the responses of a query in different formats
+        are kept apart.
+
+        Parameters
+        ----------
+        endpoint: str
+            URL of the SPARQL endpoint.
+
+        query: str
+            The SPARQL query.
+
+        result_format: str
+            The result format of the response, either 'json' or 'tsv'.
+
+        Returns
+        -------
+        str
+            The file name.
+        """
+
+        if result_format == 'json':
+            return hash_query(f'{endpoint} {query}')
+        return hash_query(f'{endpoint} {result_format} {query}')
+
+    @staticmethod
+    def get_temp_path(cache_path: str) -> str:
+        """
+        Returns the path of the temporary file that a response is written into before it is renamed into the
+        cache. It contains the id of the thread, so that two threads which save the same response at once do not
+        write into the same temporary file.
+
+        Parameters
+        ----------
+        cache_path: str
+            Path of the cached response.
+
+        Returns
+        -------
+        str
+            Path of the temporary file.
+        """
+
+        return f"{cache_path}.{threading.get_ident()}.tmp"
+
+    def add(self, key: str, size: int) -> None:
+        """
+        Adds a saved response to the index of the cache, and evicts old responses if the cache is full.
+
+        Parameters
+        ----------
+        key: str
+            Hash of the endpoint and the query.
+
+        size: int
+            Size of the response in bytes.
+        """
+
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries[key][0]
+            self.entries[key] = [size, time.time()]
+            self.total_bytes += size
+            self.evict(key)
+
+    def evict(self, keep_key: str = None) -> None:
+        """
+        Removes the least recently used responses until the cache fits into self.max_bytes.
+        The caller should hold self.lock.
+
+        Parameters
+        ----------
+        keep_key: str
+            Hash of a response which is never evicted, which is the one that has just been saved.
+        """
+
+        if self.max_bytes <= 0 or self.total_bytes <= self.max_bytes:
+            return
+        for key in sorted(self.entries, key=lambda entry: self.entries[entry][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key != keep_key:
+                self.remove(key)
+
+    def remove(self, key: str) -> None:
+        """
+        Removes a response from the cache. The caller should hold self.lock.
+
+        Parameters
+        ----------
+        key: str
+            Hash of the endpoint and the query.
+        """
+
+        size, _ = self.entries.pop(key)
+        self.total_bytes -= size
+        file_path = os.path.join(self.directory_path, key)
+        if os.path.exists(file_path):
+            os.remove(file_path)
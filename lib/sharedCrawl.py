@@ -0,0 +1,121 @@
+import os
+import shutil
+import threading
+from lib.utils import get_page_file_names
+
+
+class SharedCrawl:
+    """
+    A Python class for sharing the crawled classes and object properties between the ontologies of a batch run,
+    so that a query which an earlier ontology already fetched is not sent to DBPedia again.
+
+    ...
+
+    Ontologies of the same domain often have the same classes, such as Person or Artist. A class or object
+    property whose query, with its pagination and page size, is the same as the query of an item which is already
+    finished, gives the same pages. So each finished item is registered with the hash of its query, the folder of
+    its pages and their records in the crawl manifest, and DBPediaCrawler links these pages into the folder of
+    the later item instead of fetching them. Pages are hard links when possible, so they take no extra space,
+    and copies otherwise. Items are only registered once they are finished, so an item is never shared while its
+    pages are still being written.
+
+    Attributes
+    ----------
+    items: dict[str, dict]
+        The folder, the item record, the page file names and the page records of each finished item, with the
+        hash of its query as the key.
+
+    hits: int
+        Number of items which were shared instead of being fetched.
+
+    Methods
+    -------
+    add_item(query_hash: str, directory_path: str, record: dict, pages: dict[str, dict]) -> None:
+        Registers a finished item, unless an item with the same query is already registered.
+
+    get_item(query_hash: str) -> dict:
+        Returns the registered item with the same query, if there is one.
+
+    link_page(source_path: str, file_path: str) -> None:
+        Links or copies a shared page file into the folder of another item.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializes an empty registry.
+
+        Parameters
+        ----------
+        None
+        """
+
+        self.items: dict[str, dict] = dict()
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    def add_item(self, query_hash: str, directory_path: str, record: dict, pages: dict[str, dict]) -> None:
+        """
+        Registers a finished item. If an item with the same query is already registered, the first one is kept.
+
+        Parameters
+        ----------
+        query_hash: str
+            Hash of the item query.
+
+        directory_path: str
+            The folder of the pages of the item.
+
+        record: dict
+            The record of the item in the crawl manifest, with its total and its number of pages.
+
+        pages: dict[str, dict]
+            The records of the pages in the crawl manifest, with the page file name as the key.
+        """
+
+        file_names = [file_name for file_name in get_page_file_names(directory_path) if file_name.isdigit()]
+        with self.lock:
+            self.items.setdefault(query_hash, {'directory': directory_path, 'record': record,
+                                               'file_names': file_names, 'pages': pages})
+
+    def get_item(self, query_hash: str) -> dict:
+        """
+        Returns the registered item with the same query, and counts it as a hit.
+
+        Parameters
+        ----------
+        query_hash: str
+            Hash of the item query.
+
+        Returns
+        -------
+        dict
+            The registered item, or None if no finished item has the same query.
+        """
+
+        with self.lock:
+            shared_item = self.items.get(query_hash)
+            if shared_item is not None:
+                self.hits += 1
+            return shared_item
+
+    @staticmethod
+    def link_page(source_path: str, file_path: str) -> None:
+        """
+        Links a page file into the folder of another item, or copies it if the file system does not support hard
+        links. An existing file is replaced.
+
+        Parameters
+        ----------
+        source_path: str
+            Path of the shared page file.
+
+        file_path: str
+            Path of the page file of the item which shares it.
+        """
+
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        try:
+            os.link(source_path, file_path)
+        except OSError:
+            shutil.copyfile(source_path, file_path)
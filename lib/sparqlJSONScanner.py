@@ -0,0 +1,373 @@
+import json
+import re
+from typing import Iterator
+from lib.sparqlTSVScanner import SPARQLTSVReader
+from lib.stagingFormat import NDJSONPageReader, get_page_layout, open_page_file
+
+
+class SPARQLJSONScanner:
+    """
+    A Python class for scanning a SPARQL JSON result incrementally, without parsing the whole document.
+
+    ...
+
+    The result is fed in chunks of bytes. The scanner only tokenizes strings and brackets, which is enough to
+    check that the document is well-formed, to find the variable names in "head.vars" and to find the start and
+    the end of each binding in "results.bindings". Each binding can then be parsed on its own. Since UTF-8
+    multi-byte characters never contain ASCII bytes, the scanner works on the raw bytes.
+
+    Attributes
+    ----------
+    capture: str
+        Which bindings are kept. 'none' keeps no binding, 'last' keeps only the last one, and 'all' returns
+        every binding from feed().
+
+    variables: list[str]
+        The variable names in "head.vars", once they are scanned.
+
+    rows: int
+        Number of bindings which are scanned so far.
+
+    last_binding: bytes
+        The last binding, if capture is 'last' or 'all'.
+
+    Methods
+    -------
+    feed(chunk: bytes) -> list[bytes]:
+        Scans the next chunk and returns the bindings which are completed in it, if capture is 'all'.
+
+    close() -> None:
+        Checks that the whole document is scanned and is well-formed.
+
+    get_last_binding() -> dict:
+        Returns the last binding, parsed.
+    """
+
+    token_pattern = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]|"', re.DOTALL)
+
+    def __init__(self, capture: str = 'none') -> None:
+        """
+        Initializes an empty scanner.
+
+        Parameters
+        ----------
+        capture: str
+            Which bindings are kept, either 'none', 'last' or 'all'.
+        """
+
+        if capture not in ('none', 'last', 'all'):
+            raise ValueError(f"Unknown capture mode: {capture}")
+        self.capture = capture
+        self.variables: list[str] = []
+        self.rows = 0
+        self.last_binding: bytes = None
+        self.stack: list[bytes] = []
+        self.carry = b''
+        self.last_string = b''
+        self.bindings_depth = -1
+        self.vars_depth = -1
+        self.capture_start = -1
+        self.segments: list[bytes] = []
+        self.seen_bindings = False
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        """
+        Scans the next chunk of the document. A string or a binding which is split between two chunks is
+        completed with the next chunk.
+
+        Parameters
+        ----------
+        chunk: bytes
+            The next chunk of the document.
+
+        Returns
+        -------
+        list[bytes]
+            The bindings which are completed in this chunk, if capture is 'all', otherwise an empty list.
+        """
+
+        buffer = self.carry + chunk
+        self.carry = b''
+        completed = []
+        end = len(buffer)
+        for match in self.token_pattern.finditer(buffer):
+            token = match.group()
+            if token == b'"':
+                end = match.start()
+                self.carry = buffer[end:]
+                break
+            if token[0] == 0x22:
+                self.last_string = token
+                continue
+            depth = len(self.stack)
+            if token == b'{' or token == b'[':
+                if token == b'[' and depth == 2 and self.stack[0] == b'{' and self.stack[1] == b'{':
+                    if self.last_string == b'"bindings"':
+                        self.bindings_depth = depth + 1
+                        self.seen_bindings = True
+                    elif self.last_string == b'"vars"':
+                        self.vars_depth = depth + 1
+                        self.capture_start = match.start()
+                if token == b'{' and depth == self.bindings_depth and self.capture != 'none':
+                    self.capture_start = match.start()
+                self.stack.append(token)
+                continue
+            if depth == 0 or (token == b'}') != (self.stack[-1] == b'{'):
+                raise ValueError('Malformed SPARQL JSON result: unbalanced brackets')
+            self.stack.pop()
+            if token == b'}' and depth - 1 == self.bindings_depth:
+                self.rows += 1
+                if self.capture != 'none':
+                    binding = b''.join(self.segments) + \
+                        buffer[self.capture_start:match.end()]
+                    self.segments = []
+                    self.capture_start = -1
+                    self.last_binding = binding
+                    if self.capture == 'all':
+                        completed.append(binding)
+            elif token == b']' and depth == self.bindings_depth:
+                self.bindings_depth = -1
+            elif token == b']' and depth == self.vars_depth:
+                self.variables = json.loads(
+                    b''.join(self.segments) + buffer[self.capture_start:match.end()])
+                self.segments = []
+                self.capture_start = -1
+                self.vars_depth = -1
+        if self.capture_start >= 0:
+            self.segments.append(buffer[self.capture_start:end])
+            self.capture_start = 0
+        return completed
+
+    def close(self) -> None:
+        """
+        Checks that the whole document is scanned, all brackets are closed and the document has
+        "results.bindings".
+
+        Parameters
+        ----------
+        None
+        """
+
+        if self.carry.strip() or len(self.stack) > 0:
+            raise ValueError('Malformed SPARQL JSON result: truncated document')
+        if not self.seen_bindings:
+            raise ValueError(
+                'Malformed SPARQL JSON result: "results.bindings" is missing')
+
+    def get_last_binding(self) -> dict:
+        """
+        Returns the last binding, parsed.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            The binding, or None if there is no binding or bindings are not kept.
+        """
+
+        if self.last_binding is None:
+            return None
+        return json.loads(self.last_binding)
+
+
+class SPARQLJSONReader:
+    """
+    A Python class for reading the bindings of a SPARQL JSON result file one at a time, with flat memory usage.
+
+    ...
+
+    The file is read in chunks, and is decompressed if it is compressed with gzip or zstd. The variable names are taken from "head.vars", and then each binding of
+    "results.bindings" is decoded on its own with json.JSONDecoder.raw_decode, as soon as it is completely read.
+    The variable names are available in self.variables before the first binding is returned, since "head" comes
+    before "results" in SPARQL JSON results.
+
+    Attributes
+    ----------
+    file_path: str
+        Path of the SPARQL JSON result file.
+
+    variables: list[str]
+        The variable names in "head.vars".
+
+    Methods
+    -------
+    __iter__() -> Iterator[dict]:
+        Iterates over the bindings of the file.
+
+    values() -> Iterator[list[str]]:
+        Iterates over the values of the rows of the file.
+    """
+
+    vars_pattern = re.compile(r'"vars"\s*:\s*')
+    bindings_pattern = re.compile(r'"bindings"\s*:\s*\[')
+    separator_pattern = re.compile(r'[\s,]*')
+    decoder = json.JSONDecoder()
+
+    def __init__(self, file_path: str, chunk_size: int = 1 << 20) -> None:
+        """
+        Initializes the reader. The file is not read until the bindings are iterated.
+
+        Parameters
+        ----------
+        file_path: str
+            Path of the SPARQL JSON result file.
+
+        chunk_size: int
+            Number of bytes which are read from the file at once.
+        """
+
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.variables: list[str] = []
+
+    def __iter__(self) -> Iterator[dict]:
+        """
+        Iterates over the bindings of the file.
+
+        Returns
+        -------
+        Iterator[dict]
+            The bindings, each one as a dictionary from variable name to its SPARQL JSON term.
+        """
+
+        with open_page_file(self.file_path) as file:
+            buffer = ''
+            end_of_file = False
+            while True:
+                bindings_match = self.bindings_pattern.search(buffer)
+                if bindings_match is not None:
+                    break
+                if end_of_file:
+                    raise ValueError(
+                        f'Malformed SPARQL JSON result: "results.bindings" is missing in {self.file_path}')
+                chunk = file.read(self.chunk_size)
+                end_of_file = not chunk
+                buffer += chunk
+            vars_match = self.vars_pattern.search(buffer, 0, bindings_match.start())
+            if vars_match is not None:
+                self.variables, _ = self.decoder.raw_decode(
+                    buffer, vars_match.end())
+            position = bindings_match.end()
+            while True:
+                position = self.separator_pattern.match(buffer, position).end()
+                if position < len(buffer) and buffer[position] == ']':
+                    return
+                try:
+                    binding, end = self.decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if end_of_file:
+                        raise ValueError(
+                            f'Malformed SPARQL JSON result: truncated bindings in {self.file_path}')
+                    chunk = file.read(self.chunk_size)
+                    end_of_file = not chunk
+                    buffer = buffer[position:] + chunk
+                    position = 0
+                    continue
+                position = end
+                yield binding
+
+    def values(self) -> Iterator[list[str]]:
+        """
+        Iterates over the values of the rows of the file.
+
+        Returns
+        -------
+        Iterator[list[str]]
+            The rows, each one as a list with the value of each variable, or None if it is unbound.
+        """
+
+        for binding in self:
+            yield [binding[variable]['value'] if variable in binding else None for variable in self.variables]
+
+
+class SPARQLResultReader:
+    """
+    A Python class with the same interface as SPARQLJSONReader, for a SPARQL JSON result which is already
+    parsed, like a page which is passed from the crawler to the generator without being saved.
+
+    ...
+
+    Attributes
+    ----------
+    results: dict
+        The SPARQL JSON result.
+
+    variables: list[str]
+        The variable names in "head.vars".
+
+    Methods
+    -------
+    __iter__() -> Iterator[dict]:
+        Iterates over the bindings of the result.
+
+    values() -> Iterator[list[str]]:
+        Iterates over the values of the rows of the result.
+    """
+
+    def __init__(self, results: dict) -> None:
+        """
+        Initializes the reader.
+
+        Parameters
+        ----------
+        results: dict
+            The SPARQL JSON result.
+        """
+
+        self.results = results
+        self.variables: list[str] = results['head']['vars']
+
+    def __iter__(self) -> Iterator[dict]:
+        """
+        Iterates over the bindings of the result.
+
+        Returns
+        -------
+        Iterator[dict]
+            The bindings, each one as a dictionary from variable name to its SPARQL JSON term.
+        """
+
+        return iter(self.results['results']['bindings'])
+
+    def values(self) -> Iterator[list[str]]:
+        """
+        Iterates over the values of the rows of the result.
+
+        Returns
+        -------
+        Iterator[list[str]]
+            The rows, each one as a list with the value of each variable, or None if it is unbound.
+        """
+
+        for binding in self.results['results']['bindings']:
+            yield [binding[variable]['value'] if variable in binding else None for variable in self.variables]
+
+
+def open_page(page) -> SPARQLJSONReader:
+    """
+    Returns a reader for the bindings of a page, which is either the path of a page file, in any layout and
+    compression of StagingFormat or as a SPARQL TSV result, or an already parsed SPARQL JSON result.
+
+    Parameters
+    ----------
+    page: str or dict
+        Path of the page file, or the SPARQL JSON result.
+
+    Returns
+    -------
+    SPARQLJSONReader
+        A SPARQLJSONReader, or a SPARQLResultReader, an NDJSONPageReader or a SPARQLTSVReader with the same
+        interface.
+    """
+
+    if isinstance(page, dict):
+        return SPARQLResultReader(page)
+    layout = get_page_layout(page)
+    if layout == 'ndjson':
+        return NDJSONPageReader(page)
+    if layout == 'tsv':
+        return SPARQLTSVReader(page)
+    return SPARQLJSONReader(page)
@@ -0,0 +1,393 @@
+import re
+from typing import Iterator
+from lib.stagingFormat import open_page_file
+
+
+class SPARQLTSVScanner:
+    """
+    A Python class for scanning a SPARQL TSV result incrementally, with the same interface as SPARQLJSONScanner.
+
+    ...
+
+    A SPARQL TSV result has a header line with the variable names, and one line per row, with one RDF term per
+    variable in Turtle syntax, separated by tabs. Literals escape their tabs and line breaks, so the result can be
+    split into rows and terms at the raw bytes, without tokenizing it. The scanner checks that every row has one
+    term per variable, counts the rows and keeps the last one.
+
+    Attributes
+    ----------
+    capture: str
+        Which rows are kept. 'none' keeps no row, 'last' keeps only the last one, and 'all' returns every row from
+        feed().
+
+    variables: list[str]
+        The variable names in the header line, once it is scanned.
+
+    rows: int
+        Number of rows which are scanned so far.
+
+    last_binding: bytes
+        The last row, if capture is 'last' or 'all'.
+
+    Methods
+    -------
+    feed(chunk: bytes) -> list[bytes]:
+        Scans the next chunk and returns the rows which are completed in it, if capture is 'all'.
+
+    close() -> None:
+        Scans the last row, and checks that the header line is scanned.
+
+    get_last_binding() -> dict:
+        Returns the last row as a SPARQL JSON binding.
+    """
+
+    def __init__(self, capture: str = 'none') -> None:
+        """
+        Initializes an empty scanner.
+
+        Parameters
+        ----------
+        capture: str
+            Which rows are kept, either 'none', 'last' or 'all'.
+        """
+
+        if capture not in ('none', 'last', 'all'):
+            raise ValueError(f"Unknown capture mode: {capture}")
+        self.capture = capture
+        self.variables: list[str] = None
+        self.rows = 0
+        self.last_binding: bytes = None
+        self.carry = b''
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        """
+        Scans the next chunk of the result. A row which is split between two chunks is completed with the next
+        chunk.
+
+        Parameters
+        ----------
+        chunk: bytes
+            The next chunk of the result.
+
+        Returns
+        -------
+        list[bytes]
+            The rows which are completed in this chunk, if capture is 'all', otherwise an empty list.
+        """
+
+        lines = (self.carry + chunk).split(b'\n')
+        self.carry = lines.pop()
+        return self.scan_lines(lines)
+
+    def close(self) -> None:
+        """
+        Scans the last row, if the result does not end with a line break, and checks that the header line is
+        scanned.
+
+        Parameters
+        ----------
+        None
+        """
+
+        self.scan_lines([self.carry])
+        self.carry = b''
+        if self.variables is None:
+            raise ValueError('Malformed SPARQL TSV result: the header line is missing')
+
+    def scan_lines(self, lines: list[bytes]) -> list[bytes]:
+        """
+        Scans complete lines of the result.
+
+        Parameters
+        ----------
+        lines: list[bytes]
+            The lines, without their line breaks.
+
+        Returns
+        -------
+        list[bytes]
+            The rows among the lines, if capture is 'all', otherwise an empty list.
+        """
+
+        captured = []
+        for line in lines:
+            line = line.rstrip(b'\r')
+            if not line:
+                continue
+            if self.variables is None:
+                self.variables = parse_tsv_header(line.decode('utf8'))
+                continue
+            if line.count(b'\t') != len(self.variables) - 1:
+                raise ValueError(
+                    f'Malformed SPARQL TSV result: row {self.rows + 1} does not have {len(self.variables)} terms')
+            self.rows += 1
+            if self.capture != 'none':
+                self.last_binding = line
+            if self.capture == 'all':
+                captured.append(line)
+        return captured
+
+    def get_last_binding(self) -> dict:
+        """
+        Returns the last row as a SPARQL JSON binding.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            The binding, or None if there is no row or rows are not kept.
+        """
+
+        if self.last_binding is None:
+            return None
+        return parse_tsv_binding(self.last_binding.decode('utf8'), self.variables)
+
+
+class SPARQLTSVReader:
+    """
+    A Python class with the same interface as SPARQLJSONReader, for a page file which is a SPARQL TSV result.
+
+    ...
+
+    The file is read one line at a time. values() only decodes the value of each term, so a row costs one list
+    of strings, while iterating the reader decodes each term into a SPARQL JSON term.
+
+    Attributes
+    ----------
+    file_path: str
+        Path of the page file.
+
+    variables: list[str]
+        The variable names in the header line.
+
+    Methods
+    -------
+    __iter__() -> Iterator[dict]:
+        Iterates over the bindings of the file.
+
+    values() -> Iterator[list[str]]:
+        Iterates over the values of the rows of the file.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """
+        Initializes the reader. The file is not read until the rows are iterated.
+
+        Parameters
+        ----------
+        file_path: str
+            Path of the page file.
+        """
+
+        self.file_path = file_path
+        self.variables: list[str] = []
+
+    def __iter__(self) -> Iterator[dict]:
+        """
+        Iterates over the bindings of the file.
+
+        Returns
+        -------
+        Iterator[dict]
+            The bindings, each one as a dictionary from variable name to its SPARQL JSON term.
+        """
+
+        with open_page_file(self.file_path) as file:
+            self.variables = parse_tsv_header(file.readline())
+            for line in file:
+                line = line.rstrip('\n')
+                if line:
+                    yield parse_tsv_binding(line, self.variables)
+
+    def values(self) -> Iterator[list[str]]:
+        """
+        Iterates over the values of the rows of the file.
+
+        Returns
+        -------
+        Iterator[list[str]]
+            The rows, each one as a list with the value of each variable, or None if it is unbound.
+        """
+
+        with open_page_file(self.file_path) as file:
+            self.variables = parse_tsv_header(file.readline())
+            for line in file:
+                line = line.rstrip('\n')
+                if line:
+                    yield [parse_tsv_value(field) for field in line.split('\t')]
+
+
+escape_pattern = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+escapes = {'t': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f'}
+xsd = 'http://www.w3.org/2001/XMLSchema#'
+
+
+def unescape(text: str) -> str:
+    """
+    Decodes the escape sequences of a Turtle string, such as \\t, \\" or \\u00E9.
+
+    Parameters
+    ----------
+    text: str
+        The escaped string, without its quotes.
+
+    Returns
+    -------
+    str
+        The decoded string.
+    """
+    if '\\' not in text:
+        return text
+    return escape_pattern.sub(replace_escape, text)
+
+
+def replace_escape(match: re.Match) -> str:
+    """
+    Returns the character of one escape sequence, which is matched by escape_pattern.
+    """
+    escape = match.group(1)
+    if len(escape) > 1:
+        return chr(int(escape[1:], 16))
+    return escapes.get(escape, escape)
+
+
+def parse_tsv_header(line: str) -> list[str]:
+    """
+    Returns the variable names of the header line of a SPARQL TSV result. The names start with ?, or are quoted,
+    as Virtuoso writes them.
+
+    Parameters
+    ----------
+    line: str
+        The header line.
+
+    Returns
+    -------
+    list[str]
+        The variable names.
+    """
+    return [name.strip().strip('"').lstrip('?$') for name in line.rstrip('\r\n').split('\t')]
+
+
+def parse_tsv_value(field: str) -> str:
+    """
+    Returns the value of an RDF term of a SPARQL TSV result, which is the IRI of an IRI, the label of a blank
+    node, and the lexical form of a literal.
+
+    Parameters
+    ----------
+    field: str
+        The term in Turtle syntax.
+
+    Returns
+    -------
+    str
+        The value, or None if the field is empty, which means the variable is unbound.
+    """
+    if not field:
+        return None
+    first = field[0]
+    if first == '<':
+        return field[1:-1]
+    if first == '"':
+        return unescape(field[1:field.rfind('"')])
+    if field.startswith('_:'):
+        return field[2:]
+    return field
+
+
+def parse_tsv_term(field: str) -> dict:
+    """
+    Decodes an RDF term of a SPARQL TSV result into a SPARQL JSON term. Numbers and booleans, which Turtle writes
+    without quotes, are typed literals.
+
+    Parameters
+    ----------
+    field: str
+        The term in Turtle syntax.
+
+    Returns
+    -------
+    dict
+        The SPARQL JSON term, or None if the field is empty.
+    """
+    if not field:
+        return None
+    first = field[0]
+    if first == '<':
+        return {'type': 'uri', 'value': field[1:-1]}
+    if first == '"':
+        end = field.rfind('"')
+        value = unescape(field[1:end])
+        suffix = field[end + 1:]
+        if suffix.startswith('@'):
+            return {'type': 'literal', 'xml:lang': suffix[1:], 'value': value}
+        if suffix.startswith('^^'):
+            return {'type': 'typed-literal', 'datatype': suffix[3:-1], 'value': value}
+        return {'type': 'literal', 'value': value}
+    if field.startswith('_:'):
+        return {'type': 'bnode', 'value': field[2:]}
+    if field in ('true', 'false'):
+        datatype = 'boolean'
+    elif 'e' in field or 'E' in field:
+        datatype = 'double'
+    elif '.' in field:
+        datatype = 'decimal'
+    else:
+        datatype = 'integer'
+    return {'type': 'typed-literal', 'datatype': xsd + datatype, 'value': field}
+
+
+def parse_tsv_binding(line: str, variables: list[str]) -> dict:
+    """
+    Decodes a row of a SPARQL TSV result into a SPARQL JSON binding.
+
+    Parameters
+    ----------
+    line: str
+        The row, without its line break.
+
+    variables: list[str]
+        The variable names of the result.
+
+    Returns
+    -------
+    dict
+        The binding, as a dictionary from variable name to its SPARQL JSON term, without unbound variables.
+    """
+    binding = dict()
+    for variable, field in zip(variables, line.split('\t')):
+        if not field:
+            continue
+        first = field[0]
+        if first == '<':
+            binding[variable] = {'type': 'uri', 'value': field[1:-1]}
+        elif first == '"' and field[-1] == '"' and len(field) > 1 and '\\' not in field:
+            binding[variable] = {'type': 'literal', 'value': field[1:-1]}
+        else:
+            binding[variable] = parse_tsv_term(field)
+    return binding
+
+
+def parse_tsv_results(content: bytes) -> dict:
+    """
+    Decodes a whole SPARQL TSV result into a SPARQL JSON result, such as a response which is parsed by the
+    crawler.
+
+    Parameters
+    ----------
+    content: bytes
+        The SPARQL TSV result.
+
+    Returns
+    -------
+    dict
+        The SPARQL JSON result.
+    """
+    lines = content.decode('utf8').split('\n')
+    variables = parse_tsv_header(lines[0])
+    bindings = [parse_tsv_binding(line.rstrip('\r'), variables) for line in lines[1:] if line.rstrip('\r')]
+    return {'head': {'vars': variables}, 'results': {'bindings': bindings}}
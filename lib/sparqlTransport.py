@@ -0,0 +1,309 @@
+import threading
+import urllib.error
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from SPARQLWrapper.SPARQLExceptions import EndPointInternalError
+from lib.requestThrottle import ConnectTimeoutError
+
+
+class SPARQLTransport:
+    """
+    A Python class for sending SPARQL queries over a pool of persistent HTTP connections, which is shared by all
+    crawler threads.
+
+    ...
+
+    SPARQLWrapper opens a new connection for every query, so every page pays a TCP and a TLS handshake. Here,
+    queries go through one requests session, whose connection pool keeps up to pool_size connections to the
+    endpoint alive and reuses them for the next queries. When all connections are busy, a query waits for one to
+    be released, so the number of connections never grows beyond pool_size. Responses are requested with
+    Accept-Encoding: gzip, and are decompressed while they are read, so SPARQL results, which compress very well,
+    take a fraction of the bandwidth.
+
+    Errors are raised as the exceptions of SPARQLWrapper and urllib: an HTTP error status is a
+    urllib.error.HTTPError, or an EndPointInternalError for 500, a timeout is a TimeoutError, or a
+    ConnectTimeoutError if the connection could not be opened in time, and a broken connection is a
+    ConnectionError, so that RequestThrottle and DBPediaCrawler handle them as before.
+
+    Attributes
+    ----------
+    pool_size: int
+        Maximum number of connections to each endpoint.
+
+    connect_timeout: float
+        Number of seconds to wait for a connection to the endpoint.
+
+    read_timeout: float
+        Number of seconds to wait for the next bytes of a response.
+
+    compress: bool
+        Whether compressed responses are requested.
+
+    accept: dict[str, str]
+        The media type of each result format.
+
+    Methods
+    -------
+    open(endpoint: str, query: str, result_format: str) -> SPARQLResponse:
+        Sends a SPARQL query and returns its response, without reading its body.
+
+    get_stats() -> dict:
+        Returns the number of requests, connections and bytes so far.
+
+    get_report() -> str:
+        Returns a line which describes the connection reuse and the compression.
+
+    close() -> None:
+        Closes all connections.
+    """
+
+    accept = {'json': 'application/sparql-results+json',
+              'tsv': 'text/tab-separated-values'}
+
+    def __init__(self, pool_size: int = 1, connect_timeout: float = 10, read_timeout: float = 300,
+                 compress: bool = True) -> None:
+        """
+        Initializes the session and its connection pool. Connections are opened when they are first needed.
+
+        Parameters
+        ----------
+        pool_size: int
+            Maximum number of connections to each endpoint, which is usually the number of crawler threads.
+
+        connect_timeout: float
+            Number of seconds to wait for a connection to the endpoint.
+
+        read_timeout: float
+            Number of seconds to wait for the next bytes of a response.
+
+        compress: bool
+            Whether compressed responses are requested.
+        """
+
+        self.pool_size = max(1, int(pool_size))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.compress = compress
+        self.adapter = HTTPAdapter(pool_maxsize=self.pool_size, max_retries=0, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.session.headers['User-Agent'] = f'OntologyToGraphDB (requests {requests.__version__})'
+        self.session.headers['Accept-Encoding'] = 'gzip' if compress else 'identity'
+        self.wire_bytes = 0
+        self.body_bytes = 0
+        self.lock = threading.Lock()
+
+    def open(self, endpoint: str, query: str, result_format: str = 'json') -> 'SPARQLResponse':
+        """
+        Sends a SPARQL query with GET, over a pooled connection, and returns its response without reading its
+        body. The connection goes back to the pool when the whole body is read, and is closed otherwise.
+
+        Parameters
+        ----------
+        endpoint: str
+            URL of the SPARQL endpoint.
+
+        query: str
+            The SPARQL query.
+
+        result_format: str
+            Either 'json' or 'tsv'.
+
+        Returns
+        -------
+        SPARQLResponse
+            The response, which the body of the SPARQL result can be read from.
+        """
+
+        try:
+            response = self.session.get(endpoint, params={'query': query},
+                                        headers={'Accept': self.accept[result_format]}, stream=True,
+                                        timeout=(self.connect_timeout, self.read_timeout))
+        except requests.exceptions.ConnectTimeout as error:
+            raise ConnectTimeoutError(str(error)) from error
+        except requests.exceptions.Timeout as error:
+            raise TimeoutError(str(error)) from error
+        except requests.exceptions.ConnectionError as error:
+            raise ConnectionError(str(error)) from error
+        if response.status_code >= 400:
+            try:
+                body = response.text
+            except requests.exceptions.RequestException:
+                body = ''
+            finally:
+                response.close()
+            if response.status_code == 500:
+                raise EndPointInternalError(body)
+            raise urllib.error.HTTPError(endpoint, response.status_code, response.reason, response.headers, None)
+        return SPARQLResponse(response, self)
+
+    def add_bytes(self, wire_bytes: int, body_bytes: int) -> None:
+        """
+        Adds the bytes of a finished response to the statistics.
+
+        Parameters
+        ----------
+        wire_bytes: int
+            Number of bytes which were received, before decompression.
+
+        body_bytes: int
+            Number of bytes of the decompressed body.
+        """
+
+        with self.lock:
+            self.wire_bytes += wire_bytes
+            self.body_bytes += body_bytes
+
+    def get_stats(self) -> dict:
+        """
+        Returns the statistics of the connection pool.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        dict
+            The number of requests, of opened connections and of requests over a reused connection, and the bytes
+            which were received and decompressed.
+        """
+
+        requests_count = 0
+        connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_count += pool.num_requests
+                connections += pool.num_connections
+        with self.lock:
+            return {'requests': requests_count, 'connections': connections,
+                    'reused': max(0, requests_count - connections),
+                    'wire_bytes': self.wire_bytes, 'body_bytes': self.body_bytes}
+
+    def get_report(self) -> str:
+        """
+        Returns a line with the number of requests and connections, and the received and decompressed bytes.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        str
+            The report line.
+        """
+
+        stats = self.get_stats()
+        reuse = stats['reused'] / stats['requests'] if stats['requests'] > 0 else 0
+        return (f"HTTP: {stats['requests']:,} requests over {stats['connections']:,} connections "
+                f"({reuse:.1%} reused), {stats['wire_bytes'] / (1 << 20):,.1f} MiB received for "
+                f"{stats['body_bytes'] / (1 << 20):,.1f} MiB of responses")
+
+    def close(self) -> None:
+        """
+        Closes the session and all its connections.
+
+        Parameters
+        ----------
+        None
+        """
+
+        self.session.close()
+
+
+class SPARQLResponse:
+    """
+    A Python class for reading the body of an HTTP response of SPARQLTransport, with the interface of the
+    responses of SPARQLWrapper.
+
+    ...
+
+    Attributes
+    ----------
+    headers: dict
+        The response headers, with case-insensitive names.
+
+    Methods
+    -------
+    read(size: int) -> bytes:
+        Reads up to size bytes of the decompressed body, or the whole rest of it.
+
+    close() -> None:
+        Releases the connection to the pool if the body is read, and closes it otherwise.
+    """
+
+    def __init__(self, response: requests.Response, transport: SPARQLTransport) -> None:
+        """
+        Initializes the response.
+
+        Parameters
+        ----------
+        response: requests.Response
+            The streamed response.
+
+        transport: SPARQLTransport
+            The transport that the bytes of the response are counted in.
+        """
+
+        self.response = response
+        self.headers = response.headers
+        self.transport = transport
+        self.body_bytes = 0
+        self.finished = False
+        self.closed = False
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Reads the decompressed body.
+
+        Parameters
+        ----------
+        size: int
+            Maximum number of bytes, or -1 for the whole rest of the body.
+
+        Returns
+        -------
+        bytes
+            The bytes, which are empty at the end of the body.
+        """
+
+        try:
+            chunk = self.response.raw.read(None if size is None or size < 0 else size, decode_content=True)
+        except urllib3.exceptions.ReadTimeoutError as error:
+            raise TimeoutError(str(error)) from error
+        except (urllib3.exceptions.ProtocolError, urllib3.exceptions.DecodeError) as error:
+            raise ConnectionError(str(error)) from error
+        self.body_bytes += len(chunk)
+        if not chunk or size is None or size < 0:
+            self.finished = True
+        return chunk
+
+    def close(self) -> None:
+        """
+        Releases the connection to the pool, if the whole body is read, so that the next request reuses it.
+        Otherwise the connection is closed, since the rest of the body would be read by the next request.
+
+        Parameters
+        ----------
+        None
+        """
+
+        if self.closed:
+            return
+        self.closed = True
+        self.transport.add_bytes(self.response.raw.tell(), self.body_bytes)
+        if self.finished:
+            self.response.raw.release_conn()
+        else:
+            self.response.close()
+
+    def __enter__(self) -> 'SPARQLResponse':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
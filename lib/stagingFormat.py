@@ -0,0 +1,288 @@
+import gzip
+import io
+import json
+from collections import Counter
+from typing import Iterator, TextIO
+
+
+class StagingFormat:
+    """
+    A Python class for encoding the pages which the crawler saves into the "data" folder.
+
+    ...
+
+    In the 'json' layout, a page is its SPARQL JSON result, indented. Most of its bytes are the variable names,
+    the "type" and "value" keys and the indentation, which are repeated for every term. In the 'ndjson' layout,
+    the first line of a page is a header with the variable names, and the most common term of each variable
+    without its value, such as {"type": "uri"}. Each following line is one row, as a JSON array with one item per
+    variable: null if the variable is unbound, the value string if the term only differs from the common term of
+    its variable by its value, and the whole SPARQL JSON term otherwise. So a row holds little more than its
+    values, and it is decoded back into the same binding. Rows are read one line at a time, with flat memory usage.
+
+    Pages of both layouts can be compressed with gzip or with zstd, which needs the zstandard package. Readers
+    find the layout and the compression from the content of a page, so pages in different formats can be read
+    together, such as the pages of a crawl which is resumed with another format.
+
+    Attributes
+    ----------
+    layout: str
+        Either 'json' or 'ndjson'.
+
+    compression: str
+        Either 'none', 'gzip' or 'zstd'.
+
+    gzip_level: int
+        Compression level of gzip.
+
+    zstd_level: int
+        Compression level of zstd.
+
+    Methods
+    -------
+    encode(results: dict) -> bytes:
+        Encodes the SPARQL JSON result of a page into the content of its file.
+
+    encode_ndjson(results: dict) -> str:
+        Encodes the SPARQL JSON result of a page into the 'ndjson' layout.
+    """
+
+    gzip_level = 6
+    zstd_level = 3
+
+    def __init__(self, layout: str = 'json', compression: str = 'none') -> None:
+        """
+        Initializes the format.
+
+        Parameters
+        ----------
+        layout: str
+            Either 'json', for SPARQL JSON results, or 'ndjson', for a header line and one line per row.
+
+        compression: str
+            Either 'none', 'gzip' or 'zstd'.
+        """
+
+        if layout not in ('json', 'ndjson'):
+            raise ValueError(f"Unknown staging layout: {layout}")
+        if compression not in ('none', 'gzip', 'zstd'):
+            raise ValueError(f"Unknown staging compression: {compression}")
+        if compression == 'zstd':
+            import_zstandard()
+        self.layout = layout
+        self.compression = compression
+
+    def encode(self, results: dict) -> bytes:
+        """
+        Encodes the SPARQL JSON result of a page in self.layout, and compresses it with self.compression.
+
+        Parameters
+        ----------
+        results: dict
+            The SPARQL JSON result of the page.
+
+        Returns
+        -------
+        bytes
+            The content of the page file.
+        """
+
+        if self.layout == 'ndjson':
+            content = self.encode_ndjson(results).encode('utf8')
+        else:
+            content = json.dumps(results, indent=4, ensure_ascii=False).encode('utf8')
+        if self.compression == 'gzip':
+            return gzip.compress(content, self.gzip_level, mtime=0)
+        if self.compression == 'zstd':
+            return import_zstandard().ZstdCompressor(level=self.zstd_level).compress(content)
+        return content
+
+    def encode_ndjson(self, results: dict) -> str:
+        """
+        Encodes the SPARQL JSON result of a page into a header line and one line per row.
+
+        Parameters
+        ----------
+        results: dict
+            The SPARQL JSON result of the page.
+
+        Returns
+        -------
+        str
+            The page in the 'ndjson' layout.
+        """
+
+        variables = results['head']['vars']
+        bindings = results['results']['bindings']
+        terms = []
+        for variable in variables:
+            counter = Counter(tuple(sorted((key, value) for key, value in binding[variable].items() if key != 'value'))
+                              for binding in bindings if variable in binding)
+            terms.append(dict(counter.most_common(1)[0][0]) if counter else {'type': 'uri'})
+        lines = [json.dumps({'vars': variables, 'terms': terms}, ensure_ascii=False)]
+        for binding in bindings:
+            row = []
+            for variable, common_term in zip(variables, terms):
+                term = binding.get(variable)
+                if term is None:
+                    row.append(None)
+                elif len(term) == len(common_term) + 1 and 'value' in term and \
+                        all(term.get(key) == value for key, value in common_term.items()):
+                    row.append(term['value'])
+                else:
+                    row.append(term)
+            lines.append(json.dumps(row, ensure_ascii=False))
+        return '\n'.join(lines) + '\n'
+
+
+class NDJSONPageReader:
+    """
+    A Python class with the same interface as SPARQLJSONReader, for a page file in the 'ndjson' layout of
+    StagingFormat.
+
+    ...
+
+    Attributes
+    ----------
+    file_path: str
+        Path of the page file.
+
+    variables: list[str]
+        The variable names in the header line.
+
+    Methods
+    -------
+    __iter__() -> Iterator[dict]:
+        Iterates over the bindings of the file.
+
+    values() -> Iterator[list[str]]:
+        Iterates over the values of the rows of the file.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """
+        Initializes the reader. The file is not read until the bindings are iterated.
+
+        Parameters
+        ----------
+        file_path: str
+            Path of the page file.
+        """
+
+        self.file_path = file_path
+        self.variables: list[str] = []
+
+    def __iter__(self) -> Iterator[dict]:
+        """
+        Iterates over the bindings of the file, which are decoded back into SPARQL JSON terms.
+
+        Returns
+        -------
+        Iterator[dict]
+            The bindings, each one as a dictionary from variable name to its SPARQL JSON term.
+        """
+
+        with open_page_file(self.file_path) as file:
+            header = json.loads(file.readline())
+            self.variables = header['vars']
+            columns = list(zip(self.variables, header['terms']))
+            for line in file:
+                if not line.strip():
+                    continue
+                binding = dict()
+                for (variable, common_term), value in zip(columns, json.loads(line)):
+                    if value is None:
+                        continue
+                    if isinstance(value, str):
+                        binding[variable] = {**common_term, 'value': value}
+                    else:
+                        binding[variable] = value
+                yield binding
+
+    def values(self) -> Iterator[list[str]]:
+        """
+        Iterates over the values of the rows of the file, without decoding them into SPARQL JSON terms.
+
+        Returns
+        -------
+        Iterator[list[str]]
+            The rows, each one as a list with the value of each variable, or None if it is unbound.
+        """
+
+        with open_page_file(self.file_path) as file:
+            self.variables = json.loads(file.readline())['vars']
+            for line in file:
+                if not line.strip():
+                    continue
+                yield [value if value is None or isinstance(value, str) else value['value']
+                       for value in json.loads(line)]
+
+
+gzip_magic = b'\x1f\x8b'
+zstd_magic = b'\x28\xb5\x2f\xfd'
+ndjson_prefix = '{"vars"'
+
+
+def import_zstandard():
+    """
+    Imports the zstandard package, which is only required for pages which are compressed with zstd.
+
+    Returns
+    -------
+    module
+        The zstandard module.
+    """
+    try:
+        import zstandard
+    except ImportError:
+        raise ValueError(
+            'zstd compression of pages needs the zstandard package, install it with "pip install zstandard" '
+            'or "pip install -r requirements-optional.txt"') from None
+    return zstandard
+
+
+def open_page_file(file_path: str) -> TextIO:
+    """
+    Opens a page file for reading as text, and decompresses it if it is compressed with gzip or zstd.
+
+    Parameters
+    ----------
+    file_path: str
+        Path of the page file.
+
+    Returns
+    -------
+    TextIO
+        The text of the page.
+    """
+    with open(file_path, 'rb') as file:
+        magic = file.read(4)
+    if magic.startswith(gzip_magic):
+        return gzip.open(file_path, 'rt', encoding='utf8')
+    if magic == zstd_magic:
+        reader = import_zstandard().ZstdDecompressor().stream_reader(open(file_path, 'rb'))
+        return io.TextIOWrapper(reader, encoding='utf8')
+    return open(file_path, 'r', encoding='utf8')
+
+
+def get_page_layout(file_path: str) -> str:
+    """
+    Finds the layout of a page file from its first characters. Pages which do not start with a JSON object are
+    SPARQL TSV results, which the crawler saves as they are received.
+
+    Parameters
+    ----------
+    file_path: str
+        Path of the page file.
+
+    Returns
+    -------
+    str
+        Either 'json', 'ndjson' or 'tsv'.
+    """
+    with open_page_file(file_path) as file:
+        start = file.read(len(ndjson_prefix))
+    if start == ndjson_prefix:
+        return 'ndjson'
+    if start.lstrip() and not start.lstrip().startswith('{'):
+        return 'tsv'
+    return 'json'
@@ -1,6 +1,9 @@
+import hashlib
+import json
 import pickle
 import os
 import shutil
+import sys
 
 
 class Property:
@@ -152,6 +155,106 @@ class ObjectPropertyMetaData:
         self.range_label = range_label
 
 
+class MetadataIndex:
+    """
+    A Python class for storing precomputed indexes over the metadata of classes and object properties, so that
+    queries and scripts are built with dictionary lookups instead of scanning all classes or object properties.
+
+    ...
+
+    Attributes
+    ----------
+    children: dict[str, list[str]]
+        IRIs of the direct subclasses of each class.
+
+    ancestors: dict[str, list[str]]
+        IRIs of all superclasses of each class, from its parent up to its root class.
+
+    descendants: dict[str, list[str]]
+        IRIs of all subclasses of each class, at any depth, in the order of the classes.
+
+    domain_properties: dict[str, list[int]]
+        Indexes of the object properties whose domain is each class IRI, in the object properties list.
+
+    range_properties: dict[str, list[int]]
+        Indexes of the object properties whose range is each class IRI, in the object properties list.
+
+    inherited_properties: dict[str, list[Property]]
+        Properties of each class and all its subclasses, without duplicate property IRIs.
+    """
+
+    children: dict[str, list[str]]
+    ancestors: dict[str, list[str]]
+    descendants: dict[str, list[str]]
+    domain_properties: dict[str, list[int]]
+    range_properties: dict[str, list[int]]
+    inherited_properties: dict[str, list[Property]]
+
+    def __init__(self, classesMetaData: dict[str, ClassMetaData], objectPropertiesMetaData: list[ObjectPropertyMetaData]) -> None:
+        """
+        Computes the indexes in O(C·D + P), where D is the depth of the class hierarchy.
+
+        Parameters
+        ----------
+        classesMetaData: dict[str, ClassMetaData]
+            An dictionary which contains metadata about classes
+
+        objectPropertiesMetaData: list[ObjectPropertyMetaData]
+            A list which contains metadata about object properties
+        """
+
+        self.children = {cls_iri: [] for cls_iri in classesMetaData}
+        self.ancestors = dict()
+        self.descendants = {cls_iri: [] for cls_iri in classesMetaData}
+        for cls_iri, cls_metadata in classesMetaData.items():
+            if cls_metadata.parentClass in self.children:
+                self.children[cls_metadata.parentClass].append(cls_iri)
+            ancestors = []
+            parent_iri = cls_metadata.parentClass
+            while parent_iri in classesMetaData and parent_iri != cls_iri and parent_iri not in ancestors:
+                ancestors.append(parent_iri)
+                parent_iri = classesMetaData[parent_iri].parentClass
+            self.ancestors[cls_iri] = ancestors
+            for ancestor_iri in ancestors:
+                self.descendants[ancestor_iri].append(cls_iri)
+
+        self.domain_properties = dict()
+        self.range_properties = dict()
+        for index, obj_prop_metadata in enumerate(objectPropertiesMetaData):
+            self.domain_properties.setdefault(
+                obj_prop_metadata.domain_iri, []).append(index)
+            self.range_properties.setdefault(
+                obj_prop_metadata.range_iri, []).append(index)
+
+        self.inherited_properties = dict()
+        for cls_iri, cls_metadata in classesMetaData.items():
+            properties = []
+            prop_iris = set()
+            for class_iri in [cls_iri] + self.descendants[cls_iri]:
+                for prop in classesMetaData[class_iri].properties:
+                    if prop.prop_iri not in prop_iris:
+                        prop_iris.add(prop.prop_iri)
+                        properties.append(prop)
+            self.inherited_properties[cls_iri] = properties
+
+    def get_root(self, cls_iri: str) -> str:
+        """
+        Returns the root class of a class, which is the class itself if it has no superclass.
+
+        Parameters
+        ----------
+        cls_iri: str
+            IRI of the class.
+
+        Returns
+        -------
+        str
+            IRI of the root class.
+        """
+        ancestors = self.ancestors.get(cls_iri, [])
+        return ancestors[-1] if len(ancestors) > 0 else cls_iri
+
+
 def printProgressBar(iteration, total, prefix='', suffix='', decimals=1, length=100, fill='█', printEnd="\r") -> None:
     """
     This code is copied from Stackoverflow, which helps to print progress bar in the terminal. Available at:
@@ -167,21 +270,32 @@ def printProgressBar(iteration, total, prefix='', suffix='', decimals=1, length=
         length      - Optional  : character length of bar (Int)
         fill        - Optional  : bar fill character (Str)
         printEnd    - Optional  : end character (e.g. "\r", "\r\n") (Str)
+
+    When stdout is not a terminal, such as in batch logs, only the last iteration is printed, as one line.
     """
 
+    is_terminal = sys.stdout.isatty()
+    if iteration != total and not is_terminal:
+        return
     percent = ("{0:." + str(decimals) + "f}").format(100 *
                                                      (iteration / float(total)))
     filledLength = int(length * iteration // total)
     bar = fill * filledLength + '-' * (length - filledLength)
-    print(f'\r{prefix} |{bar}| {percent}% {suffix}', end=printEnd)
+    line = f'{prefix} |{bar}| {percent}% {suffix}'
+    if not is_terminal:
+        print(line)
+        return
+    print(f'\r{line}', end=printEnd)
 
     if iteration == total:
         print()
 
 
-def dump_metadata_to_file(classesMetaData: dict[str, ClassMetaData], objectPropertiesMetaData: list[ObjectPropertyMetaData]) -> None:
+def dump_metadata_to_file(classesMetaData: dict[str, ClassMetaData], objectPropertiesMetaData: list[ObjectPropertyMetaData],
+                          metadataIndex: MetadataIndex = None) -> None:
     """
-    Saves two objects, classesMetaData and objectPropertiesMetaData into a binary file in 'data' folder   
+    Saves two objects, classesMetaData and objectPropertiesMetaData, and their MetadataIndex into binary files
+    in 'metadata' folder
 
     Parameters
     ----------
@@ -191,9 +305,16 @@ def dump_metadata_to_file(classesMetaData: dict[str, ClassMetaData], objectPrope
     objectPropertiesMetaData: list[ObjectPropertyMetaData]
         A list which contains metadata about object properties
 
+    metadataIndex: MetadataIndex
+        The indexes over the metadata. They are computed if they are not given.
+
     """
     new_directory_path = os.path.join(os.getcwd() + '/metadata')
 
+    if metadataIndex is None:
+        metadataIndex = MetadataIndex(
+            classesMetaData, objectPropertiesMetaData)
+
     if os.path.exists(new_directory_path):
         shutil.rmtree(new_directory_path)
 
@@ -205,6 +326,41 @@ def dump_metadata_to_file(classesMetaData: dict[str, ClassMetaData], objectPrope
     with open(f"{new_directory_path}/Object Properties", "wb") as file:
         pickle.dump(objectPropertiesMetaData, file, pickle.HIGHEST_PROTOCOL)
 
+    with open(f"{new_directory_path}/Index", "wb") as file:
+        pickle.dump(metadataIndex, file, pickle.HIGHEST_PROTOCOL)
+
+
+def load_metadata_from_file() -> tuple[dict[str, ClassMetaData], list[ObjectPropertyMetaData], MetadataIndex]:
+    """
+    Loads the metadata which are saved by dump_metadata_to_file from 'metadata' folder. If the folder has no
+    index, which is the case for metadata saved by older versions, the index is computed.
+
+    Parameters
+    ----------
+    None
+
+    Returns
+    -------
+    tuple[dict[str, ClassMetaData], list[ObjectPropertyMetaData], MetadataIndex]
+        The metadata of classes, the metadata of object properties, and their index.
+    """
+    directory_path = os.path.join(os.getcwd() + '/metadata')
+
+    with open(f"{directory_path}/Classes", "rb") as file:
+        classesMetaData = pickle.load(file)
+
+    with open(f"{directory_path}/Object Properties", "rb") as file:
+        objectPropertiesMetaData = pickle.load(file)
+
+    if os.path.exists(f"{directory_path}/Index"):
+        with open(f"{directory_path}/Index", "rb") as file:
+            metadataIndex = pickle.load(file)
+    else:
+        metadataIndex = MetadataIndex(
+            classesMetaData, objectPropertiesMetaData)
+
+    return classesMetaData, objectPropertiesMetaData, metadataIndex
+
 
 def get_last_part(url: str) -> str:
     """
@@ -244,6 +400,26 @@ def sanitize_node_name(node_name: str) -> str:
     return f"`{node_name}`"
 
 
+def get_node_variable(iri: str) -> str:
+    """
+    Returns the cypher variable of the node of an IRI, in 'create' mode with variable edges. It is the last part
+    of the IRI followed by a 64-bit hash of the whole IRI, so that two IRIs with the same last part, such as
+    resources of two namespaces, never declare the same variable in one script. Any ` character is doubled.
+
+    Parameters
+    ----------
+    iri: str
+        The IRI of the node.
+
+    Returns
+    -------
+    str
+        The variable between two ` characters.
+    """
+    digest = hashlib.blake2b(iri.encode('utf8'), digest_size=8).hexdigest()
+    return sanitize_node_name(f"{get_last_part(iri)}_{digest}".replace('`', '``'))
+
+
 def sanitize_edge_name(edge_name: str) -> str:
     """
     Edge name sanitization mechanism, to create edge label of neo4j cypher file.
@@ -260,3 +436,172 @@ def sanitize_edge_name(edge_name: str) -> str:
         Edge name converted into uppper case with spaces being replaced with _ character.
     """
     return edge_name.upper().replace(' ', '_')
+
+
+def sparql_string_literal(value: str) -> str:
+    """
+    Converts a Python string into a SPARQL string literal, by escaping backslashes and double quotes.
+
+    Parameters
+    ----------
+    value: str
+        The string value.
+
+    Returns
+    -------
+    str
+        The value between two " characters.
+    """
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def keyset_condition(key_vars: list[str], last_key: list[str]) -> str:
+    """
+    Creates the SPARQL condition which selects the rows that come after last_key, when rows are ordered by
+    the string value of key_vars. For example, for the key variables ?a and ?b, the condition is
+    STR(?a) > "x" || (STR(?a) = "x" && STR(?b) > "y").
+
+    Parameters
+    ----------
+    key_vars: list[str]
+        Variables that identify a row, ordered from the most significant one.
+
+    last_key: list[str]
+        Values of key_vars in the last row of the previous page.
+
+    Returns
+    -------
+    str
+        The SPARQL condition.
+    """
+
+    literals = [sparql_string_literal(value) for value in last_key]
+    condition = f"STR(?{key_vars[-1]}) > {literals[-1]}"
+    for var, literal in zip(reversed(key_vars[:-1]), reversed(literals[:-1])):
+        condition = f"STR(?{var}) > {literal} || (STR(?{var}) = {literal} && ({condition}))"
+    return condition
+
+
+def hash_query(query: str) -> str:
+    """
+    Hashes a SPARQL query after collapsing its whitespace, so that the same query with different indentation
+    has the same hash.
+
+    Parameters
+    ----------
+    query: str
+        The SPARQL query.
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest of the normalized query.
+    """
+    return hashlib.sha256(' '.join(query.split()).encode('utf8')).hexdigest()
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Hashes the content of a file, which is read in blocks, so that large files are not loaded into memory.
+
+    Parameters
+    ----------
+    file_path: str
+        Path of the file.
+
+    Returns
+    -------
+    str
+        SHA-256 hex digest of the file.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_file_atomic(file_path: str, content: bytes, temp_path: str = None) -> None:
+    """
+    Writes the content into a temporary file next to file_path and then renames it to file_path. The rename is
+    atomic, so a killed process never leaves a half-written file behind.
+
+    Parameters
+    ----------
+    file_path: str
+        Path of the file.
+
+    content: bytes
+        The content of the file.
+
+    temp_path: str
+        Path of the temporary file, which should end with ".tmp". By default it is file_path with ".tmp" appended.
+    """
+    if temp_path is None:
+        temp_path = f"{file_path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, file_path)
+
+
+def remove_temporary_files(directory_path: str) -> None:
+    """
+    Removes the temporary files which are left behind by write_file_atomic, when a process is killed while writing.
+
+    Parameters
+    ----------
+    directory_path: str
+        The folder which is searched recursively.
+    """
+    for root, _, file_names in os.walk(directory_path):
+        for file_name in file_names:
+            if file_name.endswith('.tmp'):
+                os.remove(os.path.join(root, file_name))
+
+
+def to_cypher_literal(value) -> str:
+    """
+    Converts a Python value into a cypher literal. Strings are written with JSON escapes, which cypher also
+    accepts, and map keys are put between two ` characters.
+
+    Parameters
+    ----------
+    value: str | int | float | bool | list | dict | None
+        The Python value.
+
+    Returns
+    -------
+    str
+        The cypher literal.
+    """
+    if isinstance(value, dict):
+        return '{' + ', '.join(f"`{key.replace('`', '``')}`: {to_cypher_literal(item)}" for key, item in value.items()) + '}'
+    if isinstance(value, list):
+        return '[' + ', '.join(to_cypher_literal(item) for item in value) + ']'
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return json.dumps(str(value), ensure_ascii=False)
+
+
+def get_page_file_names(folder_path: str) -> list[str]:
+    """
+    Lists the page files of a class or object property in the order of their page index, so that the pages are
+    always processed in the same order.
+
+    Parameters
+    ----------
+    folder_path: str
+        The folder of the class or object property in the "data" folder.
+
+    Returns
+    -------
+    list[str]
+        The file names, with numeric names sorted by their value.
+    """
+    return sorted(os.listdir(folder_path), key=lambda name: (not name.isdigit(), int(name) if name.isdigit() else 0, name))
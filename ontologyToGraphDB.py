@@ -4,35 +4,318 @@
     There are two keys in this file. OntologyFile and OntologyUrl:
         - ontologyFile: Points to the file located in the "ontologies" folder
         - ontologyUrl: Points to the url of the ontology
+    The following keys are optional:
+        - Concurrency: Maximum number of SPARQL requests that are sent to DBPedia in parallel, COUNT queries included. Pages and classes or object properties are crawled by two pools of this many threads, which share the request slots (default 1)
+        - RequestRate: Maximum average number of SPARQL requests per second, zero for no limit (default 0)
+        - RequestBurst: Maximum number of SPARQL requests that are sent at once after an idle period (default RequestRate)
+        - MaxRetries: Number of times that a throttled, timed-out or broken request is retried (default 5)
+        - MaxTimeoutRetries: Number of times that a request is retried after a 504 Gateway Timeout or a read timeout, which usually means that the query is too slow. These retries count towards MaxRetries, and unlike connect timeouts they do not lower the concurrency (default 1)
+        - BackoffMax: Maximum number of seconds between retries, when the response has no Retry-After (default 60)
+        - TargetLatency: Number of seconds above which a request lowers the concurrency, zero to adapt only to errors (default 0)
+        - ConnectionPoolSize: Maximum number of persistent HTTP connections to the endpoint, shared by all threads (default Concurrency)
+        - ConnectTimeout: Number of seconds to wait for a connection to the endpoint (default 10)
+        - ReadTimeout: Number of seconds to wait for the next bytes of a response before the request is retried (default 300)
+        - CompressResponses: Request gzip-compressed responses (default true)
+        - Pagination: "offset" for LIMIT/OFFSET pages, or "keyset" for pages ordered by the subject IRI (default "offset")
+        - CountMode: "exact" to count the records of each class and object property before paging, "estimate" for a cheap approximate count that is only shown in the progress bar, or "none" (default "exact")
+        - AdaptivePageSize: Shrink the page size when queries time out or are slow, and grow it when they are fast. It applies to keyset pages and to offset pages without an exact count (default false)
+        - ClassQueryStrategy: "single" to fetch each page of a class with one query, or "split" to fetch its subjects first and then each datatype property and subclass flag with its own narrow query, joined by IRI. Split pages are keyset pages, and are parsed even in passthrough mode (default "single")
+        - MinPageSize: Smallest page size of the adaptive page size (default 500)
+        - PageTargetSeconds: Number of seconds that a page should take with the adaptive page size (default 10)
+        - CacheDirectory: Folder of the on-disk SPARQL response cache. The cache is disabled if it is not given
+        - CacheTTL: Number of seconds that a cached response stays valid, zero for no expiry (default 0)
+        - CacheMaxBytes: Maximum size of the cache, least recently used responses are evicted (default 0, unbounded)
+        - ResultFormat: "json" or "tsv", the SPARQL result format of the page queries. TSV results are smaller and faster to parse (default "json")
+        - Passthrough: Stream SPARQL responses to the "data" folder without parsing them (default false)
+        - ValidatePages: Check that streamed responses are well-formed while they are written (default false)
+        - StagingLayout: "json" to save pages as SPARQL JSON results, or "ndjson" for a compact header line and one line per row (default "json")
+        - StagingCompression: "none", "gzip", or "zstd", which needs the zstandard package from requirements-optional.txt, to compress the saved pages. Passthrough mode needs "json" and "none" (default "none")
+        - CypherMode: "create" for one CREATE statement per record, or "unwind" for batched UNWIND statements (default "create")
+        - BatchSize: Maximum number of rows per UNWIND batch (default 1000)
+        - EdgeMode: "variable" for edges that refer to node variables, or "match" for edges that match their nodes by IRI (default "variable")
+        - ExportTarget: "cypher" for cypher scripts, "csv" for neo4j-admin import CSV files, or "both" (default "cypher")
+        - CSVPartRows: Maximum number of rows per CSV part file (default 1000000)
+        - GeneratorWorkers: Number of processes that convert pages into cypher, zero for one per CPU core (default 1)
+        - NodeIndex: "hash" for a table of 64-bit IRI hashes, or "bloom" for a smaller Bloom filter that may drop a few nodes (default "hash")
+        - NodeIndexCapacity: Number of node IRIs that the Bloom filter is sized for (default 10000000)
+        - NodeIndexErrorRate: False positive rate of the Bloom filter (default 0.001)
+        - DanglingEdges: "drop" to leave out edges whose ends are not nodes, or "keep" to only count them (default "drop")
+        - IncrementalGeneration: Keep the "cypher" folder, only convert the pages that changed since the previous generation, and write "cypher/delta.cypher", which turns the previous graph into the new one with MERGE, SET and DETACH DELETE. It does not support streaming (default false)
+        - ShardMaxBytes: Write the combined scripts into "cypher/shards" as node shards and then edge shards of at most this many bytes, listed by "cypher/shards.json" with their statement counts and checksums, instead of "All.cypher". Zero for no size limit. It needs the "match" edge mode or the "unwind" cypher mode (default 0)
+        - ShardMaxStatements: Maximum number of statements per shard, zero for no limit. Sharding is used if it or ShardMaxBytes is not zero (default 0)
+        - ShardCompression: "none" or "gzip", to compress each shard (default "none")
+        - Streaming: Generate scripts from each page as soon as it is fetched, while the next pages download (default false)
+        - StreamQueueSize: Maximum number of fetched pages which wait to be generated in streaming mode (default 16)
+        - WriteData: Save the fetched pages into the "data" folder. Can be false only in streaming mode (default true)
+        - MetricsFile: File that per-stage timings, SPARQL latencies, rows, bytes and dedup rates are written into. Metrics are not written if it is not given
+        - MetricsFormat: "jsonl" to append JSON lines, or "prometheus" for a Prometheus textfile (default "jsonl")
+        - Profile: "cprofile" or "tracemalloc" to profile each stage into files next to the metrics file, or "none" (default "none")
     Ontologies should be based on OWL ontology and follow the structure of DBPedia.
+    Run with --resume to continue an interrupted crawl, instead of deleting the "data" folder and starting over.
+
+    To convert several ontologies in one batch run, give them as a list instead of OntologyFile and OntologyUrl:
+        - Ontologies: List of objects with an OntologyFile or an OntologyUrl, an optional Name (default the file name
+          without extension), and any of the keys above, which override the settings of the batch for that ontology
+        - BatchDirectory: Folder which gets one folder per ontology, named after it, with its own "metadata", "data" and
+          "cypher" folders and its metrics file (default "batch")
+        - ShareCrawl: Fetch a class or object property whose query is the same as in an earlier ontology of the batch
+          only once, and link its pages into the "data" folder of the later ontology (default true)
+        - MergedGraph: Also generate the scripts of one graph with the nodes and edges of all ontologies into
+          "<BatchDirectory>/merged". A class which is in several ontologies takes its nodes from the first one (default false)
 
     There are 3 main steps to convert an ontology to Neo4j GraphDB structure.
         - OntologyExtractor: Extracts metadat from the ontology file. It saves the metadata into binary files.
         - DBPediaCrawler: Crawls the DBPedia by running SPARQL queries, based on the metadata that were extracted
                           in the previous step. It saves these data with JSON format into "data" folder.
         - GraphDBGenerator: Creats Neo4j scripts from extracted data. It saves the output into "cypher" folder               
+    In streaming mode, the last two steps overlap: each page is passed to GraphDBGenerator as soon as it is fetched.
 """
 
+import argparse
 import json
+import os
 from lib.dbPediaCrawler import DBPediaCrawler
 from lib.graphDBGenerator import GraphDBGenerator
+from lib.metrics import Metrics
+from lib.nodeIndex import NodeIndex
 from lib.ontologyExtractor import OntologyExtractor
+from lib.pageSizer import PageSizer
+from lib.requestThrottle import RequestThrottle
+from lib.responseCache import ResponseCache
+from lib.sharedCrawl import SharedCrawl
+from lib.sparqlTransport import SPARQLTransport
+from lib.stagingFormat import StagingFormat
+from lib.utils import ClassMetaData, ObjectPropertyMetaData, dump_metadata_to_file, load_metadata_from_file
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Converts an ontology to Neo4j GraphDB scripts.')
+    parser.add_argument('--resume', action='store_true',
+                        help='resume the previous crawl, and fetch only missing or failed pages')
+    args = parser.parse_args()
+
     with open('config.json', 'r') as config_file:
         config = json.load(config_file)
-        ontology_file = config["OntologyFile"]
-        ontology_url = config["OntologyUrl"]
-    
-    ontologyExtractor = OntologyExtractor(ontology_file, ontology_url)
-    ontologyExtractor.start()
-    
-    dbPediaCrawler = DBPediaCrawler()
-    dbPediaCrawler.start()
-    
-    graphDBGenerator = GraphDBGenerator()
-    graphDBGenerator.start()
+    if "Ontologies" in config:
+        run_batch(config, args.resume)
+    else:
+        run_pipeline(config, args.resume)
+
+
+def run_pipeline(config: dict, resume: bool, shared: SharedCrawl = None) -> None:
+    """
+    Runs the three steps for the ontology of config, in the current folder.
+
+    Parameters
+    ----------
+    config: dict
+        The settings of config.json.
+
+    resume: bool
+        Whether the previous crawl is resumed.
+
+    shared: SharedCrawl
+        The items which are already crawled by earlier ontologies of a batch run, or None.
+    """
+    ontology_file = config["OntologyFile"]
+    ontology_url = config["OntologyUrl"]
+    concurrency = config.get("Concurrency", 1)
+    throttle = RequestThrottle(concurrency, config.get("RequestRate", 0), config.get("RequestBurst", 0),
+                               config.get("MaxRetries", 5), backoff_max=config.get("BackoffMax", 60),
+                               target_latency=config.get("TargetLatency", 0),
+                               max_timeout_retries=config.get("MaxTimeoutRetries", 1))
+    transport = SPARQLTransport(config.get("ConnectionPoolSize", concurrency), config.get("ConnectTimeout", 10),
+                                config.get("ReadTimeout", DBPediaCrawler.timeout),
+                                config.get("CompressResponses", True))
+    pagination = config.get("Pagination", "offset")
+    count_mode = config.get("CountMode", "exact")
+    class_strategy = config.get("ClassQueryStrategy", "single")
+    page_sizer = PageSizer(int(DBPediaCrawler.limit), config.get("MinPageSize", 500),
+                           config.get("PageTargetSeconds", 10), config.get("AdaptivePageSize", False))
+    result_format = config.get("ResultFormat", "json")
+    passthrough = config.get("Passthrough", False)
+    validate_pages = config.get("ValidatePages", False)
+    staging_format = StagingFormat(config.get("StagingLayout", "json"), config.get("StagingCompression", "none"))
+    streaming = config.get("Streaming", False)
+    stream_queue_size = config.get("StreamQueueSize", 16)
+    write_data = config.get("WriteData", True) or not streaming
+    metrics = Metrics(config.get("MetricsFile"), config.get("MetricsFormat", "jsonl"),
+                      config.get("Profile", "none"))
+    cache = None
+    if config.get("CacheDirectory"):
+        cache = ResponseCache(os.path.join(os.getcwd(), config["CacheDirectory"]),
+                              config.get("CacheTTL", 0), config.get("CacheMaxBytes", 0))
+
+    try:
+        with metrics.stage('extract'):
+            ontologyExtractor = OntologyExtractor(ontology_file, ontology_url)
+            ontologyExtractor.start()
+        metrics.set('classes', len(ontologyExtractor.classesMetaData))
+        metrics.set('object_properties', len(ontologyExtractor.objectPropertiesMetaData))
+
+        if streaming:
+            with metrics.stage('stream'):
+                graphDBGenerator = create_generator(config, metrics)
+                dbPediaCrawler = DBPediaCrawler(concurrency, pagination=pagination, resume=resume, cache=cache,
+                                                passthrough=passthrough, validate=validate_pages,
+                                                page_consumer=graphDBGenerator.put_page, write_data=write_data,
+                                                metrics=metrics, throttle=throttle, count_mode=count_mode,
+                                                page_sizer=page_sizer, staging_format=staging_format,
+                                                result_format=result_format, transport=transport,
+                                                class_strategy=class_strategy, shared=shared)
+                graphDBGenerator.start_stream(stream_queue_size)
+                try:
+                    dbPediaCrawler.start()
+                finally:
+                    graphDBGenerator.finish_stream()
+            return
+
+        with metrics.stage('crawl'):
+            dbPediaCrawler = DBPediaCrawler(concurrency, pagination=pagination, resume=resume, cache=cache,
+                                            passthrough=passthrough, validate=validate_pages, metrics=metrics,
+                                            throttle=throttle, count_mode=count_mode, page_sizer=page_sizer,
+                                            staging_format=staging_format, result_format=result_format,
+                                            transport=transport, class_strategy=class_strategy, shared=shared)
+            dbPediaCrawler.start()
+
+        with metrics.stage('generate'):
+            graphDBGenerator = create_generator(config, metrics)
+            graphDBGenerator.start()
+    finally:
+        metrics.close()
+
+
+def create_generator(config: dict, metrics: Metrics) -> GraphDBGenerator:
+    """
+    Creates the script generator with the settings of config, from the metadata in the current folder.
+
+    Parameters
+    ----------
+    config: dict
+        The settings of config.json.
+
+    metrics: Metrics
+        The metrics that the generator records into.
+
+    Returns
+    -------
+    GraphDBGenerator
+        The generator.
+    """
+    node_index = NodeIndex(config.get("NodeIndex", "hash"), config.get("NodeIndexCapacity", 10000000),
+                           config.get("NodeIndexErrorRate", 0.001))
+    return GraphDBGenerator(config.get("CypherMode", "create"), config.get("BatchSize", 1000),
+                            config.get("ExportTarget", "cypher"), config.get("CSVPartRows", 1000000),
+                            config.get("EdgeMode", "variable"), config.get("GeneratorWorkers", 1), node_index,
+                            config.get("DanglingEdges", "drop"), metrics, config.get("IncrementalGeneration", False),
+                            config.get("ShardMaxBytes", 0), config.get("ShardMaxStatements", 0),
+                            config.get("ShardCompression", "none"))
+
+
+def run_batch(config: dict, resume: bool) -> None:
+    """
+    Runs the three steps for each ontology of config["Ontologies"], one after another, each one in its own folder
+    "<BatchDirectory>/<Name>", with its own "metadata", "data" and "cypher" folders. The settings of an ontology
+    are the settings of config, with the keys of its entry on top. A class or object property whose query is the
+    same as in an earlier ontology is not fetched again, its pages are shared. With MergedGraph, the scripts of
+    one graph with the nodes and edges of all ontologies are generated into "<BatchDirectory>/merged".
+
+    Parameters
+    ----------
+    config: dict
+        The settings of config.json, with the list of ontologies.
+
+    resume: bool
+        Whether the previous crawl of each ontology is resumed.
+    """
+    root_directory = os.getcwd()
+    batch_directory = os.path.join(root_directory, config.get("BatchDirectory", "batch"))
+    merged_graph = config.get("MergedGraph", False)
+    shared = SharedCrawl() if config.get("ShareCrawl", True) else None
+    settings = {key: value for key, value in config.items() if key not in batch_keys}
+    ontologies = []
+    for entry in config["Ontologies"]:
+        ontology_config = {**settings, "OntologyFile": "", "OntologyUrl": "", **entry}
+        name = entry.get("Name") or os.path.splitext(os.path.basename(
+            ontology_config["OntologyFile"] or ontology_config["OntologyUrl"]))[0]
+        if not name or name == 'merged' or name in [ontology_name for ontology_name, _ in ontologies]:
+            raise ValueError(f'Each ontology of a batch needs a distinct name, "{name}" is not valid')
+        if ontology_config["OntologyFile"]:
+            ontology_config["OntologyFile"] = os.path.join(root_directory, ontology_config["OntologyFile"])
+        if ontology_config.get("CacheDirectory"):
+            ontology_config["CacheDirectory"] = os.path.join(root_directory, ontology_config["CacheDirectory"])
+        if merged_graph and ontology_config.get("Streaming", False) and not ontology_config.get("WriteData", True):
+            raise ValueError(f'The merged graph is generated from the "data" folders, but "{name}" does not save its pages')
+        ontologies.append((name, ontology_config))
+
+    for name, ontology_config in ontologies:
+        print(f'Ontology: {name} '.ljust(129, '#'))
+        os.makedirs(os.path.join(batch_directory, name), exist_ok=True)
+        os.chdir(os.path.join(batch_directory, name))
+        try:
+            run_pipeline(ontology_config, resume, shared)
+        finally:
+            os.chdir(root_directory)
+    if shared is not None:
+        print(f'Shared: {shared.hits:,} classes and object properties were crawled once for several ontologies')
+
+    if merged_graph:
+        print('Ontology: merged '.ljust(129, '#'))
+        os.makedirs(os.path.join(batch_directory, 'merged'), exist_ok=True)
+        try:
+            classes, object_properties = merge_metadata([os.path.join(batch_directory, name)
+                                                         for name, _ in ontologies])
+            os.chdir(os.path.join(batch_directory, 'merged'))
+            dump_metadata_to_file(classes, object_properties)
+            metrics = Metrics(settings.get("MetricsFile"), settings.get("MetricsFormat", "jsonl"),
+                              settings.get("Profile", "none"))
+            try:
+                with metrics.stage('generate'):
+                    create_generator(settings, metrics).start()
+            finally:
+                metrics.close()
+        finally:
+            os.chdir(root_directory)
+
+
+def merge_metadata(directories: list[str]) -> tuple[dict[str, ClassMetaData], list[ObjectPropertyMetaData]]:
+    """
+    Merges the metadata of the ontologies of a batch, which the crawler saved in the "metadata" folder of each one,
+    with the folders of their pages. Classes are merged by IRI, and a class which is in several ontologies keeps
+    the metadata of the first one, so its nodes come from the pages of that ontology, the same way as the first
+    record of a node wins. Object properties with the same IRI, domain and range are only kept once.
+
+    Parameters
+    ----------
+    directories: list[str]
+        The folders of the ontologies, in the order of the batch.
+
+    Returns
+    -------
+    tuple[dict[str, ClassMetaData], list[ObjectPropertyMetaData]]
+        The metadata of the classes and of the object properties of the merged graph.
+    """
+    classes: dict[str, ClassMetaData] = dict()
+    object_properties: list[ObjectPropertyMetaData] = []
+    object_property_keys = set()
+    root_directory = os.getcwd()
+    for directory in directories:
+        os.chdir(directory)
+        try:
+            ontology_classes, ontology_object_properties, _ = load_metadata_from_file()
+        finally:
+            os.chdir(root_directory)
+        for cls_iri, cls_metadata in ontology_classes.items():
+            classes.setdefault(cls_iri, cls_metadata)
+        for obj_prop_metadata in ontology_object_properties:
+            key = (obj_prop_metadata.iri, obj_prop_metadata.domain_iri, obj_prop_metadata.range_iri)
+            if key not in object_property_keys:
+                object_property_keys.add(key)
+                object_properties.append(obj_prop_metadata)
+    return classes, object_properties
+
+
+batch_keys = ("Ontologies", "BatchDirectory", "MergedGraph", "ShareCrawl")
 
 
 if __name__ == "__main__":
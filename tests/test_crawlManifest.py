@@ -0,0 +1,115 @@
+import json
+import os
+from lib.crawlManifest import CrawlManifest
+from lib.utils import hash_file
+
+
+def write_page(directory, page, content):
+    file_path = os.path.join(directory, page)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'wb') as file:
+        file.write(content)
+    return len(content), hash_file(file_path)
+
+
+def crawl(directory, pages, item='Class/Person'):
+    """Saves pages of an item and records them in a new manifest, which is closed afterwards."""
+    manifest = CrawlManifest(directory, resume=False)
+    for index, content in enumerate(pages):
+        page = f'{item}/{index}'
+        size, sha256 = write_page(directory, page, content)
+        manifest.page_finished(page, f'query{index}', 1, size, sha256, last_key=[str(index)], limit=100)
+    manifest.item_finished(item, 'item', len(pages), len(pages))
+    manifest.close()
+    return os.path.join(directory, 'manifest.jsonl')
+
+
+def test_resume(tmp_path):
+    crawl(tmp_path, [b'first', b'second'])
+    manifest = CrawlManifest(tmp_path, resume=True)
+    record = manifest.get_finished_page('Class/Person/1', 'query1')
+    assert record['last_key'] == ['1'] and record['limit'] == 100
+    assert manifest.get_finished_page('Class/Person/1', 'other query') is None
+    assert manifest.get_finished_page('Class/Person/2', 'query2') is None
+    assert manifest.get_finished_item('Class/Person', 'item')['total'] == 2
+    assert manifest.get_finished_item('Class/Person', 'other query') is None
+    assert set(manifest.get_item_pages('Class/Person')) == {'0', '1'}
+    manifest.close()
+
+
+def test_no_resume_discards_records(tmp_path):
+    crawl(tmp_path, [b'first'])
+    manifest = CrawlManifest(tmp_path, resume=False)
+    assert manifest.get_finished_page('Class/Person/0', 'query0') is None
+    assert manifest.get_finished_item('Class/Person', 'item') is None
+    manifest.close()
+    assert os.path.getsize(manifest.file_path) == 0
+
+
+def test_resume_from_truncated_line(tmp_path):
+    manifest_path = crawl(tmp_path, [b'first', b'second'])
+    size, sha256 = write_page(tmp_path, 'Class/Person/2', b'third')
+    record = {'page': 'Class/Person/2', 'status': 'finished', 'query': 'query2', 'rows': 1,
+              'size': size, 'sha256': sha256, 'last_key': ['2']}
+    line = json.dumps(record)
+    with open(manifest_path, 'a', encoding='utf8') as file:
+        file.write(line[:len(line) // 2])
+    manifest = CrawlManifest(tmp_path, resume=True)
+    assert manifest.get_finished_page('Class/Person/1', 'query1') is not None
+    assert manifest.get_finished_page('Class/Person/2', 'query2') is None
+    manifest.page_finished('Class/Person/2', 'query2', 1, size, sha256, last_key=['2'])
+    manifest.close()
+    manifest = CrawlManifest(tmp_path, resume=True)
+    assert manifest.get_finished_page('Class/Person/2', 'query2') is not None
+    assert set(manifest.get_item_pages('Class/Person')) == {'0', '1', '2'}
+    manifest.close()
+
+
+def test_last_record_wins(tmp_path):
+    crawl(tmp_path, [b'first'])
+    manifest = CrawlManifest(tmp_path, resume=True)
+    manifest.page_failed('Class/Person/0', 'query0', 'timeout')
+    assert manifest.get_finished_page('Class/Person/0', 'query0') is None
+    manifest.close()
+    manifest = CrawlManifest(tmp_path, resume=True)
+    assert manifest.pages['Class/Person/0']['error'] == 'timeout'
+    assert manifest.get_finished_page('Class/Person/0', 'query0') is None
+    assert manifest.get_finished_item('Class/Person', 'item') is None
+    assert manifest.get_item_pages('Class/Person') == {}
+    manifest.close()
+
+
+def test_changed_page_is_fetched_again(tmp_path):
+    crawl(tmp_path, [b'first', b'second'])
+    write_page(tmp_path, 'Class/Person/0', b'FIRST')
+    os.remove(os.path.join(tmp_path, 'Class/Person/1'))
+    manifest = CrawlManifest(tmp_path, resume=True)
+    assert manifest.get_finished_page('Class/Person/0', 'query0') is None
+    assert manifest.get_finished_page('Class/Person/1', 'query1') is None
+    assert manifest.get_finished_item('Class/Person', 'item') is None
+    manifest.close()
+
+
+def test_page_is_hashed_once(tmp_path, monkeypatch):
+    crawl(tmp_path, [b'first'])
+    manifest = CrawlManifest(tmp_path, resume=True)
+    hashed = []
+    monkeypatch.setattr('lib.crawlManifest.hash_file', lambda path: hashed.append(path) or hash_file(path))
+    for _ in range(3):
+        assert manifest.get_finished_page('Class/Person/0', 'query0') is not None
+    assert len(hashed) == 1
+    size, sha256 = write_page(tmp_path, 'Class/Person/1', b'second')
+    manifest.page_finished('Class/Person/1', 'query1', 1, size, sha256)
+    assert manifest.get_finished_page('Class/Person/1', 'query1') is not None
+    assert len(hashed) == 1
+    manifest.close()
+
+
+def test_not_persistent(tmp_path):
+    directory = os.path.join(tmp_path, 'data')
+    manifest = CrawlManifest(directory, resume=True, persistent=False)
+    manifest.page_failed('Class/Person/0', 'query0', 'timeout')
+    manifest.item_finished('Class/Person', 'item', 0, 0)
+    assert manifest.get_finished_item('Class/Person', 'item') is not None
+    manifest.close()
+    assert not os.path.exists(directory)
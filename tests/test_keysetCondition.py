@@ -0,0 +1,45 @@
+import itertools
+import re
+import pytest
+from lib.utils import keyset_condition, sparql_string_literal
+
+
+def compile_condition(condition):
+    """Translates a keyset condition into a Python expression over a dict named row."""
+    expression = re.sub(r'STR\(\?(\w+)\)', r"row['\1']", condition)
+    expression = expression.replace('||', ' or ').replace('&&', ' and ')
+    expression = re.sub(r"(?<=\]) = ", ' == ', expression)
+    return compile(expression, '<keyset>', 'eval')
+
+
+def test_single_column():
+    assert keyset_condition(['s'], ['http://dbpedia.org/resource/A']) == \
+        'STR(?s) > "http://dbpedia.org/resource/A"'
+
+
+def test_two_columns():
+    assert keyset_condition(['s', 'o'], ['x', 'y']) == \
+        'STR(?s) > "x" || (STR(?s) = "x" && (STR(?o) > "y"))'
+
+
+def test_three_columns():
+    assert keyset_condition(['s', 'p', 'o'], ['x', 'y', 'z']) == \
+        'STR(?s) > "x" || (STR(?s) = "x" && (STR(?p) > "y" || (STR(?p) = "y" && (STR(?o) > "z"))))'
+
+
+def test_literals_are_escaped():
+    assert keyset_condition(['s', 'label'], ['a"b', 'c\\d']) == \
+        'STR(?s) > "a\\"b" || (STR(?s) = "a\\"b" && (STR(?label) > "c\\\\d"))'
+    assert sparql_string_literal('say "hi" \\o/') == '"say \\"hi\\" \\\\o/"'
+
+
+@pytest.mark.parametrize('key_vars', [['s'], ['s', 'o'], ['s', 'p', 'o']])
+def test_selects_rows_after_last_key(key_vars):
+    values = ['', 'a', 'a"', 'b\\', 'ab', 'é']
+    rows = [dict(zip(key_vars, key)) for key in itertools.product(values, repeat=len(key_vars))]
+    for last_key in itertools.product(values, repeat=len(key_vars)):
+        condition = keyset_condition(key_vars, list(last_key))
+        expression = compile_condition(condition)
+        for row in rows:
+            key = tuple(row[var] for var in key_vars)
+            assert eval(expression, {'row': row}) == (key > last_key), (condition, key)
@@ -0,0 +1,94 @@
+import pytest
+from lib.nodeIndex import NodeIndex
+
+RESOURCE = 'http://dbpedia.org/resource/'
+
+
+def iris(count, prefix='Node'):
+    return [f'{RESOURCE}{prefix}_{index}' for index in range(count)]
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        NodeIndex('set')
+
+
+@pytest.mark.parametrize('error_rate', [0, 1, 1.5])
+def test_invalid_error_rate(error_rate):
+    with pytest.raises(ValueError):
+        NodeIndex('bloom', error_rate=error_rate)
+
+
+@pytest.mark.parametrize('kind', ['hash', 'bloom'])
+def test_add_and_contains(kind):
+    index = NodeIndex(kind, capacity=100)
+    assert RESOURCE + 'A' not in index
+    assert index.add(RESOURCE + 'A')
+    assert not index.add(RESOURCE + 'A')
+    assert RESOURCE + 'A' in index
+    assert index.count == 1
+
+
+@pytest.mark.parametrize('kind', ['hash', 'bloom'])
+def test_clear(kind):
+    index = NodeIndex(kind, capacity=100)
+    for iri in iris(50):
+        index.add(iri)
+    index.clear()
+    assert index.count == 0
+    assert not any(iri in index for iri in iris(50))
+    assert index.add(iris(1)[0])
+
+
+def test_hash_growth():
+    index = NodeIndex('hash')
+    added = iris(10 * NodeIndex.initial_slots)
+    sizes = set()
+    for iri in added:
+        assert index.add(iri)
+        assert 2 * index.count <= len(index.slots)
+        sizes.add(len(index.slots))
+    assert len(sizes) > 1
+    assert index.mask == len(index.slots) - 1
+    assert index.count == len(added)
+    assert all(iri in index for iri in added)
+    assert not any(index.add(iri) for iri in added)
+    assert not any(iri in index for iri in iris(1000, 'Other'))
+    assert index.get_size() == 8 * len(index.slots)
+
+
+def test_hash_key_is_not_zero():
+    assert all(NodeIndex.get_key(iri) != 0 for iri in iris(1000))
+
+
+def test_bloom_false_positives():
+    index = NodeIndex('bloom', capacity=10000, error_rate=0.01)
+    added = iris(10000)
+    for iri in added:
+        index.add(iri)
+    assert all(iri in index for iri in added)
+    others = iris(20000, 'Other')
+    false_positives = sum(iri in index for iri in others)
+    assert false_positives / len(others) < 0.03
+    assert index.count <= len(added)
+
+
+def test_bloom_false_positive_is_not_added():
+    index = NodeIndex('bloom', capacity=10, error_rate=0.5)
+    added = iris(200)
+    results = [index.add(iri) for iri in added]
+    assert not all(results)
+    assert index.count == sum(results)
+    assert all(iri in index for iri in added)
+
+
+def test_bloom_size():
+    index = NodeIndex('bloom', capacity=1000000, error_rate=0.001)
+    assert 1.7 < index.get_size() / 1000000 < 1.9
+    assert index.hash_count == 10
+
+
+def test_report():
+    index = NodeIndex()
+    index.add(RESOURCE + 'A')
+    assert index.get_report().startswith('Node index (hash): 1 IRIs')
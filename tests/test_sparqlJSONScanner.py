@@ -0,0 +1,106 @@
+import json
+import pytest
+from lib.sparqlJSONScanner import SPARQLJSONReader, SPARQLJSONScanner
+
+RESULTS = {
+    'head': {'vars': ['s', 'label']},
+    'results': {'bindings': [
+        {'s': {'type': 'uri', 'value': 'http://dbpedia.org/resource/A'},
+         'label': {'type': 'literal', 'value': 'quote " and brace } and bracket ]'}},
+        {'s': {'type': 'uri', 'value': 'http://dbpedia.org/resource/B'},
+         'label': {'type': 'literal', 'value': 'backslash \\ then quote \\"'}},
+        {'s': {'type': 'uri', 'value': 'http://dbpedia.org/resource/Cé'}},
+    ]},
+}
+DOCUMENT = json.dumps(RESULTS, ensure_ascii=False, indent=1).encode('utf8')
+
+
+def scan(chunks: list[bytes], capture: str = 'all') -> tuple[SPARQLJSONScanner, list[bytes]]:
+    scanner = SPARQLJSONScanner(capture)
+    bindings = []
+    for chunk in chunks:
+        bindings += scanner.feed(chunk)
+    scanner.close()
+    return scanner, bindings
+
+
+def test_whole_document():
+    scanner, bindings = scan([DOCUMENT])
+    assert scanner.variables == ['s', 'label']
+    assert scanner.rows == 3
+    assert [json.loads(binding) for binding in bindings] == RESULTS['results']['bindings']
+
+
+@pytest.mark.parametrize('split', range(1, len(DOCUMENT)))
+def test_tokens_split_across_two_chunks(split):
+    scanner, bindings = scan([DOCUMENT[:split], DOCUMENT[split:]])
+    assert scanner.variables == ['s', 'label']
+    assert [json.loads(binding) for binding in bindings] == RESULTS['results']['bindings']
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7])
+def test_small_chunks(size):
+    chunks = [DOCUMENT[i:i + size] for i in range(0, len(DOCUMENT), size)]
+    scanner, bindings = scan(chunks, 'last')
+    assert bindings == []
+    assert scanner.rows == 3
+    assert scanner.get_last_binding() == RESULTS['results']['bindings'][-1]
+
+
+def test_no_capture_keeps_no_binding():
+    scanner, bindings = scan([DOCUMENT], 'none')
+    assert scanner.rows == 3
+    assert bindings == []
+    assert scanner.get_last_binding() is None
+
+
+def test_empty_bindings():
+    scanner, _ = scan([b'{"head": {"vars": ["s"]}, "results": {"bindings": []}}'])
+    assert scanner.variables == ['s']
+    assert scanner.rows == 0
+
+
+@pytest.mark.parametrize('document', [
+    DOCUMENT[:-1],
+    DOCUMENT[:len(DOCUMENT) // 2],
+    b'{"head": {"vars": ["s"]}, "results": {"bindings": [{"s": {"value": "unterminated}]}}',
+])
+def test_truncated_document(document):
+    scanner = SPARQLJSONScanner()
+    scanner.feed(document)
+    with pytest.raises(ValueError):
+        scanner.close()
+
+
+def test_unbalanced_brackets():
+    with pytest.raises(ValueError):
+        SPARQLJSONScanner().feed(b'{"head": {"vars": []]}')
+
+
+def test_missing_bindings():
+    scanner = SPARQLJSONScanner()
+    scanner.feed(b'{"head": {"vars": ["s"]}, "results": {}}')
+    with pytest.raises(ValueError):
+        scanner.close()
+
+
+def test_unknown_capture_mode():
+    with pytest.raises(ValueError):
+        SPARQLJSONScanner('first')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 64, 1 << 20])
+def test_reader_with_small_chunks(tmp_path, chunk_size):
+    file_path = tmp_path / 'page'
+    file_path.write_bytes(DOCUMENT)
+    reader = SPARQLJSONReader(str(file_path), chunk_size)
+    assert list(reader) == RESULTS['results']['bindings']
+    assert reader.variables == ['s', 'label']
+    assert list(reader.values())[2] == ['http://dbpedia.org/resource/Cé', None]
+
+
+def test_reader_truncated_file(tmp_path):
+    file_path = tmp_path / 'page'
+    file_path.write_bytes(DOCUMENT[:len(DOCUMENT) // 2])
+    with pytest.raises(ValueError):
+        list(SPARQLJSONReader(str(file_path), 16))
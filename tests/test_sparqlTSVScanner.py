@@ -0,0 +1,123 @@
+import pytest
+from lib.sparqlTSVScanner import (SPARQLTSVReader, SPARQLTSVScanner, parse_tsv_binding, parse_tsv_header,
+                                  parse_tsv_results, parse_tsv_term, parse_tsv_value, unescape)
+
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+RESULT = ('?s\t?label\t?count\n'
+          '<http://dbpedia.org/resource/A>\t"tab\\there, quote \\" and newline \\n"@en\t42\n'
+          '<http://dbpedia.org/resource/B>\t"backslash \\\\t is not a tab"\t\n'
+          '<http://dbpedia.org/resource/C>\t\t1.5e3\n').encode('utf8')
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('plain', 'plain'),
+    ('a\\tb', 'a\tb'),
+    ('a\\"b', 'a"b'),
+    ("a\\'b", "a'b"),
+    ('a\\\\tb', 'a\\tb'),
+    ('a\\\\', 'a\\'),
+    ('line\\nbreak\\r', 'line\nbreak\r'),
+    ('caf\\u00E9', 'café'),
+    ('\\U0001F600', '\U0001F600'),
+])
+def test_unescape(text, expected):
+    assert unescape(text) == expected
+
+
+def test_parse_header():
+    assert parse_tsv_header('?s\t?label\r\n') == ['s', 'label']
+    assert parse_tsv_header('"s"\t"label"') == ['s', 'label']
+
+
+@pytest.mark.parametrize('field, expected', [
+    ('<http://dbpedia.org/resource/A>', {'type': 'uri', 'value': 'http://dbpedia.org/resource/A'}),
+    ('"a\\tb"', {'type': 'literal', 'value': 'a\tb'}),
+    ('"say \\"hi\\""@en', {'type': 'literal', 'xml:lang': 'en', 'value': 'say "hi"'}),
+    ('"5"^^<http://www.w3.org/2001/XMLSchema#int>',
+     {'type': 'typed-literal', 'datatype': XSD + 'int', 'value': '5'}),
+    ('_:b0', {'type': 'bnode', 'value': 'b0'}),
+    ('42', {'type': 'typed-literal', 'datatype': XSD + 'integer', 'value': '42'}),
+    ('-1.5', {'type': 'typed-literal', 'datatype': XSD + 'decimal', 'value': '-1.5'}),
+    ('1.5E3', {'type': 'typed-literal', 'datatype': XSD + 'double', 'value': '1.5E3'}),
+    ('true', {'type': 'typed-literal', 'datatype': XSD + 'boolean', 'value': 'true'}),
+    ('', None),
+])
+def test_parse_term(field, expected):
+    assert parse_tsv_term(field) == expected
+    assert parse_tsv_value(field) == (expected['value'] if expected is not None else None)
+
+
+def test_parse_binding_skips_unbound_variables():
+    binding = parse_tsv_binding('<http://x/A>\t\t""', ['s', 'label', 'empty'])
+    assert binding == {'s': {'type': 'uri', 'value': 'http://x/A'}, 'empty': {'type': 'literal', 'value': ''}}
+
+
+def test_parse_results():
+    results = parse_tsv_results(RESULT)
+    assert results['head']['vars'] == ['s', 'label', 'count']
+    bindings = results['results']['bindings']
+    assert len(bindings) == 3
+    assert bindings[0]['label'] == {'type': 'literal', 'xml:lang': 'en',
+                                    'value': 'tab\there, quote " and newline \n'}
+    assert bindings[1]['label']['value'] == 'backslash \\t is not a tab'
+    assert 'count' not in bindings[1]
+    assert 'label' not in bindings[2]
+    assert bindings[2]['count']['datatype'] == XSD + 'double'
+
+
+def test_parse_results_with_crlf():
+    assert parse_tsv_results(RESULT.replace(b'\n', b'\r\n')) == parse_tsv_results(RESULT)
+
+
+def scan(chunks: list[bytes], capture: str = 'all') -> tuple[SPARQLTSVScanner, list[bytes]]:
+    scanner = SPARQLTSVScanner(capture)
+    rows = []
+    for chunk in chunks:
+        rows += scanner.feed(chunk)
+    scanner.close()
+    return scanner, rows
+
+
+@pytest.mark.parametrize('split', range(1, len(RESULT)))
+def test_rows_split_across_two_chunks(split):
+    scanner, rows = scan([RESULT[:split], RESULT[split:]])
+    assert scanner.variables == ['s', 'label', 'count']
+    assert rows == RESULT.rstrip(b'\n').split(b'\n')[1:]
+
+
+def test_last_row_without_line_break():
+    scanner, _ = scan([RESULT.rstrip(b'\n')], 'last')
+    assert scanner.rows == 3
+    assert scanner.get_last_binding() == parse_tsv_results(RESULT)['results']['bindings'][-1]
+
+
+def test_crlf_rows():
+    scanner, rows = scan([RESULT.replace(b'\n', b'\r\n')])
+    assert scanner.rows == 3
+    assert rows == RESULT.rstrip(b'\n').split(b'\n')[1:]
+
+
+def test_row_with_wrong_number_of_terms():
+    scanner = SPARQLTSVScanner()
+    with pytest.raises(ValueError):
+        scanner.feed(b'?s\t?o\n<http://x/A>\n')
+
+
+def test_missing_header():
+    with pytest.raises(ValueError):
+        scan([b''])
+
+
+def test_reader(tmp_path):
+    file_path = tmp_path / 'page'
+    file_path.write_bytes(RESULT)
+    reader = SPARQLTSVReader(str(file_path))
+    assert list(reader) == parse_tsv_results(RESULT)['results']['bindings']
+    assert reader.variables == ['s', 'label', 'count']
+    assert list(reader.values())[1] == ['http://dbpedia.org/resource/B', 'backslash \\t is not a tab', None]
+
+
+def test_reader_with_crlf(tmp_path):
+    file_path = tmp_path / 'page'
+    file_path.write_bytes(RESULT.replace(b'\n', b'\r\n'))
+    assert list(SPARQLTSVReader(str(file_path))) == parse_tsv_results(RESULT)['results']['bindings']